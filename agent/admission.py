@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+try:
+    from agent.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, ADMISSION_WAIT, log
+except ImportError:
+    from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, ADMISSION_WAIT, log
+
+# Turns allowed to run at once across all clients (0 = unlimited)
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+# Running + queued turns allowed per client (0 = unlimited)
+ADMISSION_PER_CLIENT = int(os.getenv("ADMISSION_PER_CLIENT", "4"))
+# Interactive turns allowed to wait for a slot; beyond this new arrivals are shed
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+# Longest a turn may wait for a slot before it is shed (it would miss its deadline anyway)
+ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", "5"))
+
+# Lower runs first
+CONTINUING = 0  # follow-up on a thread that already has state
+NEW = 1         # first turn of a thread
+BATCH = 2       # /chat/batch items: wait indefinitely, never shed
+PRIORITY_NAMES = {CONTINUING: "continuing", NEW: "new", BATCH: "batch"}
+
+
+class AdmissionRejected(Exception):
+    """The turn was shed; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server is at capacity ({reason}); retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    client: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    """
+    Concurrency gate in front of the graph. Turns beyond the global cap wait in
+    a bounded priority queue (continuing threads ahead of new ones, FIFO within
+    a priority); arrivals that cannot start within `max_wait` are rejected
+    immediately rather than queued behind work that will time out.
+    Runs on the server's event loop, so no locking is needed.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, per_client: int = ADMISSION_PER_CLIENT,
+                 max_queue: int = ADMISSION_MAX_QUEUE, max_wait: float = ADMISSION_MAX_WAIT_S):
+        self.max_concurrent = max_concurrent
+        self.per_client = per_client
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: List[_Waiter] = []
+        self._clients: Dict[str, int] = {}
+        self._seq = itertools.count()
+        # EWMA of turn duration, for Retry-After
+        self._service_s = 5.0
+
+    # --- Introspection ---
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for w in self._waiters if w.priority != BATCH)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": {PRIORITY_NAMES[p]: sum(1 for w in self._waiters if w.priority == p) for p in PRIORITY_NAMES},
+            "max_concurrent": self.max_concurrent,
+            "per_client": self.per_client,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "avg_turn_s": round(self._service_s, 2),
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained."""
+        slots = self.max_concurrent or 1
+        return max(1, math.ceil((len(self._waiters) + 1) * self._service_s / slots))
+
+    # --- Admission ---
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: int = NEW):
+        """Holds a concurrency slot for the block; yields seconds spent queued."""
+        waited = await self._acquire(client, priority)
+        started = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self._release(client, time.monotonic() - started)
+
+    def _reject(self, reason: str, priority: int) -> AdmissionRejected:
+        ADMISSION_SHED.inc(reason=reason, priority=PRIORITY_NAMES[priority])
+        return AdmissionRejected(reason, self.retry_after())
+
+    async def _acquire(self, client: str, priority: int) -> float:
+        if priority != BATCH and self.per_client and self._clients.get(client, 0) >= self.per_client:
+            raise self._reject("client_limit", priority)
+
+        if not self.max_concurrent or (self.in_flight < self.max_concurrent and not self._waiters):
+            self._admit(client)
+            ADMISSION_WAIT.observe(0.0, priority=PRIORITY_NAMES[priority])
+            return 0.0
+
+        if priority != BATCH and self.queue_depth >= self.max_queue:
+            # A continuing thread may take the place of the newest new-thread waiter
+            evictable = [w for w in self._waiters if w.priority > priority and w.priority != BATCH]
+            if not evictable:
+                raise self._reject("queue_full", priority)
+            victim = max(evictable)
+            self._dequeue(victim)
+            victim.future.set_exception(self._reject("preempted", victim.priority))
+
+        waiter = _Waiter(priority, next(self._seq), client, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self._update_gauges()
+
+        started = time.monotonic()
+        try:
+            timeout = None if priority == BATCH else self.max_wait
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._dequeue(waiter)
+                raise self._reject("queue_timeout", priority)
+        except asyncio.CancelledError:
+            # Client went away while queued; give back the slot if it was granted meanwhile
+            if waiter.future.done() and not waiter.future.exception():
+                self._release(client, 0.0, observe=False)
+            elif not waiter.future.done():
+                self._dequeue(waiter)
+            raise
+        waiter.future.result()  # raises AdmissionRejected if preempted
+        waited = time.monotonic() - started
+        ADMISSION_WAIT.observe(waited, priority=PRIORITY_NAMES[priority])
+        return waited
+
+    def _admit(self, client: str) -> None:
+        self.in_flight += 1
+        self._clients[client] = self._clients.get(client, 0) + 1
+        self._update_gauges()
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        self._waiters.remove(waiter)
+        self._forget(waiter.client)
+        self._update_gauges()
+
+    def _forget(self, client: str) -> None:
+        remaining = self._clients.get(client, 0) - 1
+        if remaining > 0:
+            self._clients[client] = remaining
+        else:
+            self._clients.pop(client, None)
+
+    def _release(self, client: str, elapsed: float, observe: bool = True) -> None:
+        self.in_flight -= 1
+        self._forget(client)
+        if observe:
+            self._service_s = 0.8 * self._service_s + 0.2 * elapsed
+        # Hand freed slots to the highest-priority, longest-waiting turns
+        while self._waiters and self.in_flight < self.max_concurrent:
+            waiter = min(self._waiters)
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self.in_flight += 1  # client already counted while queued
+            waiter.future.set_result(None)
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        for priority, name in PRIORITY_NAMES.items():
+            ADMISSION_QUEUE_DEPTH.set(sum(1 for w in self._waiters if w.priority == priority), priority=name)
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+        log(f"Admission control: {_controller.max_concurrent or 'unlimited'} concurrent turns, "
+            f"{_controller.per_client or 'unlimited'} per client, queue {_controller.max_queue} "
+            f"(max wait {_controller.max_wait}s)")
+    return _controller
+
+
+def set_admission(controller: Optional[AdmissionController]) -> None:
+    """Replace the controller (tests and load benchmarks use different limits)."""
+    global _controller
+    _controller = controller
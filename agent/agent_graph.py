@@ -1,22 +1,47 @@
 import os
 import operator
 import json
-from typing import TypedDict, Annotated, Sequence, List, Optional
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import TypedDict, Annotated, Dict, Sequence, List, Optional, Tuple
 from enum import Enum
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import BaseMessage, AIMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_mongodb import MongoDBAtlasVectorSearch
+from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
 # from langchain_voyageai import VoyageAIEmbeddings
 from dotenv import load_dotenv
-import certifi
-from pymongo import MongoClient
 from pydantic import BaseModel, Field
+# Gemini embeddings, langchain_mongodb and pymongo are imported where first used;
+# together they are most of the import time, and local/replay runs never need them
 try:
-    from agent.tools import find_official_form, find_lawyer_referral
+    from agent.schemas import Citation, Option
+    from agent.tools import find_official_form, find_lawyer_referral, PARTIAL_NOTE
+    from agent.cache import CachedEmbeddings, llm_cache, retrieval_cache
+    from agent.llm_gateway import get_gateway, CircuitOpenError, LLMTimeoutError
+    from agent.deadline import budget_low, call_timeout, search_timeout, time_left, GENERATOR_RESERVE_S, MIN_CALL_BUDGET_S
+    from agent.metrics import FUSED_TURNS, RETRIEVAL_SCOPE, instrument_node, log, record_error, timed
+    from agent.cassette import docs_to_json, record_call
+    from agent.snapshot import load_local_store, load_snapshot
+    from agent.citations import evidence_from_doc, format_evidence, resolve_citations, verified_quote, citation_title
+    from agent.section_index import SectionIndex, parse_section_refs
+    from agent.index_registry import IndexSpec, load_registry, select_index
+    from agent.index_versions import CORPUS_ALIAS, alias_spec, get_alias
 except ImportError:
-    from tools import find_official_form, find_lawyer_referral
+    from schemas import Citation, Option
+    from tools import find_official_form, find_lawyer_referral, PARTIAL_NOTE
+    from cache import CachedEmbeddings, llm_cache, retrieval_cache
+    from llm_gateway import get_gateway, CircuitOpenError, LLMTimeoutError
+    from deadline import budget_low, call_timeout, search_timeout, time_left, GENERATOR_RESERVE_S, MIN_CALL_BUDGET_S
+    from metrics import FUSED_TURNS, RETRIEVAL_SCOPE, instrument_node, log, record_error, timed
+    from cassette import docs_to_json, record_call
+    from snapshot import load_local_store, load_snapshot
+    from citations import evidence_from_doc, format_evidence, resolve_citations, verified_quote, citation_title
+    from section_index import SectionIndex, parse_section_refs
+    from index_registry import IndexSpec, load_registry, select_index
+    from index_versions import CORPUS_ALIAS, alias_spec, get_alias
 
 
 load_dotenv()
@@ -59,21 +84,15 @@ class RouterOutput(BaseModel):
     missing_info_question: Optional[str] = Field(
         description="A specific clarification question if intent is CLARIFY or ASK_JURISDICTION."
     )
-
-class Option(BaseModel):
-    label: str = Field(description="Button label text")
-    action: str = Field(description="Action ID or value")
-    description: Optional[str] = Field(description="Tooltip or extra detail")
+    compare_jurisdictions: List[str] = Field(
+        description="Other provinces the user wants this answer compared with (e.g. 'ON vs BC rent rules' with Known Jurisdiction ON -> ['BC']). Empty unless the user asks for a comparison.",
+        default_factory=list
+    )
 
 class ResponseOutput(BaseModel):
     explanation: str = Field(
         description="The main body of the response, including direct answers, drafting text, or helpful explanations. Use Markdown."
     )
-class Citation(BaseModel):
-    source_title: str = Field(description="The name of the Act or Document (include Jurisdiction).")
-    quote: str = Field(description="The exact verbatim text quoted from the source.")
-    url: Optional[str] = Field(description="Direct URL to the source document if available in context.", default=None)
-
 class ResponseOutput(BaseModel):
     explanation: str = Field(
         description="The main body of the response, including direct answers, drafting text, or helpful explanations. Use Markdown."
@@ -87,36 +106,410 @@ class ResponseOutput(BaseModel):
         default_factory=list
     )
 
+class CitationRef(BaseModel):
+    id: str = Field(description="The bracketed ID of a Research item, e.g. ON-RTA-s48-1a2b3c.")
+    quote: str = Field(description="A short verbatim quote (one sentence) from that item supporting the answer.")
+
+class GeneratorOutput(BaseModel):
+    """What the generator LLM emits; citations are expanded into ResponseOutput server-side."""
+    explanation: str = Field(
+        description="The main body of the response, including direct answers, drafting text, or helpful explanations. Use Markdown."
+    )
+    citations: List[CitationRef] = Field(
+        description="Research items relied on, by ID, each with a short verbatim quote.",
+        default_factory=list
+    )
+    options: List[Option] = Field(
+        description="List of actionable options/buttons for the user.",
+        default_factory=list
+    )
+
+class FusedOutput(GeneratorOutput, RouterOutput):
+    """Fused mode: the router's fields and the generator's answer for a follow-up turn, from one call."""
+
 # --- State Definition ---
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     jurisdiction: Optional[str]
+    compare_jurisdictions: List[str] # Further provinces this turn compares against; researched alongside `jurisdiction`
     legal_issue: Optional[str]
     user_intent: str
     relevant_laws: List[str]
     draft: str # Used for clarification questions or drafts
     debug_logs: List[dict]
+    topic: Optional[str]
+    deadline: Optional[float] # Absolute epoch seconds; set per turn by the server
+    partial: bool # True when optional work was skipped to meet the deadline
+    evidence: List[dict] # Retrieved provisions (id, act, jurisdiction, section, url, text) the generator may cite
+    # The last answer's structured parts; its explanation is the final AIMessage's content
+    citations: List[dict]
+    options: List[dict]
+    fused_fallback: Optional[str] # Why the fused call's answer was dropped for the two-step path (None = kept)
 
 # --- LLM Setup ---
-llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash-exp", temperature=0)
+# All nodes go through the shared gateway (deadlines, retries, hedging, circuit breaker)
+llm = get_gateway()
 
 # --- Helpers ---
+EMBEDDING_MODEL = "models/text-embedding-004"
+INDEX_NAME = "vector_index"
+
+@lru_cache(maxsize=1)
+def get_mongo_client():
+    # One pooled client per process, shared by /chat, /chat/batch and warm-up runs
+    # Explicitly configure SSL for Railway/Linux environments
+    import certifi
+    from pymongo import MongoClient
+    return MongoClient(
+        os.getenv("MONGODB_URI"), 
+        tls=True,
+        tlsCAFile=certifi.where(),
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    )
+
 def get_db_connection():
     try:
-        # Explicitly configure SSL for Railway/Linux environments
-        client = MongoClient(
-            os.getenv("MONGODB_URI"), 
-            tls=True,
-            tlsCAFile=certifi.where(),
-            serverSelectionTimeoutMS=5000
-        )
-        return client["juris_db"]["legal_docs"]
+        return get_mongo_client()["juris_db"]["legal_docs"]
     except Exception as e:
-        print(f"DB Connection Error: {e}")
+        log(f"DB Connection Error: {e}")
         return None
 
+@lru_cache(maxsize=1)
 def get_embeddings():
-    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL)
+
+# Set by set_vector_store() to serve retrieval from a local index (benchmarks, replay, dev)
+_vector_store_override = None
+
+def set_vector_store(store):
+    """Route research_node to `store` instead of Atlas; pass None to restore Atlas."""
+    global _vector_store_override, _section_index, _corpus_categories
+    _vector_store_override = store
+    _section_index = None
+    _corpus_categories = None
+    retrieval_cache.clear()
+
+def has_vector_store_override() -> bool:
+    return _vector_store_override is not None
+
+def resolve_index(db) -> IndexSpec:
+    """
+    The version the corpus alias points at (agent/index_versions.py), else the
+    registered index built with EMBEDDING_MODEL. Raises IndexMismatch rather
+    than querying vectors from another model; falls back to legal_docs/vector_index
+    for deployments that predate the registry.
+    """
+    alias = get_alias(db, CORPUS_ALIAS)
+    if alias is not None:
+        spec = alias_spec(alias)
+        if spec.embedding_model == EMBEDDING_MODEL:
+            return spec
+        log(f"Alias {CORPUS_ALIAS} points at {spec.key} ({spec.embedding_model}); looking for a {EMBEDDING_MODEL} index")
+    specs = load_registry(db)
+    if not specs:
+        log(f"Index registry is empty; assuming {INDEX_NAME} on legal_docs holds {EMBEDDING_MODEL} vectors")
+        return IndexSpec("legal_docs", INDEX_NAME, EMBEDDING_MODEL, 0)
+    return select_index(specs, EMBEDDING_MODEL)
+
+@lru_cache(maxsize=1)
+def _atlas_vector_store():
+    col = get_db_connection()
+    if col is None:
+        return None
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+    spec = resolve_index(col.database)
+    log(f"Vector search: {spec.key} ({spec.embedding_model}, {spec.precision})")
+    return MongoDBAtlasVectorSearch(col.database[spec.collection], get_embeddings(), index_name=spec.index_name)
+
+# Seconds between checks of the corpus alias; a promotion or rollback is picked up within this
+ALIAS_REFRESH_S = float(os.getenv("ALIAS_REFRESH_S", "15"))
+_alias_generation = None
+_alias_checked = 0.0
+
+def _follow_alias():
+    """Rebuilds the Atlas store (and what is derived from it) when the corpus alias has moved."""
+    global _alias_generation, _alias_checked, _section_index, _corpus_categories
+    if time.monotonic() - _alias_checked < ALIAS_REFRESH_S:
+        return
+    _alias_checked = time.monotonic()
+    try:
+        doc = get_alias(get_mongo_client()["juris_db"], CORPUS_ALIAS)
+    except Exception as e:
+        log(f"Could not read corpus alias (keeping the current index): {e}")
+        return
+    generation = doc["generation"] if doc else None
+    if generation != _alias_generation:
+        if _alias_generation is not None or _atlas_vector_store.cache_info().currsize:
+            log(f"Corpus alias moved to {doc['current']['collection'] if doc else 'none'}; switching index")
+            _atlas_vector_store.cache_clear()
+            _section_index = None
+            _corpus_categories = None
+            retrieval_cache.clear()
+            # Cached answers quote the old corpus
+            llm_cache.clear()
+        _alias_generation = generation
+
+def refresh_alias():
+    """Re-reads the corpus alias now (after a promotion or rollback) instead of within ALIAS_REFRESH_S."""
+    global _alias_checked
+    _alias_checked = 0.0
+    _follow_alias()
+
+def get_corpus_collection():
+    """The collection research_node searches (the alias target), for tools that read the corpus directly."""
+    col = get_db_connection()
+    if col is None:
+        return None
+    return col.database[resolve_index(col.database).collection]
+
+@lru_cache(maxsize=1)
+def _snapshot_vector_store(path: str):
+    # Precomputed corpus (agent/snapshot.py): local index, no ingest or embedding calls
+    started = time.perf_counter()
+    store = load_local_store(load_snapshot(path), get_embeddings(), EMBEDDING_MODEL)
+    log(f"Loaded {len(store)} chunks from snapshot {path} in {time.perf_counter() - started:.2f}s")
+    return store
+
+def get_vector_store():
+    if _vector_store_override is not None:
+        return _vector_store_override
+    if os.getenv("CORPUS_SNAPSHOT"):
+        return _snapshot_vector_store(os.getenv("CORPUS_SNAPSHOT"))
+    _follow_alias()
+    store = _atlas_vector_store()
+    if store is None:
+        # Retry the connection on the next request instead of serving no store for the process
+        _atlas_vector_store.cache_clear()
+    return store
+
+def is_atlas(store) -> bool:
+    # Checked by name so local and replay stores never import langchain_mongodb
+    return type(store).__name__ == "MongoDBAtlasVectorSearch"
+
+# Built lazily from whichever corpus get_vector_store() serves
+_section_index = None
+
+def set_section_index(index):
+    """Serve direct section lookups from `index` (replay); reset by set_vector_store()."""
+    global _section_index
+    _section_index = index
+
+def get_section_index() -> SectionIndex:
+    global _section_index
+    if _section_index is None:
+        store = get_vector_store()
+        try:
+            if is_atlas(store):
+                index = SectionIndex.from_collection(store.collection)
+            else:
+                index = SectionIndex.from_documents(getattr(store, "documents", None) or [])
+        except Exception as e:
+            log(f"Section index unavailable: {e}")
+            index = SectionIndex()
+        log(f"Section index: {len(index)} (act, section) keys")
+        _section_index = index
+    return _section_index
+
+def jurisdiction_filter(jurisdiction: Optional[str]) -> dict:
+    """Atlas pre_filter: the user's jurisdiction plus federal law."""
+    if jurisdiction and jurisdiction != "General":
+        # Include specific jurisdiction AND Federal laws
+        return {"jurisdiction": {"$in": [jurisdiction, "FEDERAL"]}}
+    return {}
+
+# Categories present in the active corpus; None when unknown (then every partition is tried)
+_corpus_categories = None
+
+def get_corpus_categories() -> Optional[set]:
+    global _corpus_categories
+    if _corpus_categories is None:
+        store = get_vector_store()
+        try:
+            if is_atlas(store):
+                _corpus_categories = set(store.collection.distinct("category"))
+            elif getattr(store, "documents", None) is not None:
+                _corpus_categories = {d.metadata.get("category") for d in store.documents}
+        except Exception as e:
+            log(f"Corpus categories unavailable: {e}")
+    return _corpus_categories
+
+def retrieval_filters(jurisdiction: Optional[str], topic: Optional[str], categories: Optional[set] = None,
+                      partition: bool = False) -> List[dict]:
+    """
+    pre_filters from narrowest to widest: the topic's partition (category) of the
+    user's jurisdiction plus federal law, then the whole jurisdiction. The topic
+    partition is skipped when the corpus has no chunks in that category.
+    With partition=True the filters cover `jurisdiction` alone (no federal law).
+    """
+    if partition:
+        base = {"jurisdiction": jurisdiction} if jurisdiction and jurisdiction != "General" else {}
+    else:
+        base = jurisdiction_filter(jurisdiction)
+    filters = []
+    if topic and topic not in ("OTHER_LEGAL", "NON_LEGAL") and (categories is None or topic in categories):
+        filters.append({"$and": [base, {"category": topic}]} if base else {"category": topic})
+    filters.append(base)
+    return filters
+
+# --- Fan-out retrieval ---
+
+# Chunks taken from each provincial partition, and from federal law when a province also answered
+# (federal acts otherwise crowd the provincial ones out)
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+RETRIEVAL_FEDERAL_QUOTA = int(os.getenv("RETRIEVAL_FEDERAL_QUOTA", "2"))
+_search_pool = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_FANOUT_WORKERS", "8")), thread_name_prefix="retrieval")
+
+def search_partitions(jurisdiction: Optional[str], compare: Sequence[str] = ()) -> List[str]:
+    """Jurisdictions searched separately: the user's, any compared ones, then federal law. Empty = unfiltered."""
+    if not jurisdiction or jurisdiction == "General":
+        return []
+    partitions = []
+    for j in [jurisdiction, *compare, "FEDERAL"]:
+        j = (j or "").upper()
+        if j and j != "GENERAL" and j not in partitions:
+            partitions.append(j)
+    return partitions
+
+def _db_timeout(vstore, timeout: Optional[float]):
+    """Client-side operation timeout for an Atlas search (pymongo sends it as maxTimeMS)."""
+    if timeout is None or not is_atlas(vstore):
+        return nullcontext()
+    import pymongo
+    return pymongo.timeout(timeout)
+
+def _search(vstore, issue: str, filter_query: dict, k: int, oversampling: int, timeout: Optional[float] = None) -> list:
+    cache_key = (issue, json.dumps(filter_query, sort_keys=True), k)
+    results = retrieval_cache.get(cache_key)
+    search_started = time.perf_counter()
+    if results is None:
+        with timed("vector_search"), _db_timeout(vstore, timeout):
+            results = vstore.similarity_search(issue, k=k, pre_filter=filter_query, oversampling_factor=oversampling)
+        if results:
+            retrieval_cache.set(cache_key, results)
+    # Recorded even on cache hits so replay never depends on cache state
+    record_call("vector", issue, {"k": k, "pre_filter": filter_query}, docs_to_json(results),
+                (time.perf_counter() - search_started) * 1000)
+    return results
+
+def _is_timeout(error: BaseException) -> bool:
+    return isinstance(error, TimeoutError) or bool(getattr(error, "timeout", False))
+
+def fan_out(vstore, issue: str, filters: Dict[Optional[str], dict], k: int, oversampling: int,
+            deadline: Optional[float] = None) -> Tuple[Dict[Optional[str], list], bool]:
+    """
+    One search per partition, run concurrently: the wall time is that of the
+    slowest search, and never more than the request deadline allows once the
+    generator's reserve is held back (no search at all when nothing is). A
+    partition that does not answer in time contributes nothing; the second
+    value says whether any timed out.
+    """
+    timeout = search_timeout(deadline)
+    if timeout == 0:
+        # Nothing left beyond the generator's reserve
+        log("RESEARCH: Vector search skipped (no budget left); answering with partial results")
+        return {partition: [] for partition in filters}, True
+    if len(filters) == 1 and timeout is None:
+        (partition, filter_query), = filters.items()
+        return {partition: _search(vstore, issue, filter_query, k, oversampling)}, False
+    futures = {
+        partition: _search_pool.submit(contextvars.copy_context().run, _search, vstore, issue, filter_query, k, oversampling, timeout)
+        for partition, filter_query in filters.items()
+    }
+    wait(futures.values(), timeout=timeout)
+    results, timed_out = {}, False
+    for partition, future in futures.items():
+        if not future.done():
+            # Left to finish in the background; its result is not waited for
+            future.cancel()
+            timed_out = True
+            results[partition] = []
+        elif future.exception() is not None and _is_timeout(future.exception()):
+            timed_out = True
+            results[partition] = []
+        else:
+            results[partition] = future.result()
+    if timed_out:
+        log(f"RESEARCH: Vector search timed out after {timeout:.1f}s; answering with partial results")
+    return results, timed_out
+
+def merge_partitions(results: Dict[Optional[str], list], k: int = RETRIEVAL_K) -> list:
+    """
+    Interleaves the partitions' hits by rank (the user's jurisdiction first in
+    each round) under per-partition quotas; a chunk found twice is kept once.
+    """
+    provincial_hits = any(docs for partition, docs in results.items() if partition != "FEDERAL")
+    quotas = {p: RETRIEVAL_FEDERAL_QUOTA if p == "FEDERAL" and provincial_hits else k for p in results}
+    merged, seen = [], set()
+    for rank in range(k):
+        for partition, docs in results.items():
+            if rank < min(len(docs), quotas[partition]):
+                doc = docs[rank]
+                key = doc.metadata.get("chunk_id") or doc.page_content
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(doc)
+    return merged
+
+def search_jurisdictions(vstore, issue: str, jurisdiction: Optional[str], topic: Optional[str],
+                         categories: Optional[set], compare: Sequence[str] = (), k: int = RETRIEVAL_K,
+                         oversampling: int = 10, deadline: Optional[float] = None) -> Tuple[list, str, bool]:
+    """
+    Fans the search out over search_partitions() and merges the hits. Each
+    partition is searched within the topic first; only when no partition
+    finds anything there are the whole partitions searched. Returns the
+    merged documents, the scope that answered (topic, jurisdiction, none)
+    and whether a search ran out of time (no wider round is tried then).
+    """
+    partitions = search_partitions(jurisdiction, compare) or [None]
+    plans = {p: retrieval_filters(p, topic, categories, partition=p is not None) for p in partitions}
+    rounds = len(next(iter(plans.values())))
+    for scope, i in zip(["topic", "jurisdiction"][-rounds:], range(rounds)):
+        results, timed_out = fan_out(vstore, issue, {p: filters[i] for p, filters in plans.items()}, k, oversampling, deadline)
+        merged = merge_partitions(results, k)
+        if merged or timed_out:
+            return merged, scope if merged else "none", timed_out
+    return [], "none", False
+
+# --- Prompts ---
+# Shared by the two-step path (router, generator) and the fused follow-up call
+
+TOPIC_GUIDE = """    TOPIC CLASSIFICATION:
+    - TENANCY: Landlord/Tenant issues (RTA).
+    - FAMILY: Divorce, custody, support.
+    - IMMIGRATION: Visas, refugee, citizenship.
+    - EMPLOYMENT: Wages, severance, dismissal.
+    - CRIMINAL: Shoplifting, assault, DUI, Criminal Code.
+    - TAX: Income tax, CRA, GST/HST.
+    - BUSINESS: Corporations, incorporation, partnerships.
+    - OTHER_LEGAL: Personal Injury, Intellectual Property (We do NOT have these).
+    - NON_LEGAL: Chitchat.
+    
+    CRITICAL RULE:
+    - If Topic is OTHER_LEGAL (e.g. IP Law), we CANNOT help. Set intent to OFF_TOPIC.
+    - If Topic is NON_LEGAL, set intent to OFF_TOPIC."""
+
+ANSWER_INSTRUCTIONS = """    TASK: Generate a helpful, formatted response.
+    
+    1. IF CLARIFY: Ask the specific clarification question politely.
+    2. IF OFF_TOPIC: Politely decline.
+    3. IF ADVICE: Explain the law, reference research, and give next steps.
+    4. IF DRAFT: Write the document text in the 'explanation' field.
+    5. IF FORM: Provide form name and context.
+    6. IF REFERRAL/DIRECTORY: If research contains links to directories or referral services, DISPLAY THEM. Do not refuse.
+    7. IF COMPARING JURISDICTIONS: answer for each jurisdiction in turn, citing only that jurisdiction's Research items, then summarize the differences.
+    
+    IMPORTANT INSTRUCTIONS FOR CITATIONS:
+    - Each Research item starts with a bracketed ID, e.g. [ON-RTA-s48-1a2b3c].
+    - For each item you rely on, add a 'citations' entry with that 'id' and a short verbatim 'quote' (one sentence) from its Content.
+    - Do NOT write titles or URLs; they are filled in from the ID.
+    
+    IMPORTANT: 'options' should be buttons for likely user next steps.
+    
+    SPECIAL HANDLING:
+    - If user asks about OTHER_LEGAL (Topic=OTHER_LEGAL), politely decline.
+    - If Research says "No specific documents found" and topic is supposedly covered, advise checking official government sites."""
 
 # --- Nodes ---
 
@@ -128,9 +521,6 @@ def router_node(state: AgentState):
     current_jur = state.get('jurisdiction')
     logs = state.get('debug_logs', [])
     
-    # Configure LLM for Router Output
-    structured_llm = llm.with_structured_output(RouterOutput)
-    
     # Get last few messages for context
     # We explicitly provide system instructions here
     system_prompt = f"""You are a Smart Legal Assistant Router.
@@ -144,6 +534,8 @@ def router_node(state: AgentState):
     - If 'Known Jurisdiction' is SET (ON/BC/AB), keep it unless user EXPLICITLY changes it.
     - If 'Known Jurisdiction' is UNKNOWN, try to detect it in input.
     - If still UNKNOWN after checking input and history, intent MUST be 'ASK_JURISDICTION'.
+    - If the user asks to COMPARE provinces ("ON vs BC", "how is this different in Alberta"), list the
+      other provinces (codes) in 'compare_jurisdictions' and keep the Known Jurisdiction as detected_jurisdiction.
     
     INTENT CATEGORIES:
     - ADVICE: User asks a legal question.
@@ -153,20 +545,7 @@ def router_node(state: AgentState):
     - OFF_TOPIC: Not about law (e.g. recipes, weather).
     - ASK_JURISDICTION: You need to know where they are.
     
-    TOPIC CLASSIFICATION:
-    - TENANCY: Landlord/Tenant issues (RTA).
-    - FAMILY: Divorce, custody, support.
-    - IMMIGRATION: Visas, refugee, citizenship.
-    - EMPLOYMENT: Wages, severance, dismissal.
-    - CRIMINAL: Shoplifting, assault, DUI, Criminal Code.
-    - TAX: Income tax, CRA, GST/HST.
-    - BUSINESS: Corporations, incorporation, partnerships.
-    - OTHER_LEGAL: Personal Injury, Intellectual Property (We do NOT have these).
-    - NON_LEGAL: Chitchat.
-    
-    CRITICAL RULE:
-    - If Topic is OTHER_LEGAL (e.g. IP Law), we CANNOT help. Set intent to OFF_TOPIC.
-    - If Topic is NON_LEGAL, set intent to OFF_TOPIC.
+{TOPIC_GUIDE}
     
     OUTPUT:
     Return a valid RouterOutput object.
@@ -176,7 +555,12 @@ def router_node(state: AgentState):
         # Invoke with system prompt + history
         # We wrap messages to ensure correct format
         input_msgs = [SystemMessage(content=system_prompt)] + messages[-5:]
-        result: RouterOutput = structured_llm.invoke(input_msgs)
+        # Hold back enough of the budget for the generator call (at most half of what's left)
+        deadline = state.get("deadline")
+        timeout = call_timeout(deadline, reserve=min(GENERATOR_RESERVE_S, time_left(deadline) / 2))
+        if timeout is not None and timeout < MIN_CALL_BUDGET_S:
+            raise LLMTimeoutError("No budget left for routing")
+        result: RouterOutput = llm.invoke_structured(RouterOutput, input_msgs, timeout=timeout)
         
         updates = {
             "user_intent": result.intent.value,
@@ -188,16 +572,40 @@ def router_node(state: AgentState):
         # Heuristic: If we detected a new jurisdiction, update.
         if result.detected_jurisdiction:
             updates["jurisdiction"] = result.detected_jurisdiction
+        # Comparisons are per turn; a follow-up without one goes back to a single jurisdiction
+        primary = updates.get("jurisdiction", current_jur)
+        updates["compare_jurisdictions"] = [j for j in search_partitions(primary, result.compare_jurisdictions)
+                                            if j not in (primary, "FEDERAL")]
         
         # Store the question if we need to ask it
         if result.missing_info_question:
             updates["draft"] = result.missing_info_question
             
-        print(f"ROUTER: Intent={result.intent.value}, Topic={result.topic.value}, Jur={updates.get('jurisdiction', current_jur)}")
+        log(f"ROUTER: Intent={result.intent.value}, Topic={result.topic.value}, Jur={updates.get('jurisdiction', current_jur)}")
         return updates
         
+    except (CircuitOpenError, LLMTimeoutError) as e:
+        # Degraded mode: skip the LLM, keep the known jurisdiction and search on the raw message
+        log(f"Router Degraded: {e}")
+        last_text = messages[-1].content if messages else ""
+        if not current_jur:
+            return {
+                "user_intent": "ASK_JURISDICTION",
+                "draft": None,
+                "partial": True,
+                "debug_logs": logs + [{"node": "router_degraded", "error": str(e)}]
+            }
+        return {
+            "user_intent": "ADVICE",
+            "legal_issue": last_text,
+            "compare_jurisdictions": [],
+            "partial": True,
+            "debug_logs": logs + [{"node": "router_degraded", "error": str(e)}]
+        }
+        
     except Exception as e:
-        print(f"Router Error: {e}")
+        log(f"Router Error: {e}")
+        record_error("router", state)
         # Fallback safe mode
         return {
             "user_intent": "CLARIFY",
@@ -213,12 +621,14 @@ def research_node(state: AgentState):
     
     # Skip research for non-substantive intents
     if intent in ["CLARIFY", "ASK_JURISDICTION", "OFF_TOPIC"]:
-        return {"relevant_laws": []}
+        return {"relevant_laws": [], "evidence": []}
     
     issue = state.get("legal_issue", "")
     jurisdiction = state.get("jurisdiction", "ON")
+    deadline = state.get("deadline")
     
-    print(f"RESEARCH: Searching '{issue}' in '{jurisdiction}'")
+    log(f"RESEARCH: Searching '{issue}' in '{jurisdiction}'"
+        f"{' vs ' + ', '.join(state['compare_jurisdictions']) if state.get('compare_jurisdictions') else ''} ({time_left(deadline):.1f}s left)")
     
     # --- Tool Dispatch Logic ---
     
@@ -226,83 +636,97 @@ def research_node(state: AgentState):
     if intent == "FORM":
         # Extract form name from issue (heuristic or use LLM extraction, simplify for now)
         # In a real app, Router should extract 'form_name'
-        form_result = find_official_form(issue, jurisdiction)
-        return {"relevant_laws": [form_result]}
+        form_result = find_official_form(issue, jurisdiction, deadline=deadline)
+        return {"relevant_laws": [form_result], "evidence": [], "partial": state.get("partial") or PARTIAL_NOTE in form_result}
+
+    # The user's own words: the router's summary may drop the city or the section reference
+    user_text = next((m.content for m in reversed(state.get("messages", [])) if isinstance(m, HumanMessage)), "")
 
     # 2. Lawyer/Professional Finder (Heuristic: "find a lawyer", "hire help")
     # If the user explicitly asks for representation, we skip Vector DB and go to Referral.
     trigger_words = ["lawyer", "paralegal", "help me find", "directory", "referral", "representation"]
     if any(w in issue.lower() for w in trigger_words):
-        # Attempt to extract a more specific location from the issue text
-        # Simple heuristic: Look for common cities or just pass the issue if it's short
-        # Better: Use the LLM to extract "Specific Location" in the Router, but for now:
-        search_location = jurisdiction or "Ontario"
-        
-        # If the issue mentions a specific city, append it to the search
-        # This is a basic improvement. In a real app, we'd use an NER entity extractor.
-        # Let's trust the tool's search flexibility.
-        
-        referral_result = find_lawyer_referral(search_location, state.get("topic", "General"))
-        
-        # Add a specific city-based search if analyzing the text reveals one (Quick Regex or list)
-        # For Hackathon: Just let the user's "in Toronto" flow through if we pass the whole issue?
-        # The tool currently takes 'location'.
-        # Let's try to pass the 'issue' context to the tool if it seems to contain a location.
-        if " in " in issue:
-            # "Lawyer in Toronto" -> split
-            try:
-                potential_loc = issue.split(" in ")[1].split()[0].strip("?.")
-                if len(potential_loc) > 3:
-                     search_location = f"{potential_loc}, {jurisdiction}"
-            except:
-                pass
-
-        referral_result = find_lawyer_referral(search_location, state.get("topic", "General"))
-        return {"relevant_laws": [referral_result]}
+        # The city ("near North York", "in St. Catharines") is resolved from the bundled gazetteer
+        referral_result = find_lawyer_referral(f"{user_text}\n{issue}", jurisdiction, state.get("topic", "General"), deadline=deadline)
+        return {"relevant_laws": [referral_result], "evidence": [], "partial": state.get("partial") or PARTIAL_NOTE in referral_result}
 
     # 3. Vector DB Search (Standard Path)
+    if time_left(deadline) <= 0:
+        return {"relevant_laws": ["No specific legal documents found."], "evidence": [], "partial": True}
+    
+    # Explicit references ("s. 48 of the RTA") are a key lookup; vector search is the fallback
+    refs = parse_section_refs(f"{user_text}\n{issue}", jurisdiction, state.get("topic"))
+    if refs:
+        lookup_started = time.perf_counter()
+        with timed("section_lookup"):
+            docs = get_section_index().lookup_all(refs)
+        record_call("section", ",".join(map(str, refs)), {}, docs_to_json(docs),
+                    (time.perf_counter() - lookup_started) * 1000)
+        if docs:
+            log(f"RESEARCH: Direct lookup {[(r.act_code, r.section) for r in refs]} -> {len(docs)} chunks")
+            evidence = [evidence_from_doc(d) for d in docs]
+            return {"relevant_laws": [format_evidence(e) for e in evidence], "evidence": evidence, "partial": bool(state.get("partial"))}
+    
+    # Over-fetch (HNSW candidate oversampling) is optional work: trim it when time is short
+    low_budget = budget_low(deadline)
+    oversampling = 3 if low_budget else 10
+    
     try:
-        col = get_db_connection()
-        if col is None: 
-            return {"relevant_laws": ["Error: Database connection failed."]}
+        vstore = get_vector_store()
+        if vstore is None: 
+            return {"relevant_laws": ["Error: Database connection failed."], "evidence": []}
         
-        vstore = MongoDBAtlasVectorSearch(col, get_embeddings(), index_name="vector_index")
+        # One concurrent search per jurisdiction (the user's, compared ones, federal), topic partition first
+        compare = state.get("compare_jurisdictions") or []
+        results, scope, timed_out = search_jurisdictions(vstore, issue, jurisdiction, state.get("topic"), get_corpus_categories(),
+                                                         compare, oversampling=oversampling, deadline=deadline)
+        RETRIEVAL_SCOPE.inc(scope=scope)
         
-        # Filter by Topic + Jurisdiction
-        if jurisdiction and jurisdiction != "General":
-            # Include specific jurisdiction AND Federal laws
-            filter_query = {"jurisdiction": {"$in": [jurisdiction, "FEDERAL"]}}
-        else:
-            filter_query = {}
-        
-        results = vstore.similarity_search(issue, k=3, pre_filter=filter_query)
-        
-        # Map filenames to Official URLs (Hack fix for ingestion missing URLs)
-        SOURCE_URL_MAP = {
-            "ontario_rta.html": "https://www.ontario.ca/laws/statute/06r17",
-            "criminal_code.xml": "https://laws-lois.justice.gc.ca/eng/acts/C-46/",
-            "income_tax.xml": "https://laws-lois.justice.gc.ca/eng/acts/I-3.3/",
-            "excise_tax.xml": "https://laws-lois.justice.gc.ca/eng/acts/E-15/",
-            "immigration.xml": "https://laws-lois.justice.gc.ca/eng/acts/I-2.5/"
-        }
-        
-        laws = []
-        for d in results:
-            src = d.metadata.get('source', 'Unknown')
-            # Use metadata URL or fallback to the hardcoded map
-            url = d.metadata.get('url') or SOURCE_URL_MAP.get(src, "")
-            
-            txt = d.page_content[:1500]
-            laws.append(f"Source: {src}\nURL: {url}\nContent: {txt}")
+        # Stable IDs, act/section titles and URLs come from the citation index, not the LLM
+        evidence = [evidence_from_doc(d) for d in results]
+        laws = [format_evidence(e) for e in evidence]
             
         if not laws:
             laws = ["No specific legal documents found."]
             
-        return {"relevant_laws": laws}
+        return {"relevant_laws": laws, "evidence": evidence, "partial": state.get("partial") or low_budget or timed_out}
         
     except Exception as e:
-        print(f"Research Error: {e}")
-        return {"relevant_laws": [f"Error searching database: {e}"]}
+        log(f"Research Error: {e}")
+        record_error("vector_search", state)
+        return {"relevant_laws": [f"Error searching database: {e}"], "evidence": []}
+
+def degraded_response(state: AgentState) -> dict:
+    """
+    Fast fallback payload used while the LLM circuit is open.
+    """
+    research = [r for r in state.get("relevant_laws", []) if r]
+    if state.get("user_intent") in ["ADVICE", "DRAFT", "FORM"] and research:
+        explanation = (
+            "Our AI assistant is temporarily unavailable, so here is the most relevant material we found:\n\n"
+            + "\n\n---\n\n".join(research)
+        )
+    else:
+        explanation = "Our AI assistant is temporarily unavailable. Please try again in a minute."
+    citations = [
+        {"id": e["id"], "source_title": citation_title(e), "quote": verified_quote("", e["text"]), "url": e["url"] or None}
+        for e in state.get("evidence") or []
+    ]
+    return {"explanation": explanation, "citations": citations, "options": [], "partial": True}
+
+def answer(response: dict) -> dict:
+    """
+    State update for a generated response: the explanation becomes the AIMessage
+    (conversation history), citations and options are kept as structured state.
+    """
+    update = {
+        "messages": [AIMessage(content=response["explanation"])],
+        "citations": response.get("citations") or [],
+        "options": response.get("options") or [],
+    }
+    if response.get("partial"):
+        update["partial"] = True
+    return update
 
 def response_generator_node(state: AgentState):
     """
@@ -314,7 +738,7 @@ def response_generator_node(state: AgentState):
     # 1. Handle ASK_JURISDICTION manually or with helper
     if intent == "ASK_JURISDICTION":
         msg = state.get("draft") or "To help you better, I need to know your location. Which province are you in?"
-        payload = {
+        return answer({
             "explanation": msg,
             "citations": [],
             "options": [
@@ -322,69 +746,190 @@ def response_generator_node(state: AgentState):
                 {"label": "British Columbia", "action": "British Columbia", "description": "BC"},
                 {"label": "Alberta", "action": "Alberta", "description": "AB"}
             ]
-        }
-        return {"messages": [AIMessage(content=json.dumps(payload))]}
+        })
 
     # 2. General Case using Structured Output
-    structured_llm = llm.with_structured_output(ResponseOutput)
-    
+    research = "\n\n".join(state.get("relevant_laws") or [])
+    compare = state.get("compare_jurisdictions") or []
     prompt = f"""You are a Senior Legal Assistant.
     
     CONTEXT:
     - Intent: {intent}
-    - Jurisdiction: {jurisdiction}
+    - Jurisdiction: {jurisdiction}{' (compare with ' + ', '.join(compare) + ')' if compare else ''}
     - Issue: {state.get('legal_issue')}
-    - Research: {state.get('relevant_laws')}
-    
-    TASK: Generate a helpful, formatted response.
-    
-    1. IF CLARIFY: Ask the specific clarification question politely.
-    2. IF OFF_TOPIC: Politely decline.
-    3. IF ADVICE: Explain the law, reference research, and give next steps.
-    4. IF DRAFT: Write the document text in the 'explanation' field.
-    5. IF FORM: Provide form name and context.
-    6. IF REFERRAL/DIRECTORY: If research contains links to directories or referral services, DISPLAY THEM. Do not refuse.
+    - Research:
+{research}
     
-    IMPORTANT INSTRUCTIONS FOR CITATIONS:
-    - You MUST populate the 'citations' list with exact 'source_title', 'quote', and 'url'.
-    - Look at the 'Research' context provided above. It has 'Source', 'URL', and 'Content'.
-    - EXTRACT the 'URL' field for each law you reference.
-    - EXTRACT a brief verbatim 'Quote' that supports your advice.
-    
-    IMPORTANT: 'options' should be buttons for likely user next steps.
-    
-    SPECIAL HANDLING:
-    - If user asks about OTHER_LEGAL (Topic=OTHER_LEGAL), politely decline.
-    - If Research says "No specific documents found" and topic is supposedly covered, advise checking official government sites.
+{ANSWER_INSTRUCTIONS}
     """
     
     try:
         input_msgs = [SystemMessage(content=prompt)] + state['messages'][-5:]
-        result: ResponseOutput = structured_llm.invoke(input_msgs)
-        
-        # Convert Pydantic to Dict for JSON serialization in Message Content
-        # The frontend expects a JSON string
-        response_dict = result.model_dump()
+        timeout = call_timeout(state.get("deadline"))
+        if timeout is not None and timeout < MIN_CALL_BUDGET_S:
+            raise LLMTimeoutError("No budget left for generation")
+        result: GeneratorOutput = llm.invoke_structured(GeneratorOutput, input_msgs, timeout=timeout)
+        response = ResponseOutput(
+            explanation=result.explanation,
+            citations=resolve_citations(result.citations, state.get("evidence") or []),
+            options=result.options,
+        )
+        return answer(response.model_dump())
         
-        return {"messages": [AIMessage(content=json.dumps(response_dict))]}
+    except (CircuitOpenError, LLMTimeoutError) as e:
+        # Degraded mode: return the retrieved research verbatim instead of waiting on Gemini
+        log(f"Generator Degraded: {e}")
+        return answer(degraded_response(state))
         
     except Exception as e:
-        print(f"Generator Error: {e}")
-        err_payload = {"explanation": "I'm having trouble generating a response right now.", "citations": [], "options": []}
-        return {"messages": [AIMessage(content=json.dumps(err_payload))]}
+        log(f"Generator Error: {e}")
+        record_error("generator", state)
+        return answer({"explanation": "I'm having trouble generating a response right now.", "citations": [], "options": []})
+
+# --- Fused mode ---
+# Follow-up turns with a known jurisdiction skip the separate router call: research
+# runs on the raw message and one structured call both routes and answers. Turns the
+# fused answer can't serve fall back to router -> research -> generator.
+FUSED_ROUTING = os.getenv("FUSED_ROUTING", "0") == "1"
+
+def entry_route(state: AgentState) -> str:
+    """Fused path for follow-ups once the jurisdiction is known; the two-step path otherwise."""
+    if not FUSED_ROUTING or not state.get("jurisdiction"):
+        return "router"
+    follow_up = any(isinstance(m, AIMessage) for m in state["messages"][:-1])
+    return "fused_research" if follow_up else "router"
+
+def fused_research_node(state: AgentState):
+    """
+    Research for the fused path: the raw user message is the query, within
+    the jurisdiction and topic carried over from the previous turn.
+    """
+    messages = state["messages"]
+    raw = messages[-1].content if messages else ""
+    research = research_node({**state, "user_intent": "ADVICE", "legal_issue": raw, "compare_jurisdictions": []})
+    return {**research, "fused_fallback": None}
+
+def fused_fallback_reason(result: FusedOutput, jurisdiction: str, topic: Optional[str]) -> Optional[str]:
+    """Why the fused answer can't be used (None = use it): the research it was given doesn't fit the turn."""
+    intent = result.intent.value
+    if intent == "CLARIFY":
+        return "clarify"
+    if intent == "ASK_JURISDICTION":
+        return "ask_jurisdiction"
+    if result.detected_jurisdiction and result.detected_jurisdiction.upper() != jurisdiction:
+        return "jurisdiction_changed"
+    if any(j.upper() != jurisdiction for j in result.compare_jurisdictions):
+        return "compare"
+    if intent == "FORM":
+        # The form finder only runs on the two-step path
+        return "form"
+    if intent != "OFF_TOPIC" and topic and result.topic.value != topic:
+        return "topic_changed"
+    return None
+
+def fused_node(state: AgentState):
+    """
+    One structured call that routes and answers a follow-up turn. Returns the
+    routing fields plus the answer, or only `fused_fallback` when the turn
+    needs the two-step path.
+    """
+    messages = state["messages"]
+    jurisdiction = state.get("jurisdiction")
+    topic = state.get("topic")
+    logs = state.get("debug_logs", [])
+    research = "\n\n".join(state.get("relevant_laws") or [])
+    raw = messages[-1].content if messages else ""
+
+    prompt = f"""You are a Senior Legal Assistant. The user is following up in an ongoing conversation:
+    classify their latest message AND answer it, in one reply.
+    
+    CURRENT STATE:
+    - Known Jurisdiction: {jurisdiction}
+    - Previous Topic: {topic or "UNKNOWN"}
+    - Research (retrieved for the latest message as written):
+{research}
+    
+    ROUTING:
+    - Set 'detected_jurisdiction' only if the user EXPLICITLY changes province; otherwise return null.
+    - If the user asks to COMPARE provinces, list the other provinces (codes) in 'compare_jurisdictions'.
+    - Intent is one of ADVICE, DRAFT, FORM, CLARIFY (vague/unclear; put the question in 'missing_info_question'),
+      OFF_TOPIC, ASK_JURISDICTION.
+    - 'legal_issue' is a 1-sentence summary of the issue, including context from earlier turns.
+    
+{TOPIC_GUIDE}
+    
+    ANSWER:
+{ANSWER_INSTRUCTIONS}
+    """
+
+    try:
+        input_msgs = [SystemMessage(content=prompt)] + messages[-5:]
+        timeout = call_timeout(state.get("deadline"))
+        if timeout is not None and timeout < MIN_CALL_BUDGET_S:
+            raise LLMTimeoutError("No budget left for the fused call")
+        result: FusedOutput = llm.invoke_structured(FusedOutput, input_msgs, timeout=timeout)
+
+    except (CircuitOpenError, LLMTimeoutError) as e:
+        # Research is already done: answer with it verbatim, like the degraded generator
+        log(f"Fused Degraded: {e}")
+        FUSED_TURNS.inc(outcome="degraded")
+        return {
+            "user_intent": "ADVICE",
+            "legal_issue": raw,
+            "compare_jurisdictions": [],
+            "debug_logs": logs + [{"node": "fused_degraded", "error": str(e)}],
+            **answer(degraded_response({**state, "user_intent": "ADVICE"})),
+        }
+
+    except Exception as e:
+        log(f"Fused Error: {e}")
+        record_error("fused", state)
+        FUSED_TURNS.inc(outcome="fallback:error")
+        return {"fused_fallback": "error", "debug_logs": logs + [{"node": "fused_error", "error": str(e)}]}
+
+    reason = fused_fallback_reason(result, jurisdiction, topic)
+    if reason:
+        log(f"FUSED: falling back to the two-step path ({reason})")
+        FUSED_TURNS.inc(outcome=f"fallback:{reason}")
+        return {"fused_fallback": reason, "debug_logs": logs + [{"node": "fused_fallback", "reason": reason, "result": result.model_dump()}]}
+
+    log(f"FUSED: Intent={result.intent.value}, Topic={result.topic.value}, Jur={jurisdiction}")
+    FUSED_TURNS.inc(outcome="answered")
+    # A declined question cites nothing, as on the two-step path (which skips research for it)
+    evidence = [] if result.intent.value == "OFF_TOPIC" else state.get("evidence") or []
+    response = ResponseOutput(
+        explanation=result.explanation,
+        citations=resolve_citations(result.citations, evidence),
+        options=result.options,
+    )
+    return {
+        "user_intent": result.intent.value,
+        "legal_issue": result.legal_issue,
+        "topic": result.topic.value,
+        "compare_jurisdictions": [],
+        "debug_logs": logs + [{"node": "fused", "result": result.model_dump()}],
+        **answer(response.model_dump()),
+    }
+
+def after_fused(state: AgentState) -> str:
+    return "router" if state.get("fused_fallback") else END
 
 # --- Graph Construction ---
 workflow = StateGraph(AgentState)
 
-workflow.add_node("router", router_node)
-workflow.add_node("research", research_node)
-workflow.add_node("generator", response_generator_node)
+workflow.add_node("router", instrument_node("router")(router_node))
+workflow.add_node("research", instrument_node("research")(research_node))
+workflow.add_node("generator", instrument_node("generator")(response_generator_node))
+workflow.add_node("fused_research", instrument_node("fused_research")(fused_research_node))
+workflow.add_node("fused", instrument_node("fused")(fused_node))
 
-workflow.set_entry_point("router")
+workflow.set_conditional_entry_point(entry_route, {"router": "router", "fused_research": "fused_research"})
 
 workflow.add_edge("router", "research")
 workflow.add_edge("research", "generator")
 workflow.add_edge("generator", END)
+workflow.add_edge("fused_research", "fused")
+workflow.add_conditional_edges("fused", after_fused, {"router": "router", END: END})
 
 memory = MemorySaver()
 app = workflow.compile(checkpointer=memory)
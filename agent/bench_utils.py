@@ -0,0 +1,70 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile; q in [0, 1]."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(samples: Sequence[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    """count/mean/p50/p95/p99/max, in milliseconds by default."""
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples) * scale, 3),
+        "p50": round(percentile(samples, 0.50) * scale, 3),
+        "p95": round(percentile(samples, 0.95) * scale, 3),
+        "p99": round(percentile(samples, 0.99) * scale, 3),
+        "max": round(max(samples) * scale, 3),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def save_results(results: dict, out_path: Optional[str], prefix: str) -> str:
+    """Writes results as JSON; defaults to bench_results/<prefix>-<timestamp>.json."""
+    if not out_path:
+        os.makedirs("bench_results", exist_ok=True)
+        out_path = os.path.join("bench_results", f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return out_path
+
+
+def compare_latency(current: Dict[str, dict], baseline: Dict[str, dict], fields: Sequence[str] = ("p50", "p95", "p99")) -> List[str]:
+    """Human-readable deltas between two {name: summarize(...)} maps."""
+    lines = []
+    for name in sorted(set(current) | set(baseline)):
+        cur, base = current.get(name, {}), baseline.get(name, {})
+        parts = []
+        for field in fields:
+            a, b = cur.get(field), base.get(field)
+            if a is None or b is None:
+                continue
+            delta = (a - b) / b * 100 if b else 0.0
+            parts.append(f"{field} {b:.1f} -> {a:.1f}ms ({delta:+.1f}%)")
+        if parts:
+            lines.append(f"  {name}: " + ", ".join(parts))
+    return lines
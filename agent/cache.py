@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+try:
+    from agent.metrics import REGISTRY, record_cache, timed
+except ImportError:
+    from metrics import REGISTRY, record_cache, timed
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache with per-entry expiry.
+    Shared by every request path (live /chat, /chat/batch, warm-up jobs).
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 3600.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        record_cache(self.name, entry is not None)
+        return default if entry is None else entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+# Process-wide caches
+embedding_cache = TTLCache(
+    "embedding",
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL_S", "86400")),
+)
+retrieval_cache = TTLCache(
+    "retrieval",
+    maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL_S", "3600")),
+)
+# Structured LLM outputs by exact prompt (same question, thread state and research).
+# Off unless LLM_CACHE_TTL_S is set: a hit is shared across users and skips the
+# model, so answers (and prompt fixes) only change once the entry expires. The
+# corpus alias moving clears it.
+llm_cache = TTLCache(
+    "llm",
+    maxsize=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL_S", "0")),
+)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so repeated queries skip the embedding call.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str, cache: Optional[TTLCache] = None):
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache if cache is not None else embedding_cache
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model_name, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            with timed("embedding"):
+                vector = self.inner.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Bulk (ingest) path: no caching, these are one-off
+        with timed("embedding_batch"):
+            return self.inner.embed_documents(texts)
+
+
+_caches = [embedding_cache, retrieval_cache, llm_cache]
+
+def _collect_cache_sizes():
+    yield "# HELP juris_cache_entries Entries currently held per cache."
+    yield "# TYPE juris_cache_entries gauge"
+    for cache in _caches:
+        yield f'juris_cache_entries{{cache="{cache.name}"}} {len(cache)}'
+
+REGISTRY.register_collector(_collect_cache_sizes)
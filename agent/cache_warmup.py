@@ -0,0 +1,382 @@
+"""
+Cache warm-up from query logs and curated FAQs.
+
+After a deploy or a cache flush the first user to ask a common question pays
+for the whole router -> research -> generator path. warm() runs the most
+frequent logged questions and the curated FAQs (agent/data/faqs.json) through
+the compiled graph as first turns on throwaway threads, with bounded
+concurrency. Because the prompts are exactly the ones a real first turn
+produces, this fills the serving caches as a side effect: query embeddings,
+retrieval results and the router/generator outputs. A second pass then
+replays the same questions to measure how much of them the caches now answer.
+
+That is only worth its Gemini calls when the LLM response cache is on
+(LLM_CACHE_TTL_S; off by default). Otherwise each question is just embedded
+and searched per jurisdiction, with no LLM call and no verify pass. Real
+turns search with the router's issue summary and topic, so this warms the
+embeddings and jurisdiction-wide results for questions that reach research
+as asked (fused follow-ups, degraded routing) rather than every path.
+
+The caches live in the serving process, so the job runs there: on start-up
+with CACHE_WARMUP_ON_START=1, or via POST /admin/cache/warmup. Run from the
+command line, it reports what a run would cover and how the questions route:
+
+    python -m agent.cache_warmup --dry-run --queries logs/queries.jsonl
+    python -m agent.cache_warmup --offline                   # FAQs through local stand-ins
+    python -m agent.cache_warmup --queries logs/queries.jsonl --limit 100 --concurrency 8
+
+Query logs are JSON lines ({"message": ..., "jurisdiction": ..., "count": ...};
+`query` / `text` also work), plain text with one question per line, or
+recorded cassettes (*.json.gz). Questions that still look like they carry
+personal details (emails, phone numbers, postal codes) are skipped.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import HumanMessage
+
+try:
+    from agent import startup
+    from agent.admission import BATCH, AdmissionRejected
+    from agent.cache import embedding_cache, llm_cache, retrieval_cache
+    from agent.deadline import new_deadline
+    from agent.metrics import log
+except ImportError:
+    import startup
+    from admission import BATCH, AdmissionRejected
+    from cache import embedding_cache, llm_cache, retrieval_cache
+    from deadline import new_deadline
+    from metrics import log
+
+FAQ_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "faqs.json")
+CACHE_WARMUP_ON_START = os.getenv("CACHE_WARMUP_ON_START", "0") == "1"
+# Comma-separated query log paths/globs read by the start-up run
+CACHE_WARMUP_QUERIES = [p for p in os.getenv("CACHE_WARMUP_QUERIES", "").split(",") if p]
+CACHE_WARMUP_LIMIT = int(os.getenv("CACHE_WARMUP_LIMIT", "200"))
+CACHE_WARMUP_CONCURRENCY = int(os.getenv("CACHE_WARMUP_CONCURRENCY", "4"))
+# Examples kept in the report per list (failures, jurisdiction mismatches)
+REPORT_EXAMPLES = 20
+
+_PERSONAL = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"                        # email
+    r"|\b\d{3}[-. )]*\d{3}[-. ]*\d{4}\b"               # phone number
+    r"|\b[A-Za-z]\d[A-Za-z][ -]?\d[A-Za-z]\d\b"        # postal code
+    r"|\d{6,}"                                          # account / file numbers
+)
+
+_status = {"running": False, "started_at": None, "finished_at": None, "report": None, "error": None}
+
+
+@dataclass
+class WarmupQuery:
+    message: str
+    jurisdiction: Optional[str] = None  # expected (FAQ) or as logged
+    source: str = "log"
+    count: int = 1
+
+
+# --- Query selection ---
+
+def load_faqs(path: str = FAQ_PATH, jurisdictions: Optional[Sequence[str]] = None) -> List[WarmupQuery]:
+    with open(path, encoding="utf-8") as f:
+        faqs = json.load(f)["faqs"]
+    return [WarmupQuery(message, jurisdiction, "faq")
+            for jurisdiction, messages in faqs.items() if not jurisdictions or jurisdiction in jurisdictions
+            for message in messages]
+
+
+def _log_records(path: str):
+    if path.endswith(".json.gz"):
+        try:
+            from agent.cassette import Cassette
+        except ImportError:
+            from cassette import Cassette
+        request = Cassette.load(path).get("request") or {}
+        yield {"message": request.get("message"), "jurisdiction": request.get("jurisdiction")}
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                try:
+                    yield json.loads(line)
+                    continue
+                except ValueError:
+                    pass
+            yield {"message": line}
+
+
+def read_query_logs(paths: Sequence[str]) -> Counter:
+    """(message, jurisdiction) -> how often it was asked, over every file the paths/globs match."""
+    counts: Counter = Counter()
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            for record in _log_records(path):
+                message = record.get("message") or record.get("query") or record.get("text")
+                if message:
+                    counts[(" ".join(str(message).split()), record.get("jurisdiction"))] += int(record.get("count") or 1)
+    return counts
+
+
+def select_queries(logged: Counter, faqs: Sequence[WarmupQuery], limit: int = CACHE_WARMUP_LIMIT) -> Tuple[List[WarmupQuery], dict]:
+    """
+    The FAQs plus the most frequent logged questions, up to `limit` in total.
+    Also returns how much of the logged traffic the selection covers.
+    """
+    selected = list(faqs)[:limit]
+    seen = {q.message for q in selected}
+    skipped_personal = 0
+    for (message, jurisdiction), count in logged.most_common():
+        if len(selected) >= limit:
+            break
+        if message in seen:
+            continue
+        if _PERSONAL.search(message):
+            skipped_personal += 1
+            continue
+        seen.add(message)
+        selected.append(WarmupQuery(message, jurisdiction, "log", count))
+
+    volume = sum(logged.values())
+    covered = sum(count for (message, _), count in logged.items() if message in seen)
+    traffic = {
+        "logged_questions": volume,
+        "distinct_logged": len(logged),
+        "skipped_personal": skipped_personal,
+        "covered_questions": covered,
+        "traffic_coverage_pct": round(100 * covered / volume, 1) if volume else None,
+    }
+    return selected, traffic
+
+
+# --- Running ---
+
+def _cache_counters() -> Dict[str, dict]:
+    return {cache.name: cache.stats() for cache in (embedding_cache, retrieval_cache, llm_cache)}
+
+
+def _hit_rates(before: Dict[str, dict], after: Dict[str, dict]) -> Dict[str, Optional[float]]:
+    rates = {}
+    for name, stats in after.items():
+        hits = stats["hits"] - before[name]["hits"]
+        lookups = hits + stats["misses"] - before[name]["misses"]
+        rates[name] = round(hits / lookups, 3) if lookups else None
+    return rates
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+
+async def _run_turn(app, query: WarmupQuery, admission=None) -> dict:
+    """One fresh first turn for `query`; the throwaway thread is deleted afterwards."""
+    config = {"configurable": {"thread_id": f"warmup-{uuid.uuid4().hex}"}}
+    inputs = {"messages": [HumanMessage(content=query.message)], "deadline": new_deadline(), "partial": False}
+    started = time.perf_counter()
+    try:
+        if admission is not None:
+            # Queued behind live traffic and never shed, like /chat/batch items
+            async with admission.slot("cache-warmup", BATCH):
+                state = await app.ainvoke(inputs, config=config)
+        else:
+            state = await app.ainvoke(inputs, config=config)
+    except AdmissionRejected as e:
+        return {"status": "shed", "error": e.reason}
+    except Exception as e:
+        return {"status": "failed", "error": str(e)[:300]}
+    finally:
+        try:
+            await app.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+        except Exception:
+            pass
+    return {
+        # A partial turn skipped part of its path (degraded router, trimmed searches), so what it
+        # would have cached is missing: it does not count as warmed
+        "status": "partial" if state.get("partial") else "ok",
+        "intent": state.get("user_intent"),
+        "jurisdiction": state.get("jurisdiction"),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _warm_retrieval(query: WarmupQuery) -> dict:
+    """Embeds `query` and runs research_node's jurisdiction search for it, without any LLM call."""
+    try:
+        from agent import agent_graph
+    except ImportError:
+        import agent_graph
+    started = time.perf_counter()
+    try:
+        vstore = agent_graph.get_vector_store()
+        if vstore is None:
+            return {"status": "failed", "error": "No vector store"}
+        # No router: the question as asked is the issue, and the topic is unknown
+        _, _, timed_out = agent_graph.search_jurisdictions(vstore, query.message, query.jurisdiction, None,
+                                                           agent_graph.get_corpus_categories(), deadline=new_deadline())
+    except Exception as e:
+        return {"status": "failed", "error": str(e)[:300]}
+    return {
+        "status": "partial" if timed_out else "ok",
+        "intent": None,
+        "jurisdiction": query.jurisdiction,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+async def _run_pass(app, queries: Sequence[WarmupQuery], concurrency: int, admission=None) -> List[dict]:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    full_turns = llm_cache.enabled
+
+    async def run(query: WarmupQuery) -> dict:
+        async with semaphore:
+            if full_turns:
+                return await _run_turn(app, query, admission)
+            return await asyncio.to_thread(_warm_retrieval, query)
+
+    return await asyncio.gather(*(run(q) for q in queries))
+
+
+async def warm(queries: Sequence[WarmupQuery], concurrency: int = CACHE_WARMUP_CONCURRENCY, verify: bool = True,
+               admission=None, traffic: Optional[dict] = None) -> dict:
+    """Runs `queries` through the graph to fill the caches; returns the coverage report."""
+    app = (await startup.load_graph()).app
+    started = time.perf_counter()
+    sizes_before = _cache_counters()
+    results = await _run_pass(app, queries, concurrency, admission)
+    sizes_after = _cache_counters()
+
+    by_jurisdiction: Dict[str, Counter] = {}
+    statuses, mismatched, failures = Counter(), [], []
+    for query, result in zip(queries, results):
+        statuses[result["status"]] += 1
+        key = query.jurisdiction or result.get("jurisdiction") or "UNKNOWN"
+        counts = by_jurisdiction.setdefault(key, Counter())
+        counts["questions"] += 1
+        counts[result["status"]] += 1
+        if result["status"] in ("failed", "shed"):
+            if len(failures) < REPORT_EXAMPLES:
+                failures.append({"message": query.message, "error": result.get("error")})
+        elif query.jurisdiction and result.get("jurisdiction") != query.jurisdiction:
+            # The question routed somewhere else, so its cached answer is not the one intended
+            counts["jurisdiction_mismatch"] += 1
+            if len(mismatched) < REPORT_EXAMPLES:
+                mismatched.append({"message": query.message, "expected": query.jurisdiction,
+                                   "routed": result.get("jurisdiction"), "intent": result.get("intent")})
+
+    report = {
+        "questions": len(queries),
+        "by_source": dict(Counter(q.source for q in queries)),
+        **{status: statuses[status] for status in ("ok", "partial", "failed", "shed")},
+        "by_jurisdiction": {j: dict(c) for j, c in sorted(by_jurisdiction.items())},
+        "jurisdiction_mismatches": mismatched,
+        "failures": failures,
+        "caches": {name: {"entries": sizes_after[name]["size"], "added": sizes_after[name]["size"] - sizes_before[name]["size"]}
+                   for name in sizes_after},
+        "cold_p50_ms": _percentile([r["elapsed_ms"] for r in results if r["status"] == "ok"], 0.5),
+        "llm_cache": llm_cache.enabled,
+        "concurrency": concurrency,
+    }
+    if traffic is not None:
+        report["traffic"] = traffic
+
+    if verify and llm_cache.enabled:
+        # Same questions again: what the caches now answer without an LLM call or a search
+        warmed = [q for q, r in zip(queries, results) if r["status"] == "ok"]
+        before = _cache_counters()
+        rerun = await _run_pass(app, warmed, concurrency, admission)
+        report["verify"] = {
+            "questions": len(warmed),
+            "hit_rate": _hit_rates(before, _cache_counters()),
+            "warm_p50_ms": _percentile([r["elapsed_ms"] for r in rerun if r["status"] == "ok"], 0.5),
+        }
+    report["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def build_queries(query_logs: Sequence[str] = (), faqs: bool = True, jurisdictions: Optional[Sequence[str]] = None,
+                  limit: int = CACHE_WARMUP_LIMIT) -> Tuple[List[WarmupQuery], Optional[dict]]:
+    logged = read_query_logs(query_logs) if query_logs else Counter()
+    selected, traffic = select_queries(logged, load_faqs(jurisdictions=jurisdictions) if faqs else [], limit)
+    return selected, traffic if query_logs else None
+
+
+# --- In-process job (server) ---
+
+def status() -> dict:
+    return dict(_status)
+
+
+async def run_job(query_logs: Sequence[str] = (), faqs: bool = True, jurisdictions: Optional[Sequence[str]] = None,
+                  limit: int = CACHE_WARMUP_LIMIT, concurrency: int = CACHE_WARMUP_CONCURRENCY,
+                  verify: bool = True, admission=None) -> Optional[dict]:
+    """warm() with the job status kept for /admin/cache/warmup; one run at a time."""
+    if _status["running"]:
+        return None
+    _status.update(running=True, started_at=time.strftime("%Y-%m-%dT%H:%M:%S"), finished_at=None, error=None)
+    try:
+        queries, traffic = build_queries(query_logs, faqs, jurisdictions, limit)
+        report = await warm(queries, concurrency, verify, admission, traffic)
+        _status["report"] = report
+        log(f"Cache warm-up: {report['ok']}/{report['questions']} questions warmed in {report['elapsed_s']}s"
+            f"{', verify hit rates ' + json.dumps(report['verify']['hit_rate']) if 'verify' in report else ''}")
+        return report
+    except Exception as e:
+        _status["error"] = str(e)[:300]
+        log(f"Cache warm-up failed: {e}")
+        raise
+    finally:
+        _status.update(running=False, finished_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+
+async def warm_when_ready(admission=None) -> None:
+    """Start-up run (CACHE_WARMUP_ON_START=1): waits for /ready, then warms from the configured logs and FAQs."""
+    while not startup.is_ready():
+        await asyncio.sleep(0.5)
+    try:
+        await run_job(CACHE_WARMUP_QUERIES, admission=admission)
+    except Exception:
+        pass  # logged by run_job; serving does not depend on it
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", nargs="*", default=CACHE_WARMUP_QUERIES, help="Query log files or globs")
+    parser.add_argument("--no-faqs", action="store_true", help="Only the query logs")
+    parser.add_argument("--jurisdiction", action="append", help="Only these FAQ jurisdictions (repeatable)")
+    parser.add_argument("--limit", type=int, default=CACHE_WARMUP_LIMIT)
+    parser.add_argument("--concurrency", type=int, default=CACHE_WARMUP_CONCURRENCY)
+    parser.add_argument("--no-verify", action="store_true", help="Skip the second (hit-rate) pass")
+    parser.add_argument("--dry-run", action="store_true", help="Only select the questions and report traffic coverage")
+    parser.add_argument("--offline", action="store_true", help="Local stand-ins for Gemini, embeddings and Atlas (agent/fakes.py)")
+    args = parser.parse_args(argv)
+
+    queries, traffic = build_queries(args.queries, not args.no_faqs, args.jurisdiction, args.limit)
+    if args.dry_run:
+        print(json.dumps({"questions": [asdict(q) for q in queries], "traffic": traffic}, indent=2, ensure_ascii=False))
+        return
+    if args.offline:
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-warmup")
+        try:
+            from agent.fakes import install_fakes
+        except ImportError:
+            from fakes import install_fakes
+        install_fakes()
+    print(json.dumps(asyncio.run(warm(queries, args.concurrency, not args.no_verify, traffic=traffic)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
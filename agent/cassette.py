@@ -0,0 +1,243 @@
+"""
+Record-and-replay of production turns.
+
+With RECORD_TRAFFIC=1 the server captures each sampled /chat turn into a
+gzipped JSON cassette. The cassette holds the request, the thread state before
+the turn, every external call (LLM, vector search, section lookup, web search) with its
+request, response and latency, and the final payload. agent/replay.py re-runs
+the compiled graph against those cassettes offline.
+"""
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, messages_from_dict, messages_to_dict
+
+CASSETTE_VERSION = 1
+RECORD_TRAFFIC = os.getenv("RECORD_TRAFFIC", "0") == "1"
+RECORD_SAMPLE_RATE = float(os.getenv("RECORD_SAMPLE_RATE", "1.0"))
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "cassettes")
+
+_active: contextvars.ContextVar[Optional["Cassette"]] = contextvars.ContextVar("cassette", default=None)
+
+
+class ReplayMismatch(RuntimeError):
+    """Strict replay hit a call the cassette doesn't have (or has with a different key)."""
+
+
+# --- Serialization helpers ---
+
+def _json_default(value: Any):
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def fingerprint(payload: Any) -> str:
+    """Short stable hash, used to detect prompt drift between recording and replay."""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=_json_default).encode()).hexdigest()[:12]
+
+
+def serialize_messages(messages) -> List[dict]:
+    return messages_to_dict(list(messages or []))
+
+
+def serialize_state(values: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    values = dict(values or {})
+    if "messages" in values:
+        values["messages"] = serialize_messages(values["messages"])
+    return json.loads(json.dumps(values, default=_json_default))
+
+
+def deserialize_state(values: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    values = dict(values or {})
+    if "messages" in values:
+        values["messages"] = messages_from_dict(values["messages"])
+    return values
+
+
+def docs_to_json(docs: List[Document]) -> List[dict]:
+    return [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+
+
+def docs_from_json(items: List[dict]) -> List[Document]:
+    return [Document(page_content=i["page_content"], metadata=i.get("metadata", {})) for i in items]
+
+
+# --- Recording ---
+
+class Cassette:
+    def __init__(self, request: dict, state_before: dict, trace_id: Optional[str] = None):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.data = {
+            "version": CASSETTE_VERSION,
+            "trace_id": trace_id,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "request": request,
+            "state_before": state_before,
+            "calls": [],
+            "result": None,
+            "elapsed_ms": None,
+        }
+
+    def add(self, kind: str, key: str, request: Any, response: Any, elapsed_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self.data["calls"].append({
+                "kind": kind,
+                "key": key,
+                "request": request,
+                "response": response,
+                "elapsed_ms": round(elapsed_ms, 2) if elapsed_ms is not None else None,
+            })
+
+    def finish(self, result: Any) -> None:
+        self.data["result"] = json.loads(json.dumps(result, default=_json_default))
+        self.data["elapsed_ms"] = round((time.perf_counter() - self.started) * 1000, 2)
+
+    def save(self, directory: str = CASSETTE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.data['trace_id'] or os.urandom(4).hex()}.json.gz"
+        path = os.path.join(directory, name)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(self.data, f, separators=(",", ":"), default=_json_default)
+        return path
+
+    @staticmethod
+    def load(path: str) -> dict:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def should_record() -> bool:
+    return RECORD_TRAFFIC and random.random() < RECORD_SAMPLE_RATE
+
+
+def start_recording(cassette: Cassette) -> contextvars.Token:
+    return _active.set(cassette)
+
+
+def stop_recording(token: contextvars.Token) -> None:
+    _active.reset(token)
+
+
+def record_call(kind: str, key: str, request: Any, response: Any, elapsed_ms: Optional[float] = None) -> None:
+    """No-op unless the current request is being recorded."""
+    cassette = _active.get()
+    if cassette is not None:
+        cassette.add(kind, key, request, json.loads(json.dumps(response, default=_json_default)), elapsed_ms)
+
+
+# --- Replay ---
+
+class CassettePlayer:
+    """
+    Serves recorded responses in order, per call kind.
+    Keys are checked; a mismatch is counted (or raised when strict).
+    """
+
+    def __init__(self, calls: List[dict], with_latency: bool = False, strict: bool = False):
+        self.with_latency = with_latency
+        self.strict = strict
+        self.mismatches: List[dict] = []
+        # LLM calls whose prompt differs from the recording (code change or nondeterminism)
+        self.prompt_changes: List[str] = []
+        self._queues: Dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        for call in calls:
+            self._queues[call["kind"]].append(call)
+
+    def next(self, kind: str, key: str, request: Optional[dict] = None) -> dict:
+        """
+        The next recorded call of `kind`. Calls made concurrently (per-jurisdiction
+        searches) may be recorded in any order: with `request`, the first queued
+        call with that key whose request has those fields is served instead.
+        """
+        with self._lock:
+            queue = self._queues.get(kind)
+            if not queue:
+                raise ReplayMismatch(f"No recorded {kind} call left for key {key!r}")
+            call = None
+            if request is not None:
+                call = next((c for c in queue if c["key"] == key and all(
+                    (c.get("request") or {}).get(field) == value for field, value in request.items())), None)
+            if call is not None:
+                queue.remove(call)
+            else:
+                call = queue.popleft()
+        if call["key"] != key:
+            mismatch = {"kind": kind, "recorded": call["key"], "replayed": key}
+            if self.strict:
+                raise ReplayMismatch(f"{kind} call key changed: {mismatch}")
+            self.mismatches.append(mismatch)
+        if self.with_latency and call.get("elapsed_ms"):
+            time.sleep(call["elapsed_ms"] / 1000.0)
+        return call
+
+    def remaining(self) -> Dict[str, int]:
+        return {kind: len(q) for kind, q in self._queues.items() if q}
+
+
+class _ReplayStructured:
+    def __init__(self, player: CassettePlayer, schema, include_raw: bool):
+        self.player = player
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def invoke(self, messages, config=None):
+        call = self.player.next("llm", self.schema.__name__)
+        if call["request"].get("messages_fp") != fingerprint(serialize_messages(messages)):
+            self.player.prompt_changes.append(self.schema.__name__)
+        parsed = self.schema(**call["response"]["parsed"])
+        if not self.include_raw:
+            return parsed
+        raw = AIMessage(content="", usage_metadata=call["response"].get("usage") or None)
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+
+class ReplayChatModel:
+    """Stands in for the chat model inside the LLM gateway during replay."""
+
+    def __init__(self, player: CassettePlayer):
+        self.player = player
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs):
+        return _ReplayStructured(self.player, schema, include_raw)
+
+    def invoke(self, messages, config=None):
+        call = self.player.next("llm", "text")
+        return AIMessage(content=call["response"]["content"])
+
+
+class ReplayVectorStore:
+    def __init__(self, player: CassettePlayer):
+        self.player = player
+
+    def similarity_search(self, query: str, k: int = 4, pre_filter=None, **kwargs) -> List[Document]:
+        call = self.player.next("vector", query, {"pre_filter": pre_filter or {}})
+        return docs_from_json(call["response"])
+
+
+class ReplaySectionIndex:
+    def __init__(self, player: CassettePlayer):
+        self.player = player
+
+    def lookup_all(self, refs) -> List[Document]:
+        call = self.player.next("section", ",".join(map(str, refs)))
+        return docs_from_json(call["response"])
+
+
+class ReplaySearch:
+    def __init__(self, player: CassettePlayer):
+        self.player = player
+
+    def __call__(self, query: str, max_results: int = 3, timeout: Optional[float] = None):
+        return self.player.next("web_search", query)["response"]
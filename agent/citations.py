@@ -0,0 +1,196 @@
+"""
+Provision-level citation index.
+
+Every ingested chunk is tagged with a stable chunk ID, its act, jurisdiction,
+section number and a deep-link URL (tag_chunks, called from ingest). At query
+time research_node turns retrieved chunks into evidence records carrying those
+IDs; the generator only cites IDs plus a short quote, and resolve_citations()
+expands them into full citations from the evidence, so titles and URLs never
+come from the model.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+QUOTE_MAX_CHARS = 300
+
+
+@dataclass(frozen=True)
+class Act:
+    code: str
+    title: str
+    jurisdiction: str
+    category: str  # LegalTopic value the router assigns to questions this act answers
+    url: str
+    # Format string for a section deep link; None when the publisher has no stable per-section anchor
+    section_url: Optional[str] = None
+
+    def url_for(self, section: Optional[str]) -> str:
+        if section and self.section_url:
+            return self.section_url.format(base=self.url, section=section)
+        return self.url
+
+
+# Keyed by source filename (Document.metadata["source"])
+ACTS: Dict[str, Act] = {
+    "ontario_rta.html": Act("ON-RTA", "Residential Tenancies Act, 2006", "ON", "TENANCY",
+                            "https://www.ontario.ca/laws/statute/06r17"),
+    "bc_rta_full.html": Act("BC-RTA", "Residential Tenancy Act", "BC", "TENANCY",
+                            "https://www.bclaws.gov.bc.ca/civix/document/id/complete/statreg/02078_01",
+                            "{base}#section{section}"),
+    "alberta_rta_full.html": Act("AB-RTA", "Residential Tenancies Act", "AB", "TENANCY",
+                                 "https://kings-printer.alberta.ca/documents/Acts/R17P1.pdf"),
+    "divorce_act.xml": Act("DIVORCE", "Divorce Act", "FEDERAL", "FAMILY",
+                           "https://laws-lois.justice.gc.ca/eng/acts/D-3.4/", "{base}section-{section}.html"),
+    "criminal_code.xml": Act("CC", "Criminal Code", "FEDERAL", "CRIMINAL",
+                             "https://laws-lois.justice.gc.ca/eng/acts/C-46/", "{base}section-{section}.html"),
+    "income_tax.xml": Act("ITA", "Income Tax Act", "FEDERAL", "TAX",
+                          "https://laws-lois.justice.gc.ca/eng/acts/I-3.3/", "{base}section-{section}.html"),
+    "excise_tax.xml": Act("ETA", "Excise Tax Act", "FEDERAL", "TAX",
+                          "https://laws-lois.justice.gc.ca/eng/acts/E-15/", "{base}section-{section}.html"),
+    "immigration.xml": Act("IRPA", "Immigration and Refugee Protection Act", "FEDERAL", "IMMIGRATION",
+                           "https://laws-lois.justice.gc.ca/eng/acts/I-2.5/", "{base}section-{section}.html"),
+}
+
+# Section headings as they appear in the loaded text:
+#   e-Laws / King's Printer: "48 (1) A landlord..." or "48\xa0\xa0A landlord..." at a line start
+#   BC Laws / Justice Laws:  "...marginal note13(1)When a person..." (heading glued to the marginal note;
+#                            the splitter often leaves it as the last thing in a chunk)
+# Cross-references ("s. 48 (1)", "section 48") and amendment tables are not matched.
+_HEADING_AT_LINE = re.compile(r"(?m)^[ \t\xa0]*(\d{1,3}(?:\.\d{1,2})?)(?=[ \t\xa0]*\(\d+\)[ \t\xa0]*[A-Z“\"(]|[ \t\xa0]+[A-Z“\"])")
+_HEADING_GLUED = re.compile(r"(?<=[a-z])(\d{1,3}(?:\.\d{1,2})?)(?=\s*\(\d+\)\s*[A-Z“\"(]|\s*[A-Z“\"]|\s*$)")
+
+
+def act_for(source: Optional[str]) -> Optional[Act]:
+    return ACTS.get(source or "")
+
+
+def find_headings(text: str) -> List[re.Match]:
+    matches = list(_HEADING_AT_LINE.finditer(text)) + list(_HEADING_GLUED.finditer(text))
+    return sorted(matches, key=lambda m: m.start())
+
+
+def _starting_headings(text: str) -> List[re.Match]:
+    # A heading with nothing after it starts its section in the next chunk
+    end = len(text.rstrip())
+    return [m for m in find_headings(text) if m.end() < end]
+
+
+def sections_starting(text: str) -> List[str]:
+    """Sections whose body starts in `text`, in order."""
+    return [m.group(1) for m in _starting_headings(text)]
+
+
+def first_section(text: str) -> Optional[str]:
+    """First section whose body starts in `text`."""
+    return next((m.group(1) for m in _starting_headings(text)), None)
+
+
+def chunk_id(act_code: str, section: Optional[str], text: str) -> str:
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:6]
+    return f"{act_code}-s{section}-{digest}" if section else f"{act_code}-{digest}"
+
+
+def tag_chunks(chunks: List[Document]) -> List[Document]:
+    """
+    Adds chunk_id, act, act_code, category, section, sections and url metadata in place.
+    A chunk is filed under the first section that starts in it; `sections` lists
+    every section it holds text of (for direct section lookup). Chunks must be
+    in document order: one without its own heading inherits the section of the
+    last heading before it.
+    """
+    current: Dict[str, Optional[str]] = {}
+    for doc in chunks:
+        source = doc.metadata.get("source")
+        act = act_for(source) or Act(source or "DOC", source or "Unknown source", doc.metadata.get("jurisdiction", "General"),
+                                     doc.metadata.get("category", "OTHER_LEGAL"), "")
+        headings = find_headings(doc.page_content)
+        starting = _starting_headings(doc.page_content)
+        carried = current.get(source)
+        section = starting[0].group(1) if starting else carried
+        sections = [m.group(1) for m in starting]
+        # Text before the first heading is the tail of the carried section
+        if carried and (not starting or doc.page_content[:starting[0].start()].strip()):
+            sections.insert(0, carried)
+        if headings:
+            current[source] = headings[-1].group(1)
+
+        doc.metadata.update({
+            "chunk_id": chunk_id(act.code, section, doc.page_content),
+            "act": act.title,
+            "act_code": act.code,
+            "category": act.category,
+            "section": section,
+            "sections": list(dict.fromkeys(sections)),
+            "url": doc.metadata.get("url") or act.url_for(section),
+        })
+    return chunks
+
+
+def evidence_from_doc(doc: Document, max_chars: int = 1500) -> dict:
+    """
+    Evidence record for one retrieved chunk. Falls back to deriving the fields
+    from source/text for chunks ingested before tagging existed.
+    """
+    meta = doc.metadata
+    act = act_for(meta.get("source"))
+    section = meta.get("section")
+    if section is None and "chunk_id" not in meta:
+        section = first_section(doc.page_content)
+    code = meta.get("act_code") or (act.code if act else "DOC")
+    return {
+        "id": meta.get("chunk_id") or chunk_id(code, section, doc.page_content),
+        "act": meta.get("act") or (act.title if act else meta.get("source", "Unknown source")),
+        "jurisdiction": meta.get("jurisdiction") or (act.jurisdiction if act else "General"),
+        "section": section,
+        "url": meta.get("url") or (act.url_for(section) if act else ""),
+        "text": doc.page_content[:max_chars],
+    }
+
+
+def citation_title(evidence: dict) -> str:
+    title = f"{evidence['act']} ({evidence['jurisdiction']})"
+    return f"{title}, s. {evidence['section']}" if evidence.get("section") else title
+
+
+def format_evidence(evidence: dict) -> str:
+    """Research context line handed to the generator; the bracketed ID is what it cites."""
+    return f"[{evidence['id']}] {citation_title(evidence)}\nContent: {evidence['text']}"
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def verified_quote(quote: str, text: str) -> str:
+    """The model's quote if it is verbatim in the chunk (modulo whitespace), else the chunk's opening."""
+    if quote and _normalize(quote) in _normalize(text):
+        return quote.strip()[:QUOTE_MAX_CHARS]
+    opening = re.sub(r"\s+", " ", text).strip()
+    return opening[:QUOTE_MAX_CHARS].rsplit(" ", 1)[0] + "…" if len(opening) > QUOTE_MAX_CHARS else opening
+
+
+def resolve_citations(refs: Iterable, evidence: List[dict]) -> List[dict]:
+    """
+    Expands generator citation refs ({id, quote}) into full citations.
+    Unknown IDs are dropped; duplicate IDs are cited once.
+    """
+    by_id = {e["id"]: e for e in evidence}
+    citations, seen = [], set()
+    for ref in refs:
+        ref_id = getattr(ref, "id", None) or (ref.get("id") if isinstance(ref, dict) else None)
+        quote = getattr(ref, "quote", None) or (ref.get("quote") if isinstance(ref, dict) else "") or ""
+        item = by_id.get((ref_id or "").strip("[] "))
+        if item is None or item["id"] in seen:
+            continue
+        seen.add(item["id"])
+        citations.append({
+            "id": item["id"],
+            "source_title": citation_title(item),
+            "quote": verified_quote(quote, item["text"]),
+            "url": item["url"] or None,
+        })
+    return citations
@@ -0,0 +1,47 @@
+import os
+import time
+from typing import Optional
+
+# End-to-end latency budget for one /chat turn
+REQUEST_BUDGET_S = float(os.getenv("REQUEST_BUDGET_S", "25"))
+# Below this much remaining time, optional work (extra searches, over-fetch) is skipped
+LOW_BUDGET_S = float(os.getenv("LOW_BUDGET_S", "8"))
+# Time held back for the generator when the router calls the LLM
+GENERATOR_RESERVE_S = float(os.getenv("GENERATOR_RESERVE_S", "8"))
+# Never hand an LLM call less than this; below it we degrade instead
+MIN_CALL_BUDGET_S = float(os.getenv("MIN_CALL_BUDGET_S", "1"))
+
+
+def new_deadline(budget: Optional[float] = None) -> float:
+    """Absolute wall-clock deadline (stored in AgentState, so it survives checkpointing)."""
+    return time.time() + (REQUEST_BUDGET_S if budget is None else budget)
+
+
+def time_left(deadline: Optional[float], reserve: float = 0.0) -> float:
+    """Seconds remaining before `deadline`, minus `reserve`. Unbounded when no deadline is set."""
+    if deadline is None:
+        return float("inf")
+    return deadline - time.time() - reserve
+
+
+def budget_low(deadline: Optional[float], threshold: float = LOW_BUDGET_S) -> bool:
+    return time_left(deadline) < threshold
+
+
+def call_timeout(deadline: Optional[float], reserve: float = 0.0) -> Optional[float]:
+    """
+    Timeout to hand to a single LLM/tool call, or None for "use the client default".
+    Returns 0 when the budget is spent so the gateway fails fast.
+    """
+    remaining = time_left(deadline, reserve)
+    if remaining == float("inf"):
+        return None
+    return max(0.0, remaining)
+
+
+def search_timeout(deadline: Optional[float]) -> Optional[float]:
+    """
+    Timeout for one web or vector search: what is left once the generator's
+    reserve is held back, None when unbounded. 0 means skip the search.
+    """
+    return call_timeout(deadline, reserve=GENERATOR_RESERVE_S)
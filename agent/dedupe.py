@@ -0,0 +1,258 @@
+"""
+Near-duplicate chunk elimination at ingest.
+
+The corpus repeats itself: excerpt pages that duplicate the full acts
+(alberta_rta.html / alberta_rta_full.html), boilerplate headers and
+definitions restated across acts. Left alone, every copy is embedded, stored
+and competes for the same top-k slots.
+
+dedupe_chunks() runs after splitting and before embedding, in two passes:
+
+- Copies: each chunk gets a MinHash signature over its word shingles; LSH
+  banding proposes candidate pairs and those whose estimated Jaccard
+  similarity reaches DEDUPE_THRESHOLD are merged. Each cluster keeps one
+  canonical chunk (a registered act's chunk over an unregistered copy, then
+  the longer text, then the first seen).
+- Excerpts: a copy split at other boundaries, or stitched together from
+  several sections, never matches one chunk as a whole. A chunk from an
+  unregistered source is dropped when DEDUPE_CONTAINMENT of its shingles
+  appear in the registered acts' chunks of its jurisdiction (the union, not
+  any single chunk); it is filed under the chunk it overlaps most. Distinct
+  acts restate each other far less: across the provincial tenancy acts no
+  chunk is more than 0.25 contained in the others, the excerpt pages 0.58-0.92.
+
+Dropped chunks are recorded under the kept chunk's metadata["duplicates"], so
+section lookups and provenance for them still resolve to the kept text.
+Chunks are only merged within a jurisdiction: the jurisdiction pre-filter
+must keep finding them.
+
+    python -m agent.dedupe                      # report for ingest.py's sources
+    python -m agent.dedupe docs/alberta_rta.html docs/alberta_rta_full.html --examples 5
+"""
+import argparse
+import json
+import os
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    from agent.citations import act_for
+except ImportError:
+    from citations import act_for
+
+INGEST_DEDUPE = os.getenv("INGEST_DEDUPE", "1") == "1"
+# Estimated Jaccard similarity of word shingles at which two chunks are the same text
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.9"))
+# Fraction of an unregistered chunk's shingles found in its jurisdiction's registered acts
+# at which it is an excerpt of them
+DEDUPE_CONTAINMENT = float(os.getenv("DEDUPE_CONTAINMENT", "0.5"))
+# Chunks shorter than this (in shingles) are too short to judge by containment
+CONTAINMENT_MIN_SHINGLES = 10
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 similarity almost always share a band
+BAND_ROWS = 8
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32; a * hash stays within uint64
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+# Provenance kept for each dropped copy
+PROVENANCE_FIELDS = ("source", "act_code", "chunk_id", "section", "sections", "url")
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two signatures' shingle sets."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+@dataclass
+class DedupeReport:
+    input_chunks: int = 0
+    kept_chunks: int = 0
+    clusters: int = 0
+    contained: int = 0
+    removed_chars: int = 0
+    removed_by_source: Dict[str, int] = field(default_factory=dict)
+    examples: List[dict] = field(default_factory=list)
+
+    @property
+    def removed_chunks(self) -> int:
+        return self.input_chunks - self.kept_chunks
+
+    def as_dict(self) -> dict:
+        return {
+            "input_chunks": self.input_chunks,
+            "kept_chunks": self.kept_chunks,
+            "removed_chunks": self.removed_chunks,
+            "removed_pct": round(100 * self.removed_chunks / self.input_chunks, 1) if self.input_chunks else 0.0,
+            "clusters": self.clusters,
+            "contained": self.contained,
+            "removed_chars": self.removed_chars,
+            "removed_by_source": dict(sorted(self.removed_by_source.items())),
+            "threshold": DEDUPE_THRESHOLD,
+            "containment": DEDUPE_CONTAINMENT,
+        }
+
+    def summary(self) -> str:
+        d = self.as_dict()
+        return (f"Dedupe: {d['input_chunks']} -> {d['kept_chunks']} chunks ({d['removed_chunks']} near-duplicates, "
+                f"{d['removed_pct']}%, {d['removed_chars']} chars) in {d['clusters']} clusters, "
+                f"{d['contained']} excerpts")
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _canonical_rank(doc: Document, order: int) -> Tuple[int, int, int]:
+    # Lower sorts first: registered act, longer text, earlier in ingest order
+    return (act_for(doc.metadata.get("source")) is None, -len(doc.page_content), order)
+
+
+def near_duplicate_clusters(chunks: List[Document], threshold: float = DEDUPE_THRESHOLD) -> List[List[int]]:
+    """Groups of chunk indices (size > 1) whose texts are near-identical, within a jurisdiction."""
+    signatures = [minhash(doc.page_content) for doc in chunks]
+    parent = list(range(len(chunks)))
+    buckets: Dict[Tuple, List[int]] = {}
+    for i, (doc, signature) in enumerate(zip(chunks, signatures)):
+        jurisdiction = doc.metadata.get("jurisdiction")
+        for band in range(0, NUM_PERM, BAND_ROWS):
+            buckets.setdefault((jurisdiction, band, signature[band:band + BAND_ROWS].tobytes()), []).append(i)
+
+    for members in buckets.values():
+        for a in range(len(members)):
+            for b in range(a + 1, len(members)):
+                ra, rb = _find(parent, members[a]), _find(parent, members[b])
+                if ra != rb and similarity(signatures[members[a]], signatures[members[b]]) >= threshold:
+                    parent[rb] = ra
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(chunks)):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def contained_chunks(chunks: List[Document], threshold: float = DEDUPE_CONTAINMENT,
+                     skip: Iterable[int] = ()) -> Dict[int, int]:
+    """
+    Unregistered chunks that are excerpts of their jurisdiction's registered
+    acts: index -> index of the registered chunk sharing most shingles with it.
+    """
+    skip = set(skip)
+    shingle_sets = {i: {zlib.crc32(s.encode("utf-8")) for s in shingles(doc.page_content)}
+                    for i, doc in enumerate(chunks) if i not in skip}
+    registered = {i for i in shingle_sets if act_for(chunks[i].metadata.get("source")) is not None}
+    # (jurisdiction, shingle) -> registered chunks holding it
+    postings: Dict[Tuple, List[int]] = {}
+    for i in registered:
+        jurisdiction = chunks[i].metadata.get("jurisdiction")
+        for h in shingle_sets[i]:
+            postings.setdefault((jurisdiction, h), []).append(i)
+
+    contained = {}
+    for i, hashes in shingle_sets.items():
+        if i in registered or len(hashes) < CONTAINMENT_MIN_SHINGLES:
+            continue
+        jurisdiction = chunks[i].metadata.get("jurisdiction")
+        covered, overlap = 0, Counter()
+        for h in hashes:
+            holders = postings.get((jurisdiction, h))
+            if holders:
+                covered += 1
+                overlap.update(holders)
+        if covered / len(hashes) >= threshold:
+            contained[i] = overlap.most_common(1)[0][0]
+    return contained
+
+
+def _drop_into(canonical: Document, copies: List[Document], report: DedupeReport) -> None:
+    """Records `copies`' provenance under `canonical`."""
+    provenance = list(canonical.metadata.get("duplicates", []))
+    for copy in copies:
+        meta = copy.metadata
+        provenance.append({k: meta[k] for k in PROVENANCE_FIELDS if meta.get(k) is not None})
+        provenance.extend(meta.get("duplicates", []))
+        report.removed_by_source[meta.get("source", "unknown")] = report.removed_by_source.get(meta.get("source", "unknown"), 0) + 1
+        report.removed_chars += len(copy.page_content)
+    canonical.metadata["duplicates"] = provenance
+
+
+def dedupe_chunks(chunks: List[Document], threshold: float = DEDUPE_THRESHOLD, examples: int = 0,
+                  containment: float = DEDUPE_CONTAINMENT) -> Tuple[List[Document], DedupeReport]:
+    """
+    Collapses near-identical chunks into one canonical chunk each, then drops
+    unregistered excerpts of the registered acts; the dropped chunks'
+    provenance goes into the kept chunk's metadata["duplicates"].
+    Returns the kept chunks in their original order and a report.
+    """
+    report = DedupeReport(input_chunks=len(chunks))
+    dropped = set()
+
+    def example(kept: int, copies: List[int]) -> None:
+        if len(report.examples) < examples:
+            report.examples.append({
+                "kept": {"source": chunks[kept].metadata.get("source"), "preview": chunks[kept].page_content[:100]},
+                "dropped": [{"source": chunks[i].metadata.get("source"), "preview": chunks[i].page_content[:100]} for i in copies],
+            })
+
+    for members in near_duplicate_clusters(chunks, threshold):
+        members.sort(key=lambda i: _canonical_rank(chunks[i], i))
+        keep, copies = members[0], members[1:]
+        _drop_into(chunks[keep], [chunks[i] for i in copies], report)
+        dropped.update(copies)
+        report.clusters += 1
+        example(keep, copies)
+
+    for i, keep in contained_chunks(chunks, containment, skip=dropped).items():
+        _drop_into(chunks[keep], [chunks[i]], report)
+        dropped.add(i)
+        report.contained += 1
+        example(keep, [i])
+
+    kept = [doc for i, doc in enumerate(chunks) if i not in dropped]
+    report.kept_chunks = len(kept)
+    return kept, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="Source files (default: ingest.py's TARGET_FILES)")
+    parser.add_argument("--threshold", type=float, default=DEDUPE_THRESHOLD)
+    parser.add_argument("--containment", type=float, default=DEDUPE_CONTAINMENT)
+    parser.add_argument("--examples", type=int, default=0, help="Print this many merged clusters")
+    args = parser.parse_args(argv)
+    try:
+        from agent.ingest import TARGET_FILES, load_corpus
+    except ImportError:
+        from ingest import TARGET_FILES, load_corpus
+
+    chunks, _ = load_corpus(args.files or TARGET_FILES, dedupe=False)
+    _, report = dedupe_chunks(chunks, args.threshold, args.examples, args.containment)
+    print(report.summary())
+    print(json.dumps({**report.as_dict(), "examples": report.examples}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
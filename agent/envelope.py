@@ -0,0 +1,97 @@
+"""
+The /chat response envelope.
+
+The generator stores its answer once, as structured state: the AIMessage holds
+the prose explanation (what later turns see as history) and `citations` /
+`options` sit alongside it as plain lists. turn_payload() assembles the
+envelope from that state and encode_response() serializes it exactly once
+(orjson), compressing with zstd or gzip when the client accepts it.
+"""
+import gzip
+import os
+from typing import List, Optional
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, Field
+
+try:
+    import zstandard
+except ImportError:  # gzip only
+    zstandard = None
+
+try:
+    from agent.schemas import Citation, Option
+except ImportError:
+    from schemas import Citation, Option
+
+# off | auto (negotiate from Accept-Encoding)
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "auto")
+# Smaller bodies go out as-is; compressing them costs more than it saves
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+_zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+
+
+class ChatResponse(BaseModel):
+    explanation: str
+    citations: List[Citation] = Field(default_factory=list)
+    options: List[Option] = Field(default_factory=list)
+    legal_issue: Optional[str] = None
+    draft: Optional[str] = None
+    partial: bool = False
+    # Node trace; only included when the caller asks for it (?debug=true)
+    debug_info: Optional[List[dict]] = None
+
+
+def turn_payload(final_state: dict, debug: bool = False) -> dict:
+    """ChatResponse-shaped dict for the turn that produced `final_state`."""
+    messages = final_state.get("messages") or []
+    payload = {
+        "explanation": messages[-1].content if messages else "",
+        "citations": final_state.get("citations") or [],
+        "options": final_state.get("options") or [],
+        # A pending clarification question is surfaced as the issue
+        "legal_issue": "Additional Info Required" if final_state.get("needs_clarification") else final_state.get("legal_issue"),
+        "draft": final_state.get("draft"),
+        "partial": bool(final_state.get("partial")),
+    }
+    if debug:
+        payload["debug_info"] = final_state.get("debug_logs") or []
+    return payload
+
+
+def dumps(payload) -> bytes:
+    return orjson.dumps(payload)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    if RESPONSE_COMPRESSION == "off":
+        return None
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if "zstd" in accepted and _zstd_compressor is not None:
+        return "zstd"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == "zstd":
+        return _zstd_compressor.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def encode_response(payload, accept_encoding: str = "", status_code: int = 200) -> Response:
+    """Serializes `payload` once and compresses it if the client allows."""
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,314 @@
+"""
+Local stand-ins for Gemini, the embedding API, Atlas and DuckDuckGo.
+
+Used by the offline benchmarks (scripts/bench_chat.py) so the /chat pipeline
+can be driven at load without network access or API spend.
+"""
+import hashlib
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from pydantic import BaseModel
+
+try:
+    from agent.local_index import LocalVectorStore
+    from agent.cache import CachedEmbeddings
+except ImportError:
+    from local_index import LocalVectorStore
+    from cache import CachedEmbeddings
+
+
+class Latency:
+    """Log-normal-ish latency: `mean_ms` +/- `jitter` fraction, with an optional slow tail."""
+
+    def __init__(self, mean_ms: float = 0.0, jitter: float = 0.2, tail_prob: float = 0.0, tail_ms: float = 0.0, seed: Optional[int] = None):
+        self.mean_ms = mean_ms
+        self.jitter = jitter
+        self.tail_prob = tail_prob
+        self.tail_ms = tail_ms
+        self._rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.tail_prob and self._rng.random() < self.tail_prob:
+            return self.tail_ms / 1000.0
+        return max(0.0, self._rng.gauss(self.mean_ms, self.mean_ms * self.jitter)) / 1000.0
+
+    def sleep(self) -> None:
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+
+# --- Canned structured outputs ---
+
+_JURISDICTION_PATTERNS = [
+    (r"\b(ontario|toronto|ottawa|hamilton|\bON\b)", "ON"),
+    (r"\b(british columbia|vancouver|victoria|\bBC\b)", "BC"),
+    (r"\b(alberta|calgary|edmonton|\bAB\b)", "AB"),
+]
+
+_TOPIC_KEYWORDS = [
+    ("FAMILY", ("divorce", "custody", "support", "separation")),
+    ("CRIMINAL", ("arrest", "shoplifting", "assault", "criminal", "dui")),
+    ("TAX", ("tax", "cra", "gst", "hst")),
+    ("IMMIGRATION", ("visa", "permit", "refugee", "citizenship")),
+    ("EMPLOYMENT", ("fired", "severance", "wages", "dismissal")),
+    ("NON_LEGAL", ("weather", "recipe", "joke")),
+]
+
+
+def _last_human_text(messages: List[BaseMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return str(message.content)
+    return str(messages[-1].content) if messages else ""
+
+
+def canned_router_output(schema: Type[BaseModel], messages: List[BaseMessage]) -> BaseModel:
+    text = _last_human_text(messages)
+    lowered = text.lower()
+    history = " ".join(str(m.content) for m in messages)
+    # Only what the user said counts; the system prompt itself lists every province code
+    said = " ".join(str(m.content) for m in messages if isinstance(m, HumanMessage))
+
+    jurisdiction = None
+    for pattern, code in _JURISDICTION_PATTERNS:
+        if re.search(pattern, said, flags=re.IGNORECASE):
+            jurisdiction = code
+    known = re.search(r"Known Jurisdiction: (ON|BC|AB)", history)
+    if jurisdiction is None and known:
+        jurisdiction = known.group(1)
+
+    # "ON vs BC", "compare with Alberta": every other province named in this message
+    compare = []
+    if re.search(r"\bvs\.?\b|\bversus\b|compar|differen", lowered):
+        for pattern, code in _JURISDICTION_PATTERNS:
+            if re.search(pattern, text, flags=re.IGNORECASE) and code != (known.group(1) if known else None) and code not in compare:
+                compare.append(code)
+        if known:
+            jurisdiction = known.group(1)
+        elif compare:
+            jurisdiction = compare.pop(0)
+
+    topic = "TENANCY"
+    for name, keywords in _TOPIC_KEYWORDS:
+        if any(k in lowered for k in keywords):
+            topic = name
+            break
+
+    if topic == "NON_LEGAL":
+        intent = "OFF_TOPIC"
+    elif jurisdiction is None:
+        intent = "ASK_JURISDICTION"
+    elif "form" in lowered or re.search(r"\b[nl]\d{1,2}\b", lowered):
+        intent = "FORM"
+    elif "draft" in lowered or "write" in lowered:
+        intent = "DRAFT"
+    else:
+        intent = "ADVICE"
+
+    return schema(
+        detected_jurisdiction=jurisdiction,
+        intent=intent,
+        topic=topic,
+        legal_issue=text[:200],
+        missing_info_question="Which province are you in?" if intent == "ASK_JURISDICTION" else None,
+        compare_jurisdictions=compare,
+    )
+
+
+def canned_response_output(schema: Type[BaseModel], messages: List[BaseMessage]) -> BaseModel:
+    text = _last_human_text(messages)
+    return schema(
+        explanation=f"(benchmark) Here is general information about: {text[:120]}",
+        citations=[],
+        options=[{"label": "Tell me more", "action": "more", "description": None}],
+    )
+
+
+def canned_generator_output(schema: Type[BaseModel], messages: List[BaseMessage]) -> BaseModel:
+    # Cites the first research item by ID, quoting its opening words, like the real prompt asks
+    text = _last_human_text(messages)
+    prompt = " ".join(str(m.content) for m in messages if not isinstance(m, HumanMessage))
+    match = re.search(r"\[([A-Za-z0-9.-]+)\][^\n]*\nContent: ([^\n]*)", prompt)
+    citations = [{"id": match.group(1), "quote": " ".join(match.group(2).split()[:8])}] if match else []
+    return schema(
+        explanation=f"(benchmark) Here is general information about: {text[:120]}",
+        citations=citations,
+        options=[{"label": "Tell me more", "action": "more", "description": None}],
+    )
+
+
+def canned_fused_output(schema: Type[BaseModel], messages: List[BaseMessage]) -> BaseModel:
+    # The fused prompt carries both the Known Jurisdiction line and the research items
+    return schema(**canned_router_output(dict, messages), **canned_generator_output(dict, messages))
+
+
+DEFAULT_RESPONDERS: Dict[str, Callable[[Type[BaseModel], List[BaseMessage]], BaseModel]] = {
+    "RouterOutput": canned_router_output,
+    "ResponseOutput": canned_response_output,
+    "GeneratorOutput": canned_generator_output,
+    "FusedOutput": canned_fused_output,
+}
+
+
+def _usage(messages: List[BaseMessage], output: str) -> Dict[str, int]:
+    # ~4 characters per token is close enough for load modelling
+    tokens_in = sum(len(str(m.content)) for m in messages) // 4 + 1
+    tokens_out = len(output) // 4 + 1
+    return {"input_tokens": tokens_in, "output_tokens": tokens_out, "total_tokens": tokens_in + tokens_out}
+
+
+class FakeStructuredRunnable:
+    def __init__(self, model: "FakeChatModel", schema: Type[BaseModel], include_raw: bool):
+        self.model = model
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def invoke(self, messages: List[BaseMessage], config: Any = None):
+        self.model.latency.sleep()
+        responder = self.model.responders.get(self.schema.__name__)
+        if responder is None:
+            raise ValueError(f"FakeChatModel has no canned output for {self.schema.__name__}")
+        parsed = responder(self.schema, list(messages))
+        if not self.include_raw:
+            return parsed
+        raw = AIMessage(content=parsed.model_dump_json(), usage_metadata=_usage(messages, parsed.model_dump_json()))
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+
+class FakeChatModel:
+    """
+    Drop-in for ChatGoogleGenerativeAI inside the LLM gateway.
+    Sleeps for a sampled latency and returns canned structured outputs.
+    """
+
+    def __init__(self, latency: Optional[Latency] = None, responders: Optional[Dict[str, Callable]] = None):
+        self.latency = latency or Latency()
+        self.responders = dict(DEFAULT_RESPONDERS)
+        self.responders.update(responders or {})
+
+    def with_structured_output(self, schema: Type[BaseModel], include_raw: bool = False, **kwargs):
+        return FakeStructuredRunnable(self, schema, include_raw)
+
+    def invoke(self, messages: List[BaseMessage], config: Any = None) -> AIMessage:
+        self.latency.sleep()
+        content = f"(benchmark) {_last_human_text(list(messages))[:120]}"
+        return AIMessage(content=content, usage_metadata=_usage(list(messages), content))
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic hashed bag-of-words embeddings: similar texts share tokens,
+    so they land near each other, which keeps local retrieval meaningful.
+    """
+
+    def __init__(self, dimensions: int = 768, latency: Optional[Latency] = None):
+        self.dimensions = dimensions
+        self.latency = latency or Latency()
+
+    def _embed(self, text: str) -> List[float]:
+        vec = np.zeros(self.dimensions, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9]+", text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            idx = int.from_bytes(digest[:4], "little") % self.dimensions
+            vec[idx] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.sleep()
+        return self._embed(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.sleep()
+        return [self._embed(t) for t in texts]
+
+
+class FakeSearch:
+    """search_provider(query, max_results, timeout) stand-in for DuckDuckGo."""
+
+    def __init__(self, latency: Optional[Latency] = None):
+        self.latency = latency or Latency()
+        self.calls = 0
+
+    def __call__(self, query: str, max_results: int = 3, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        self.calls += 1
+        delay = self.latency.sample()
+        if timeout is not None and delay > timeout:
+            # Like DDGS(timeout=...): a slow tail fails at the timeout instead of holding the turn
+            time.sleep(timeout)
+            raise TimeoutError(f"fake search timed out after {timeout:.1f}s")
+        if delay:
+            time.sleep(delay)
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:60]
+        return [
+            {"title": f"Result {i + 1} for {query[:60]}", "href": f"https://example.ca/{slug}/{i + 1}", "body": query}
+            for i in range(max_results)
+        ]
+
+
+SYNTHETIC_TOPICS = {
+    "ON": ["rent increase guideline", "N12 landlord own use eviction", "maintenance and repairs", "security deposit last month rent"],
+    "BC": ["rent increase limit notice", "return of security deposit", "ending a tenancy for landlord use", "repairs and emergency repairs"],
+    "AB": ["mold and health hazards", "security deposit interest", "notice to terminate periodic tenancy", "landlord entry into premises"],
+    "FEDERAL": ["divorce one year separation", "theft under five thousand", "income tax filing deadline", "GST HST registration threshold"],
+}
+
+
+def synthetic_corpus(chunks_per_topic: int = 25, seed: int = 7) -> List[Document]:
+    """Small tagged corpus shaped like the ingested acts (jurisdiction/source/url metadata)."""
+    rng = random.Random(seed)
+    filler = "tenant landlord notice period days section act tribunal order application payment".split()
+    docs = []
+    for jurisdiction, topics in SYNTHETIC_TOPICS.items():
+        for topic in topics:
+            for i in range(chunks_per_topic):
+                words = topic.split() * 3 + rng.sample(filler, 6)
+                rng.shuffle(words)
+                docs.append(Document(
+                    page_content=f"Section {rng.randint(1, 240)}. {topic.capitalize()}. " + " ".join(words),
+                    metadata={"jurisdiction": jurisdiction, "source": f"synthetic_{jurisdiction.lower()}.html", "url": ""},
+                ))
+    return docs
+
+
+def build_local_store(embeddings: Embeddings, documents: Optional[List[Document]] = None) -> LocalVectorStore:
+    store = LocalVectorStore(embeddings)
+    store.add_documents(documents if documents is not None else synthetic_corpus())
+    return store
+
+
+def install_fakes(
+    llm_latency: Optional[Latency] = None,
+    embedding_latency: Optional[Latency] = None,
+    search_latency: Optional[Latency] = None,
+    documents: Optional[List[Document]] = None,
+) -> Dict[str, Any]:
+    """
+    Points the running graph at local stand-ins: fake LLM in the shared gateway,
+    local vector store for research_node, fake web search for the tools.
+    """
+    try:
+        from agent import agent_graph, tools
+    except ImportError:
+        import agent_graph, tools
+
+    llm = FakeChatModel(latency=llm_latency)
+    # Same caching wrapper as production so embedding cache behaviour is measured too
+    embeddings = CachedEmbeddings(FakeEmbeddings(latency=embedding_latency), "fake-embeddings")
+    store = build_local_store(embeddings, documents)
+    search = FakeSearch(latency=search_latency)
+
+    agent_graph.llm.set_llm(llm)
+    agent_graph.set_vector_store(store)
+    tools.set_search_provider(search)
+    return {"llm": llm, "embeddings": embeddings, "store": store, "search": search}
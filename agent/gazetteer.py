@@ -0,0 +1,139 @@
+"""
+Bundled gazetteer for the lawyer referral resolver.
+
+agent/data/gazetteer.json lists Canadian municipalities (and districts such
+as North York or Dartmouth, under the municipality their lawyers are listed
+in) with their province, plus each province's law society directory and
+referral service. find_place() pulls the place out of a free-text request
+("lawyer near North York", "paralegal in St. Catharines?") with a token index:
+names are keyed by their first normalized token and matched longest-first,
+so "Richmond Hill" wins over "Richmond" and "North Vancouver" over
+"Vancouver". Everything is local, so referrals resolve instantly and the same
+way every time.
+
+    python -m agent.gazetteer "I need a family lawyer near North York" --jurisdiction ON
+"""
+import argparse
+import json
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.json")
+
+_TOKEN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+
+@dataclass(frozen=True)
+class Place:
+    name: str          # as mentioned, e.g. "North York"
+    province: str      # "ON"
+    municipality: str  # what directories list it under, e.g. "Toronto"
+
+
+def _fold(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+
+
+class Gazetteer:
+    def __init__(self, data: dict):
+        self.provinces: Dict[str, dict] = data["provinces"]
+        self.aliases: Dict[str, str] = data.get("token_aliases", {})
+        self.capitalized = set(data.get("require_capitalized", []))
+        # first token -> [(tokens, place)], longest names first
+        self._index: Dict[str, List[Tuple[Tuple[str, ...], Place]]] = {}
+        for row in data["municipalities"]:
+            name, province = row[0], row[1]
+            place = Place(name, province, row[2] if len(row) > 2 else name)
+            tokens = tuple(token for token, _ in self.tokenize(name))
+            self._index.setdefault(tokens[0], []).append((tokens, place))
+        for candidates in self._index.values():
+            candidates.sort(key=lambda c: len(c[0]), reverse=True)
+
+    def tokenize(self, text: str) -> List[Tuple[str, str]]:
+        """(normalized token, original token) pairs: accents folded, "St." -> "saint", "John's" -> "johns"."""
+        tokens = []
+        for match in _TOKEN.finditer(text.replace("\u2019", "'")):
+            original = match.group(0)
+            token = _fold(original).replace("'", "")
+            tokens.append((self.aliases.get(token, token), original))
+        return tokens
+
+    def find_places(self, text: str) -> List[Place]:
+        """Every place mentioned, in order; overlapping names resolve to the longest."""
+        tokens = self.tokenize(text)
+        places, i = [], 0
+        while i < len(tokens):
+            match = None
+            for names, place in self._index.get(tokens[i][0], ()):
+                end = i + len(names)
+                if tuple(t for t, _ in tokens[i:end]) != names:
+                    continue
+                if place.name in self.capitalized and not tokens[i][1][:1].isupper():
+                    continue
+                match = (end, place)
+                break
+            if match:
+                i, place = match
+                places.append(place)
+            else:
+                i += 1
+        return places
+
+    def find_place(self, text: str, jurisdiction: Optional[str] = None) -> Optional[Place]:
+        """The place the request is about: the first one in `jurisdiction` if any, else the first mentioned."""
+        places = self.find_places(text)
+        if not places:
+            return None
+        return next((p for p in places if p.province == jurisdiction), places[0])
+
+    def province(self, code: Optional[str]) -> Optional[dict]:
+        return self.provinces.get((code or "").upper())
+
+    def referral_links(self, province: str, municipality: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(label, url) for the province's law society directory (city-filtered where supported) and referral service."""
+        info = self.province(province)
+        if info is None:
+            return []
+        links = []
+        if municipality and info.get("city_directory"):
+            links.append((f"{info['law_society']} directory: lawyers and paralegals in {municipality}",
+                          info["city_directory"].format(city=quote(municipality))))
+        else:
+            hint = f" (search for {municipality})" if municipality else ""
+            links.append((f"{info['law_society']} directory{hint}", info["directory"]))
+        if info.get("referral"):
+            links.append((info["referral"]["name"], info["referral"]["url"]))
+        return links
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer() -> Gazetteer:
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        return Gazetteer(json.load(f))
+
+
+def find_place(text: str, jurisdiction: Optional[str] = None) -> Optional[Place]:
+    return get_gazetteer().find_place(text, jurisdiction)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("text")
+    parser.add_argument("--jurisdiction", help="User's province code, preferred when several places are mentioned")
+    args = parser.parse_args(argv)
+    gazetteer = get_gazetteer()
+    place = gazetteer.find_place(args.text, args.jurisdiction)
+    province = place.province if place else args.jurisdiction
+    print(json.dumps({
+        "place": place.__dict__ if place else None,
+        "links": gazetteer.referral_links(province, place.municipality if place else None) if province else [],
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
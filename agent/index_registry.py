@@ -0,0 +1,111 @@
+"""
+Registry of vector indexes and the embedding model behind each one.
+
+Every ingest path records, per collection, the embedding model, vector
+dimension and storage precision it wrote (juris_db.index_registry). The app
+only queries an index whose model matches its query embedder, so a 1024-dim
+voyage-law-2 collection and the 768-dim Gemini one can coexist without
+silently returning garbage.
+
+    python -m agent.index_registry list
+"""
+import argparse
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+REGISTRY_COLLECTION = "index_registry"
+# Metadata research_node pre-filters on; Atlas only filters on fields declared in the index
+FILTER_FIELDS = ["jurisdiction", "category"]
+# Atlas automatic quantization of the indexed vectors: "none", "scalar" (int8) or "binary".
+# Atlas keeps the full-fidelity vectors and rescores candidates with them.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+PRECISION_BY_QUANTIZATION = {"none": "float32", "scalar": "int8", "binary": "binary"}
+
+
+class IndexMismatch(RuntimeError):
+    """No registered index was built with the query embedder's model and dimension."""
+
+
+@dataclass
+class IndexSpec:
+    collection: str
+    index_name: str
+    embedding_model: str
+    dimensions: int
+    precision: str = "float32"  # float32 | int8 | binary (what the index searches over)
+    embedding_path: str = "embedding"
+    updated_at: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.collection}/{self.index_name}"
+
+
+def register_index(db, spec: IndexSpec) -> IndexSpec:
+    spec.updated_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    db[REGISTRY_COLLECTION].replace_one({"_id": spec.key}, {"_id": spec.key, **asdict(spec)}, upsert=True)
+    return spec
+
+
+def load_registry(db) -> List[IndexSpec]:
+    return [IndexSpec(**{k: v for k, v in doc.items() if k != "_id"}) for doc in db[REGISTRY_COLLECTION].find()]
+
+
+def select_index(specs: List[IndexSpec], embedding_model: str, dimensions: Optional[int] = None) -> IndexSpec:
+    """The index built with `embedding_model` (and `dimensions`, when known)."""
+    matches = [s for s in specs if s.embedding_model == embedding_model and (dimensions is None or s.dimensions == dimensions)]
+    if not matches:
+        known = ", ".join(f"{s.key} ({s.embedding_model}, {s.dimensions}d)" for s in specs) or "none"
+        raise IndexMismatch(f"No vector index built with {embedding_model}; registered: {known}")
+    # Prefer the most recently (re)built one
+    return max(matches, key=lambda s: s.updated_at or "")
+
+
+def ensure_vector_index(collection, index_name: str, dimensions: int, quantization: str = VECTOR_QUANTIZATION) -> str:
+    """
+    Creates (or updates) the Atlas vector index, declaring the filter fields so
+    topic/jurisdiction pre-filters narrow the search instead of erroring.
+    Returns the precision the index searches at.
+    """
+    vector_field = {"type": "vector", "path": "embedding", "numDimensions": dimensions, "similarity": "cosine"}
+    if quantization != "none":
+        vector_field["quantization"] = quantization
+    definition = {"fields": [vector_field] + [{"type": "filter", "path": field} for field in FILTER_FIELDS]}
+    from pymongo.operations import SearchIndexModel
+    existing = {index["name"] for index in collection.list_search_indexes()}
+    if index_name in existing:
+        collection.update_search_index(index_name, definition)
+    else:
+        collection.create_search_index(SearchIndexModel(definition=definition, name=index_name, type="vectorSearch"))
+    precision = PRECISION_BY_QUANTIZATION[quantization]
+    print(f"Vector index {index_name}: {dimensions} dims ({precision}), filters on {', '.join(FILTER_FIELDS)}")
+    return precision
+
+
+def ensure_and_register(collection, index_name: str, embedding_model: str, dimensions: int,
+                        quantization: str = VECTOR_QUANTIZATION) -> IndexSpec:
+    precision = ensure_vector_index(collection, index_name, dimensions, quantization)
+    return register_index(collection.database, IndexSpec(collection.name, index_name, embedding_model, dimensions, precision))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["list"])
+    parser.parse_args(argv)
+    try:
+        from agent import agent_graph
+    except ImportError:
+        import agent_graph
+
+    collection = agent_graph.get_db_connection()
+    if collection is None:
+        print("Database connection failed (is MONGODB_URI set?)")
+        return
+    for spec in load_registry(collection.database):
+        print(f"{spec.key:<40} {spec.embedding_model:<32} {spec.dimensions:>5}d  {spec.precision:<8} {spec.updated_at}")
+
+
+if __name__ == "__main__":
+    main()
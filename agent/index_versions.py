@@ -0,0 +1,450 @@
+"""
+Blue/green versions of the Atlas corpus behind an alias.
+
+A rebuild never touches the collection the app is searching. It writes into a
+fresh versioned collection (legal_docs__v20260101120000), builds its vector
+index and waits until Atlas reports it queryable, then runs a validation gate:
+
+    - the version is not empty and its vectors have the index's dimension
+    - every jurisdiction served today still has chunks, and none lost more than
+      VALIDATE_MAX_DROP of them
+    - the retrieval golden set returns results for every query, with recall no
+      more than VALIDATE_MAX_RECALL_DROP below the live version
+
+Only a version that passes is promoted: one conditional update of the alias
+document (juris_db.index_aliases) switches research_node over, and the
+previous versions stay on disk for an instant rollback. Running instances
+re-read the alias every ALIAS_REFRESH_S seconds.
+
+Builds go through rebuild(): `python agent/ingest.py`, `python -m agent.snapshot
+import ... --to atlas` and Atlas ingest jobs all produce a new version.
+
+    python -m agent.index_versions list
+    python -m agent.index_versions validate <collection>
+    python -m agent.index_versions promote <collection> [--skip-validation]
+    python -m agent.index_versions rollback
+    python -m agent.index_versions prune
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from agent.index_registry import (
+        VECTOR_QUANTIZATION, IndexSpec, ensure_vector_index, load_registry, register_index,
+    )
+    from agent.metrics import log
+except ImportError:
+    from index_registry import VECTOR_QUANTIZATION, IndexSpec, ensure_vector_index, load_registry, register_index
+    from metrics import log
+
+ALIAS_COLLECTION = "index_aliases"
+VERSIONS_COLLECTION = "index_versions"
+# The name research_node searches; versions are <alias>__v<timestamp>
+CORPUS_ALIAS = os.getenv("CORPUS_ALIAS", "legal_docs")
+VERSION_INDEX_NAME = "vector_index"
+# Previous versions kept (and reachable by rollback) after a promotion
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
+INDEX_BUILD_TIMEOUT_S = float(os.getenv("INDEX_BUILD_TIMEOUT_S", "1800"))
+INDEX_POLL_S = 5.0
+VALIDATE_MAX_DROP = float(os.getenv("VALIDATE_MAX_DROP", "0.2"))
+VALIDATE_MAX_RECALL_DROP = float(os.getenv("VALIDATE_MAX_RECALL_DROP", "0.05"))
+VALIDATE_K = 5
+INSERT_BATCH = int(os.getenv("SNAPSHOT_INSERT_BATCH", "500"))
+# Versions prune() may drop. Builds in progress belong to another run, and a
+# validated version that was not promoted ("ready") is waiting for promote()
+PRUNABLE_STATUSES = ("previous", "rolled_back", "failed")
+
+
+class VersionError(RuntimeError):
+    """The alias could not be moved (missing version, concurrent swap, nothing to roll back to)."""
+
+
+class ValidationFailed(VersionError):
+    def __init__(self, collection: str, report: dict):
+        failed = ", ".join(c["name"] for c in report["checks"] if not c["passed"])
+        super().__init__(f"{collection} failed validation ({failed}); the alias was not moved")
+        self.report = report
+
+
+# --- Alias ---
+
+def get_alias(db, alias: str = CORPUS_ALIAS) -> Optional[dict]:
+    return db[ALIAS_COLLECTION].find_one({"_id": alias})
+
+
+def alias_spec(doc: dict) -> IndexSpec:
+    return IndexSpec(**doc["current"])
+
+
+def _record(db, collection: str, **fields) -> None:
+    db[VERSIONS_COLLECTION].update_one({"_id": collection}, {"$set": fields}, upsert=True)
+
+
+def promote(db, spec: IndexSpec, alias: str = CORPUS_ALIAS, report: Optional[dict] = None) -> dict:
+    """
+    Points `alias` at `spec` in one conditional update: if another promotion or
+    rollback moved the alias since we read it, nothing changes and VersionError
+    is raised. The replaced version is kept in the alias history for rollback.
+    """
+    if spec.collection not in db.list_collection_names():
+        raise VersionError(f"No collection {spec.collection}")
+    spec = register_index(db, spec)
+    now = time.strftime("%Y-%m-%dT%H:%M:%S")
+    current = get_alias(db, alias)
+    if current is None:
+        from pymongo.errors import DuplicateKeyError
+        # The pre-versioning collection stays reachable by rollback
+        legacy = [asdict(s) for s in load_registry(db) if s.collection == alias]
+        doc = {"_id": alias, "current": asdict(spec), "generation": 1, "history": legacy[-KEEP_VERSIONS:], "swapped_at": now}
+        try:
+            db[ALIAS_COLLECTION].insert_one(doc)
+        except DuplicateKeyError:
+            raise VersionError(f"Alias {alias} was created concurrently; retry")
+    else:
+        if current["current"]["collection"] == spec.collection:
+            raise VersionError(f"{alias} already points at {spec.collection}")
+        result = db[ALIAS_COLLECTION].update_one(
+            {"_id": alias, "generation": current["generation"]},
+            {
+                "$set": {"current": asdict(spec), "swapped_at": now},
+                "$inc": {"generation": 1},
+                "$push": {"history": {"$each": [current["current"]], "$slice": -KEEP_VERSIONS}},
+            },
+        )
+        if result.matched_count == 0:
+            raise VersionError(f"Alias {alias} moved while promoting {spec.collection}; retry")
+        db[VERSIONS_COLLECTION].update_one({"_id": current["current"]["collection"]}, {"$set": {"status": "previous"}})
+    _record(db, spec.collection, alias=alias, status="live", promoted_at=now,
+            **({"validation": report} if report else {}))
+    log(f"Alias {alias} -> {spec.collection} ({spec.embedding_model}, {spec.dimensions}d)")
+    prune(db, alias)
+    return get_alias(db, alias)
+
+
+def rollback(db, alias: str = CORPUS_ALIAS) -> dict:
+    """Points `alias` back at the version it served before the last promotion."""
+    current = get_alias(db, alias)
+    if current is None or not current.get("history"):
+        raise VersionError(f"Alias {alias} has no previous version to roll back to")
+    previous = current["history"][-1]
+    if previous["collection"] not in db.list_collection_names():
+        raise VersionError(f"Previous version {previous['collection']} no longer exists")
+    result = db[ALIAS_COLLECTION].update_one(
+        {"_id": alias, "generation": current["generation"]},
+        {
+            "$set": {"current": previous, "swapped_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "$inc": {"generation": 1},
+            "$pop": {"history": 1},
+        },
+    )
+    if result.matched_count == 0:
+        raise VersionError(f"Alias {alias} moved during rollback; retry")
+    db[VERSIONS_COLLECTION].update_one({"_id": current["current"]["collection"]}, {"$set": {"status": "rolled_back"}})
+    db[VERSIONS_COLLECTION].update_one({"_id": previous["collection"]}, {"$set": {"status": "live"}})
+    log(f"Alias {alias} rolled back {current['current']['collection']} -> {previous['collection']}")
+    return get_alias(db, alias)
+
+
+def list_versions(db, alias: str = CORPUS_ALIAS) -> List[dict]:
+    return sorted(db[VERSIONS_COLLECTION].find({"alias": alias}), key=lambda v: v.get("created_at", ""), reverse=True)
+
+
+def prune(db, alias: str = CORPUS_ALIAS) -> List[str]:
+    """
+    Drops versions the alias can no longer reach (neither current nor in its
+    history) and that are done with: superseded, rolled back or failed.
+    """
+    doc = get_alias(db, alias)
+    if doc is None:
+        return []
+    keep = {doc["current"]["collection"]} | {h["collection"] for h in doc.get("history", [])}
+    dropped = []
+    for version in list_versions(db, alias):
+        if version["_id"] in keep or version.get("status") not in PRUNABLE_STATUSES:
+            continue
+        db.drop_collection(version["_id"])
+        _record(db, version["_id"], status="dropped")
+        dropped.append(version["_id"])
+    if dropped:
+        log(f"Dropped old {alias} versions: {', '.join(dropped)}")
+    return dropped
+
+
+# --- Building ---
+
+def new_version(db, alias: str = CORPUS_ALIAS):
+    """An empty versioned collection for the next build of `alias`."""
+    name = f"{alias}__v{time.strftime('%Y%m%d%H%M%S')}"
+    while name in db.list_collection_names():
+        time.sleep(1)
+        name = f"{alias}__v{time.strftime('%Y%m%d%H%M%S')}"
+    db.create_collection(name)
+    _record(db, name, alias=alias, status="building", created_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    return db[name]
+
+
+def copy_live(db, target, alias: str = CORPUS_ALIAS, exclude_sources: Iterable[str] = ()) -> int:
+    """Seeds `target` with the live version's chunks, minus those from `exclude_sources` (being replaced)."""
+    doc = get_alias(db, alias)
+    live = doc["current"]["collection"] if doc else alias
+    if live not in db.list_collection_names():
+        return 0
+    exclude = sorted(exclude_sources)
+    pipeline = [{"$match": {"source": {"$nin": exclude}}}] if exclude else []
+    db[live].aggregate(pipeline + [{"$project": {"_id": 0}}, {"$merge": {"into": target.name}}])
+    return target.count_documents({})
+
+
+def insert_rows(collection, rows: Iterable[Tuple[object, List[float]]],
+                on_batch: Optional[Callable[[int], None]] = None) -> Optional[int]:
+    """Inserts (document, vector) rows in the MongoDBAtlasVectorSearch layout; returns the vector dimension."""
+    try:
+        from agent.snapshot import EMBEDDING_KEY, TEXT_KEY
+    except ImportError:
+        from snapshot import EMBEDDING_KEY, TEXT_KEY
+    batch, dimensions = [], None
+    for doc, vector in rows:
+        dimensions = len(vector)
+        batch.append({TEXT_KEY: doc.page_content, EMBEDDING_KEY: [float(x) for x in vector], **doc.metadata})
+        if len(batch) >= INSERT_BATCH:
+            collection.insert_many(batch)
+            if on_batch:
+                on_batch(len(batch))
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+        if on_batch:
+            on_batch(len(batch))
+    return dimensions
+
+
+def wait_until_queryable(collection, index_name: str, timeout: float = INDEX_BUILD_TIMEOUT_S) -> float:
+    """Blocks until Atlas has built `index_name` over the collection's documents; returns seconds waited."""
+    started = time.monotonic()
+    while True:
+        indexes = list(collection.list_search_indexes(index_name))
+        status = indexes[0].get("status") if indexes else "MISSING"
+        if status == "FAILED":
+            raise VersionError(f"Atlas failed to build {index_name} on {collection.name}")
+        if indexes and indexes[0].get("queryable") and status == "READY":
+            return time.monotonic() - started
+        if time.monotonic() - started > timeout:
+            raise VersionError(f"{index_name} on {collection.name} still {status} after {timeout:.0f}s")
+        time.sleep(INDEX_POLL_S)
+
+
+def build_index(collection, embedding_model: str, dimensions: int, quantization: str = VECTOR_QUANTIZATION) -> IndexSpec:
+    precision = ensure_vector_index(collection, VERSION_INDEX_NAME, dimensions, quantization)
+    waited = wait_until_queryable(collection, VERSION_INDEX_NAME)
+    log(f"Vector index on {collection.name} queryable after {waited:.0f}s")
+    return IndexSpec(collection.name, VERSION_INDEX_NAME, embedding_model, dimensions, precision)
+
+
+# --- Validation gate ---
+
+def jurisdiction_counts(collection) -> Dict[str, int]:
+    rows = collection.aggregate([{"$group": {"_id": "$jurisdiction", "n": {"$sum": 1}}}])
+    return {str(row["_id"]): row["n"] for row in rows}
+
+
+def smoke_queries(db, spec: IndexSpec, embeddings, cases: List[dict]) -> dict:
+    """The retrieval golden set against one version, searched the way research_node searches."""
+    from langchain_mongodb import MongoDBAtlasVectorSearch
+    try:
+        from agent.retrieval_bench import partitioned_search, run_benchmark
+    except ImportError:
+        from retrieval_bench import partitioned_search, run_benchmark
+    collection = db[spec.collection]
+    store = MongoDBAtlasVectorSearch(collection, embeddings, index_name=spec.index_name)
+    retriever = partitioned_search(store, set(collection.distinct("category")))
+    return run_benchmark(retriever, cases, VALIDATE_K)
+
+
+def validate(db, spec: IndexSpec, embeddings, alias: str = CORPUS_ALIAS, cases: Optional[List[dict]] = None) -> dict:
+    """
+    Runs the validation gate on a built version, comparing it with the version
+    `alias` serves now (when that one was embedded with the same model).
+    """
+    try:
+        from agent.retrieval_bench import load_golden
+    except ImportError:
+        from retrieval_bench import load_golden
+    cases = cases if cases is not None else load_golden()
+    collection = db[spec.collection]
+    checks = []
+
+    def check(name: str, passed: bool, detail: str) -> None:
+        checks.append({"name": name, "passed": bool(passed), "detail": detail})
+
+    counts = jurisdiction_counts(collection)
+    total = sum(counts.values())
+    check("not_empty", total > 0, f"{total} chunks")
+
+    sample = collection.find_one({"embedding": {"$exists": True}}, {"embedding": 1})
+    found_dims = len(sample["embedding"]) if sample else None
+    check("dimensions", found_dims == spec.dimensions, f"vectors {found_dims}d, index {spec.dimensions}d")
+
+    live_doc = get_alias(db, alias)
+    live = alias_spec(live_doc) if live_doc else None
+    live_counts = jurisdiction_counts(db[live.collection]) if live else {}
+    required = set(live_counts) | {c["jurisdiction"] for c in cases if c.get("jurisdiction")}
+    for jurisdiction in sorted(required):
+        have, had = counts.get(jurisdiction, 0), live_counts.get(jurisdiction, 0)
+        ok = have > 0 and have >= (1 - VALIDATE_MAX_DROP) * had
+        check(f"jurisdiction:{jurisdiction}", ok, f"{have} chunks (live {had})")
+
+    result = smoke_queries(db, spec, embeddings, cases)
+    empty = [c["id"] for c in result["cases"] if not c["retrieved"]]
+    check("smoke_results", not empty, f"no results for {', '.join(empty)}" if empty else f"{len(cases)} queries answered")
+
+    recall = result["overall"][f"recall@{VALIDATE_K}"]
+    live_recall = None
+    if live and live.embedding_model == spec.embedding_model and live.collection != spec.collection:
+        live_recall = smoke_queries(db, live, embeddings, cases)["overall"][f"recall@{VALIDATE_K}"]
+    if live_recall is None:
+        check("smoke_recall", recall > 0, f"recall@{VALIDATE_K} {recall} (no comparable live version)")
+    else:
+        check("smoke_recall", recall >= live_recall - VALIDATE_MAX_RECALL_DROP,
+              f"recall@{VALIDATE_K} {recall} (live {live_recall})")
+
+    return {
+        "collection": spec.collection,
+        "passed": all(c["passed"] for c in checks),
+        "checks": checks,
+        "counts": counts,
+        f"recall@{VALIDATE_K}": recall,
+        "validated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def rebuild(db, write: Callable[[object], Optional[int]], embeddings, embedding_model: str,
+            alias: str = CORPUS_ALIAS, quantization: str = VECTOR_QUANTIZATION, promote_on_pass: bool = True) -> dict:
+    """
+    Builds a new version of `alias`: write(collection) fills it (returning the
+    vector dimension, or None to probe the embedder), then the index is built,
+    the gate run and, if it passes, the alias swapped. The live version serves
+    throughout; a failed version is left unreferenced for prune() to drop.
+    """
+    collection = new_version(db, alias)
+    try:
+        dimensions = write(collection) or len(embeddings.embed_query("dimension probe"))
+        spec = build_index(collection, embedding_model, dimensions, quantization)
+        _record(db, collection.name, status="validating", spec=asdict(spec))
+        report = validate(db, spec, embeddings, alias)
+    except Exception as e:
+        _record(db, collection.name, status="failed", error=f"{type(e).__name__}: {e}")
+        raise
+    _record(db, collection.name, status="ready" if report["passed"] else "failed", validation=report)
+    if not report["passed"]:
+        raise ValidationFailed(collection.name, report)
+    if promote_on_pass:
+        promote(db, spec, alias, report)
+    return {"version": collection.name, "promoted": promote_on_pass, "validation": report}
+
+
+# --- CLI ---
+
+def _graph():
+    try:
+        from agent import agent_graph
+    except ImportError:
+        import agent_graph
+    return agent_graph
+
+
+def _db(graph):
+    collection = graph.get_db_connection()
+    if collection is None:
+        raise VersionError("Database connection failed (is MONGODB_URI set?)")
+    return collection.database
+
+
+def _version_spec(db, collection: str) -> IndexSpec:
+    record = db[VERSIONS_COLLECTION].find_one({"_id": collection})
+    if not record or "spec" not in record:
+        raise VersionError(f"{collection} is not a built version of {CORPUS_ALIAS}")
+    return IndexSpec(**record["spec"])
+
+
+def cmd_list(args) -> None:
+    db = _db(_graph())
+    doc = get_alias(db, args.alias)
+    print(f"{args.alias} -> {doc['current']['collection'] if doc else '(no alias)'}"
+          f"{'  generation ' + str(doc['generation']) + ', swapped ' + doc['swapped_at'] if doc else ''}")
+    for version in list_versions(db, args.alias):
+        validation = version.get("validation") or {}
+        recall = validation.get(f"recall@{VALIDATE_K}")
+        print(f"  {version['_id']:<36} {version.get('status', ''):<12} {version.get('created_at', '')}"
+              f"{'  recall@' + str(VALIDATE_K) + ' ' + str(recall) if recall is not None else ''}")
+
+
+def cmd_validate(args) -> None:
+    graph = _graph()
+    db = _db(graph)
+    spec = _version_spec(db, args.collection)
+    report = validate(db, spec, graph.get_embeddings(), args.alias)
+    _record(db, spec.collection, validation=report)
+    print(json.dumps(report, indent=2))
+
+
+def cmd_promote(args) -> None:
+    graph = _graph()
+    db = _db(graph)
+    spec = _version_spec(db, args.collection)
+    report = None
+    if not args.skip_validation:
+        report = validate(db, spec, graph.get_embeddings(), args.alias)
+        if not report["passed"]:
+            raise ValidationFailed(spec.collection, report)
+    doc = promote(db, spec, args.alias, report)
+    print(f"{args.alias} -> {doc['current']['collection']} (generation {doc['generation']})")
+
+
+def cmd_rollback(args) -> None:
+    doc = rollback(_db(_graph()), args.alias)
+    print(f"{args.alias} -> {doc['current']['collection']} (generation {doc['generation']})")
+
+
+def cmd_prune(args) -> None:
+    dropped = prune(_db(_graph()), args.alias)
+    print(f"Dropped {len(dropped)} version(s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alias", default=CORPUS_ALIAS)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("list", help="Show the alias and every version").set_defaults(func=cmd_list)
+
+    val = sub.add_parser("validate", help="Run the validation gate on a built version")
+    val.add_argument("collection")
+    val.set_defaults(func=cmd_validate)
+
+    prom = sub.add_parser("promote", help="Point the alias at a built version")
+    prom.add_argument("collection")
+    prom.add_argument("--skip-validation", action="store_true")
+    prom.set_defaults(func=cmd_promote)
+
+    sub.add_parser("rollback", help="Point the alias back at the previous version").set_defaults(func=cmd_rollback)
+    sub.add_parser("prune", help="Drop versions the alias can no longer reach").set_defaults(func=cmd_prune)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    except ValidationFailed as e:
+        print(f"❌ {e}")
+        print(json.dumps(e.report, indent=2))
+        sys.exit(2)
+    except VersionError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
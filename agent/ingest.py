@@ -5,6 +5,14 @@ from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_mongodb import MongoDBAtlasVectorSearch
 from pymongo import MongoClient
 from dotenv import load_dotenv
+try:
+    from agent.citations import tag_chunks
+    from agent.index_versions import VersionError, rebuild
+    from agent.dedupe import INGEST_DEDUPE, dedupe_chunks
+except ImportError:
+    from citations import tag_chunks
+    from index_versions import VersionError, rebuild
+    from dedupe import INGEST_DEDUPE, dedupe_chunks
 
 load_dotenv()
 
@@ -12,12 +20,16 @@ load_dotenv()
 DB_NAME = "juris_db"
 COLLECTION_NAME = "legal_docs"
 INDEX_NAME = "vector_index"
+EMBEDDING_MODEL = "models/text-embedding-004"
 MONGODB_URI = os.getenv("MONGODB_URI")
 
 
 
 JURISDICTION_MAP = {
     "ontario_rta.html": "ON",
+    # Excerpt pages of the full acts: same jurisdiction, so dedupe compares them
+    "bc_rta.html": "BC",
+    "alberta_rta.html": "AB",
     "bc_rta_full.html": "BC",
     "alberta_rta_full.html": "AB",
     "divorce_act.xml": "FEDERAL",
@@ -28,17 +40,25 @@ JURISDICTION_MAP = {
 
 def get_embeddings():
     print("Using Google Gemini Embeddings (text-embedding-004) 🧠")
-    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
 
-def ingest_data(file_path):
-    print(f"--- Starting Ingestion for {file_path} ---")
-    
-    if not os.path.exists(file_path):
-        print(f"File not found: {file_path}")
-        return
+TARGET_FILES = [
+    "docs/ontario_rta.html", 
+    "docs/bc_rta_full.html", 
+    "docs/alberta_rta_full.html",
+    "docs/divorce_act.xml",
+    "docs/criminal_code.xml",
+    "docs/income_tax.xml",
+    "docs/excise_tax.xml"
+]
 
-    # Load
-    if file_path.endswith(".html") or file_path.endswith(".xml"):
+def load_documents(file_path, source=None, metadata=None):
+    """
+    Loads one source file and tags jurisdiction/source metadata.
+    `source` overrides the filename used as the source key (downloaded copies);
+    `metadata` adds or overrides fields such as jurisdiction and category.
+    """
+    if file_path.endswith(".html") or file_path.endswith(".htm") or file_path.endswith(".xml"):
         # BSHTMLLoader works well for XML too
         loader = BSHTMLLoader(file_path)
     else:
@@ -47,23 +67,62 @@ def ingest_data(file_path):
     docs = loader.load()
     
     # Metadata Tagging
-    filename = os.path.basename(file_path)
+    filename = source or os.path.basename(file_path)
     jurisdiction = JURISDICTION_MAP.get(filename, "General")
     
     for doc in docs:
         doc.metadata["jurisdiction"] = jurisdiction
         doc.metadata["source"] = filename
-    
-    # Split
+        doc.metadata.update(metadata or {})
+    return docs
+
+def split_documents(docs):
+    """Splits loaded documents into chunks tagged with their citation (chunk_id, act, section, url)."""
     splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = splitter.split_documents(docs)
-    print(f"Docs split into {len(splits)} chunks. Jurisdiction: {jurisdiction}")
+    return tag_chunks(splitter.split_documents(docs))
+
+def load_and_split(file_path):
+    """
+    Loads one source file, tags jurisdiction/source metadata and splits it into chunks.
+    Chunks are then tagged with their citation (chunk_id, act, section, url).
+    """
+    docs = load_documents(file_path)
+    splits = split_documents(docs)
+    print(f"Docs split into {len(splits)} chunks. Jurisdiction: {docs[0].metadata['jurisdiction'] if docs else 'General'}")
+    return splits
+
+def load_corpus(files=TARGET_FILES, dedupe=INGEST_DEDUPE):
+    """
+    Chunks from every source file, with near-duplicates across them collapsed
+    (agent/dedupe.py). Returns (chunks, DedupeReport or None).
+    """
+    chunks = []
+    for path in files:
+        if os.path.exists(path):
+            chunks.extend(load_and_split(path))
+        else:
+            print(f"Skipping missing source {path}")
+    report = None
+    if dedupe:
+        chunks, report = dedupe_chunks(chunks)
+        print(report.summary())
+    return chunks, report
+
+def ingest_data(file_path, collection=None):
+    print(f"--- Starting Ingestion for {file_path} ---")
+    
+    if not os.path.exists(file_path):
+        print(f"File not found: {file_path}")
+        return
+
+    splits = load_and_split(file_path)
 
     # Embed & Store
     embeddings = get_embeddings()
-    collection = MongoClient(MONGODB_URI)[DB_NAME][COLLECTION_NAME]
+    if collection is None:
+        collection = MongoClient(MONGODB_URI)[DB_NAME][COLLECTION_NAME]
     
-    print(f"Pushing to MongoDB Atlas [{DB_NAME}.{COLLECTION_NAME}]...")
+    print(f"Pushing to MongoDB Atlas [{DB_NAME}.{collection.name}]...")
     
     # Efficiently ingest all documents
     MongoDBAtlasVectorSearch.from_documents(
@@ -79,24 +138,21 @@ if __name__ == "__main__":
     if not MONGODB_URI:
         print("CRITICAL: MONGODB_URI is missing in .env")
     else:
-        # Wipe existing data to prevent dimension mismatch
-        print("⚠ Wiping existing collection to prevent vector dimension mismatch...")
-        MongoClient(MONGODB_URI)[DB_NAME][COLLECTION_NAME].delete_many({})
-        print("Collection cleared.")
-
-        # List of files to ingest
-        target_files = [
-            "docs/ontario_rta.html", 
-            "docs/bc_rta_full.html", 
-            "docs/alberta_rta_full.html",
-            "docs/divorce_act.xml",
-            "docs/criminal_code.xml",
-            "docs/income_tax.xml",
-            "docs/excise_tax.xml"
-        ]
-        
-        for file in target_files:
-            if os.path.exists(file):
-                 ingest_data(file)
-            else:
-                 print(f"Warning: {file} not found.")
+        # Build a new corpus version beside the live one; the alias only moves
+        # to it once it passes validation, so searches never see a partial index
+        def write(collection):
+            # All sources first, so copies across files are deduplicated before anything is embedded
+            chunks, _ = load_corpus()
+            print(f"Pushing {len(chunks)} chunks to MongoDB Atlas [{DB_NAME}.{collection.name}]...")
+            MongoDBAtlasVectorSearch.from_documents(
+                documents=chunks,
+                embedding=get_embeddings(),
+                collection=collection,
+                index_name=INDEX_NAME
+            )
+
+        try:
+            result = rebuild(MongoClient(MONGODB_URI)[DB_NAME], write, get_embeddings(), EMBEDDING_MODEL, alias=COLLECTION_NAME)
+            print(f"✅ {result['version']} is now live.")
+        except VersionError as e:
+            print(f"❌ {e}")
@@ -0,0 +1,624 @@
+"""
+Background ingestion jobs.
+
+The admin API (agent/server.py, /admin/ingest/jobs) only writes job files;
+the work happens in a separate, niced worker process so parsing and embedding
+never compete with /chat on the serving event loop. Jobs live as JSON files in
+INGEST_JOBS_DIR, one per job, rewritten atomically by the worker as it goes.
+A single worker drains them in submission order.
+
+Each job runs the pipeline fetched -> parsed -> chunked -> deduplicated -> embedded -> written
+and reports per-stage counts, throughput and an ETA. The worker holds itself to
+a CPU budget (fraction of one core) and an embedding-rate budget (chunks/s).
+
+    python -m agent.ingest_jobs worker [--exit-when-idle 60]
+    python -m agent.ingest_jobs submit docs/ontario_rta.html --target atlas --replace
+    python -m agent.ingest_jobs list
+    python -m agent.ingest_jobs status <job_id>
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): the heartbeat alone says whether a worker runs
+    fcntl = None
+
+JOBS_DIR = os.getenv("INGEST_JOBS_DIR", "ingest_jobs")
+DOCS_DIR = "docs"
+# Fraction of one core the worker may use (measured as process CPU time over wall time)
+INGEST_CPU_FRACTION = float(os.getenv("INGEST_CPU_FRACTION", "0.5"))
+# Chunks embedded per second, across all embedding requests
+INGEST_EMBED_RATE = float(os.getenv("INGEST_EMBED_RATE", "50"))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "50"))
+INGEST_NICE = int(os.getenv("INGEST_NICE", "10"))
+# The server starts a worker on submit when none is running (0 = run one yourself)
+INGEST_SPAWN_WORKER = os.getenv("INGEST_SPAWN_WORKER", "1") == "1"
+WORKER_IDLE_EXIT_S = float(os.getenv("INGEST_WORKER_IDLE_EXIT_S", "300"))
+HEARTBEAT_STALE_S = 30.0
+# How often a busy worker refreshes its heartbeat (long index builds included)
+HEARTBEAT_INTERVAL_S = 5.0
+
+STAGES = ("fetched", "parsed", "chunked", "deduplicated", "embedded", "written")
+TARGETS = ("atlas", "snapshot")
+TERMINAL = ("succeeded", "failed", "cancelled")
+WORKER_FILE = "worker.json"
+# Held (flock) by the running worker for its lifetime; a second worker cannot take it
+LOCK_FILE = "worker.lock"
+
+
+class JobError(ValueError):
+    """The job spec is invalid."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# --- Job files ---
+
+def _path(job_id: str, suffix: str = ".json") -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}{suffix}")
+
+
+def _write_json(path: str, data: dict) -> None:
+    # Readers never see a half-written file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def validate_spec(spec: dict) -> dict:
+    """
+    Normalizes a job spec:
+        sources     paths under docs/, or {"url", "name", "jurisdiction", "category"} dicts
+                    (default: every file ingest.py ingests)
+        target      "atlas" (build and promote a new corpus version) or "snapshot" (write `out`)
+        replace     drop the sources' existing chunks from the new version (atlas)
+        embeddings  "gemini" or "fake"
+        dedupe      collapse near-duplicate chunks before embedding (default INGEST_DEDUPE)
+        cpu_fraction, embed_rate   per-job budget overrides
+    """
+    try:
+        from agent.ingest import TARGET_FILES
+        from agent.dedupe import INGEST_DEDUPE
+    except ImportError:
+        from ingest import TARGET_FILES
+        from dedupe import INGEST_DEDUPE
+
+    sources = spec.get("sources") or list(TARGET_FILES)
+    for source in sources:
+        if isinstance(source, dict):
+            if not str(source.get("url", "")).startswith(("http://", "https://")):
+                raise JobError(f"URL source needs an http(s) url: {source}")
+        elif not isinstance(source, str) or not os.path.exists(source):
+            raise JobError(f"Source file not found: {source}")
+        elif not os.path.realpath(source).startswith(os.path.realpath(DOCS_DIR) + os.sep):
+            raise JobError(f"Source files must be under {DOCS_DIR}/: {source}")
+    target = spec.get("target", "atlas")
+    if target not in TARGETS:
+        raise JobError(f"target must be one of {', '.join(TARGETS)}")
+    if target == "snapshot" and not spec.get("out"):
+        raise JobError("target snapshot needs an 'out' directory")
+    if spec.get("embeddings", "gemini") not in ("gemini", "fake"):
+        raise JobError("embeddings must be gemini or fake")
+    return {
+        "sources": sources,
+        "target": target,
+        "out": spec.get("out"),
+        "replace": bool(spec.get("replace", False)),
+        "embeddings": spec.get("embeddings", "gemini"),
+        "dedupe": bool(spec["dedupe"]) if spec.get("dedupe") is not None else INGEST_DEDUPE,
+        "cpu_fraction": float(spec.get("cpu_fraction") or INGEST_CPU_FRACTION),
+        "embed_rate": float(spec.get("embed_rate") or INGEST_EMBED_RATE),
+    }
+
+
+def submit_job(spec: dict) -> dict:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    job = {
+        "id": f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}",
+        "status": "queued",
+        "spec": validate_spec(spec),
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "error": None,
+        "stages": {stage: {"done": 0, "total": None} for stage in STAGES},
+        "throughput": {},
+        "eta_s": None,
+        "worker_pid": None,
+    }
+    _write_json(_path(job["id"]), job)
+    return job
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    if not re.fullmatch(r"[\w-]+", job_id):
+        return None
+    job = _read_json(_path(job_id))
+    if job and job["status"] not in TERMINAL and os.path.exists(_path(job_id, ".cancel")):
+        job["cancel_requested"] = True
+    return job
+
+
+def list_jobs(limit: int = 50) -> List[dict]:
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    ids = sorted((name[:-5] for name in os.listdir(JOBS_DIR) if name.endswith(".json") and name != WORKER_FILE), reverse=True)
+    return [job for job in (get_job(job_id) for job_id in ids[:limit]) if job]
+
+
+def cancel_job(job_id: str) -> Optional[dict]:
+    """Asks the worker to stop `job_id` (it checks between batches); queued jobs never start."""
+    job = get_job(job_id)
+    if job is None or job["status"] in TERMINAL:
+        return job
+    open(_path(job_id, ".cancel"), "w").close()
+    return get_job(job_id)
+
+
+def _cancel_requested(job_id: str) -> bool:
+    return os.path.exists(_path(job_id, ".cancel"))
+
+
+# --- Worker liveness ---
+
+def _lock_held() -> Optional[bool]:
+    """Whether a worker holds the worker lock; None when flock is unavailable."""
+    if fcntl is None:
+        return None
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(os.path.join(JOBS_DIR, LOCK_FILE), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+    return False
+
+
+def worker_status() -> Optional[dict]:
+    """The live worker's heartbeat record, or None when no worker is running."""
+    info = _read_json(os.path.join(JOBS_DIR, WORKER_FILE))
+    held = _lock_held()
+    if held is not None:
+        # The lock is authoritative: a worker deep in a long job may be late with its heartbeat
+        if not held:
+            return None
+        info = dict(info or {})
+        info["stale"] = time.time() - info.get("heartbeat", 0) > HEARTBEAT_STALE_S
+        return info
+    if not info or time.time() - info.get("heartbeat", 0) > HEARTBEAT_STALE_S:
+        return None
+    try:
+        os.kill(info["pid"], 0)
+    except (OSError, KeyError):
+        return None
+    return info
+
+
+_spawned: Optional[subprocess.Popen] = None
+
+
+def ensure_worker() -> Optional[int]:
+    """Starts a background worker process unless one is already running; returns its pid."""
+    global _spawned
+    info = worker_status()
+    if info:
+        return info.get("pid")
+    # Started by us but not heartbeating yet (poll() also reaps one that exited)
+    if _spawned is not None and _spawned.poll() is None:
+        return _spawned.pid
+    if not INGEST_SPAWN_WORKER:
+        return None
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(
+        os.environ,
+        INGEST_JOBS_DIR=os.path.abspath(JOBS_DIR),
+        PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])),
+        # One BLAS thread: the CPU budget is per core
+        OMP_NUM_THREADS="1", OPENBLAS_NUM_THREADS="1", MKL_NUM_THREADS="1",
+    )
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(os.path.join(JOBS_DIR, "worker.log"), "ab") as log_file:
+        _spawned = subprocess.Popen(
+            [sys.executable, "-m", "agent.ingest_jobs", "worker", "--exit-when-idle", str(WORKER_IDLE_EXIT_S)],
+            env=env,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    return _spawned.pid
+
+
+# --- Budgets ---
+
+class CpuBudget:
+    """Sleeps between units of work to keep process CPU time under `fraction` of wall time."""
+
+    def __init__(self, fraction: float):
+        self.fraction = max(0.05, fraction)
+        self._cpu0 = time.process_time()
+        self._wall0 = time.monotonic()
+
+    def throttle(self) -> None:
+        cpu = time.process_time() - self._cpu0
+        wall = time.monotonic() - self._wall0
+        owed = cpu / self.fraction - wall
+        if owed > 0:
+            time.sleep(owed)
+
+
+class RateLimiter:
+    """Token bucket over chunks: acquire(n) blocks until n more chunks fit the rate."""
+
+    def __init__(self, per_second: float, burst: Optional[float] = None):
+        self.rate = per_second
+        self.capacity = burst or max(per_second, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+
+    def acquire(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # A batch larger than the bucket waits for a full bucket, then overdraws
+            if self._tokens >= min(n, self.capacity):
+                self._tokens -= n
+                return
+            time.sleep((min(n, self.capacity) - self._tokens) / self.rate)
+
+
+# --- Pipeline ---
+
+class JobRunner:
+    def __init__(self, job: dict):
+        self.job = job
+        self.spec = job["spec"]
+        self.cpu = CpuBudget(self.spec["cpu_fraction"])
+        self.limiter = RateLimiter(self.spec["embed_rate"])
+        self._stage_started: Dict[str, float] = {}
+        self._last_save = 0.0
+
+    # Progress
+
+    def progress(self, stage: str, done: Optional[int] = None, total: Optional[int] = None, advance: int = 0) -> None:
+        entry = self.job["stages"][stage]
+        self._stage_started.setdefault(stage, time.monotonic())
+        if total is not None:
+            entry["total"] = total
+        entry["done"] = done if done is not None else entry["done"] + advance
+        self._update_rates()
+        if _cancel_requested(self.job["id"]):
+            raise JobCancelled()
+        self.save()
+
+    def _update_rates(self) -> None:
+        rates = {}
+        for stage in ("embedded", "written"):
+            started = self._stage_started.get(stage)
+            done = self.job["stages"][stage]["done"]
+            if started and done:
+                rates[f"{stage}_per_s"] = round(done / max(time.monotonic() - started, 1e-6), 2)
+        self.job["throughput"] = rates
+        # Embedding is the slow stage; writes trail it by at most a batch
+        total = self.job["stages"]["embedded"]["total"]
+        rate = rates.get("embedded_per_s") or self.spec["embed_rate"]
+        if total is not None and rate:
+            self.job["eta_s"] = round((total - self.job["stages"]["embedded"]["done"]) / rate, 1)
+
+    def save(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - self._last_save >= 1.0:
+            _write_json(_path(self.job["id"]), self.job)
+            self._last_save = now
+            _beat()
+
+    # Stages
+
+    def fetch(self, source, workdir: str) -> Tuple[str, Optional[str], dict]:
+        """Local path (downloaded for URL sources), source key and extra metadata."""
+        if isinstance(source, str):
+            return source, None, {}
+        import requests
+        response = requests.get(source["url"], timeout=60, headers={"User-Agent": "Mozilla/5.0 (juris ingest worker)"})
+        response.raise_for_status()
+        path = os.path.join(workdir, f"{uuid.uuid4().hex}.html")
+        with open(path, "wb") as f:
+            f.write(response.content)
+        extra = {k: source[k] for k in ("jurisdiction", "category") if source.get(k)}
+        extra["url"] = source["url"]
+        return path, source.get("name") or source["url"], extra
+
+    def embeddings(self):
+        if self.spec["embeddings"] == "fake":
+            try:
+                from agent.fakes import FakeEmbeddings
+            except ImportError:
+                from fakes import FakeEmbeddings
+            return FakeEmbeddings(), "fake-embeddings"
+        try:
+            from agent.ingest import EMBEDDING_MODEL, get_embeddings
+        except ImportError:
+            from ingest import EMBEDDING_MODEL, get_embeddings
+        return get_embeddings(), EMBEDDING_MODEL
+
+    def embed(self, chunks: list, embeddings) -> Iterator[Tuple[object, List[float]]]:
+        for start in range(0, len(chunks), INGEST_EMBED_BATCH):
+            batch = chunks[start:start + INGEST_EMBED_BATCH]
+            self.limiter.acquire(len(batch))
+            vectors = embeddings.embed_documents([c.page_content for c in batch])
+            self.progress("embedded", advance=len(batch))
+            yield from zip(batch, vectors)
+            self.cpu.throttle()
+
+    def run(self) -> None:
+        try:
+            from agent.ingest import load_documents, split_documents
+            from agent.dedupe import dedupe_chunks
+        except ImportError:
+            from ingest import load_documents, split_documents
+            from dedupe import dedupe_chunks
+
+        sources = self.spec["sources"]
+        for stage in ("fetched", "parsed"):
+            self.progress(stage, done=0, total=len(sources))
+        chunks = []
+        with tempfile.TemporaryDirectory(prefix="ingest-") as workdir:
+            for source in sources:
+                path, source_key, extra = self.fetch(source, workdir)
+                self.progress("fetched", advance=1)
+                docs = load_documents(path, source=source_key, metadata=extra)
+                self.progress("parsed", advance=1)
+                # Split per source: citation tagging carries sections in document order
+                chunks.extend(split_documents(docs))
+                self.progress("chunked", done=len(chunks))
+                self.cpu.throttle()
+        self.progress("chunked", done=len(chunks), total=len(chunks))
+        if self.spec.get("dedupe"):
+            self.progress("deduplicated", done=0, total=len(chunks))
+            chunks, report = dedupe_chunks(chunks)
+            self.job["dedupe"] = report.as_dict()
+        self.progress("deduplicated", done=len(chunks), total=len(chunks))
+        self.cpu.throttle()
+        self.progress("embedded", done=0, total=len(chunks))
+        self.progress("written", done=0, total=len(chunks))
+
+        embeddings, model = self.embeddings()
+        rows = self.embed(chunks, embeddings)
+        if self.spec["target"] == "snapshot":
+            self.write_snapshot(rows, model)
+        else:
+            self.write_atlas(rows, model, {c.metadata["source"] for c in chunks}, embeddings)
+
+    def write_snapshot(self, rows, model: str) -> None:
+        try:
+            from agent.snapshot import write_snapshot
+        except ImportError:
+            from snapshot import write_snapshot
+
+        def counted():
+            for row in rows:
+                yield row
+                self.progress("written", advance=1)
+        write_snapshot(self.spec["out"], counted(), model)
+
+    def write_atlas(self, rows, model: str, sources: set, embeddings) -> None:
+        """
+        Writes a new corpus version (the live one with `sources` added, or
+        swapped out when replacing) and promotes it once it validates.
+        """
+        try:
+            from agent.ingest import DB_NAME, MONGODB_URI
+            from agent.index_versions import copy_live, insert_rows, rebuild
+        except ImportError:
+            from ingest import DB_NAME, MONGODB_URI
+            from index_versions import copy_live, insert_rows, rebuild
+        from pymongo import MongoClient
+
+        db = MongoClient(MONGODB_URI)[DB_NAME]
+
+        def write(collection):
+            copy_live(db, collection, exclude_sources=sources if self.spec["replace"] else ())
+            return insert_rows(collection, rows, on_batch=lambda n: self.progress("written", advance=n))
+
+        # rebuild() waits up to INDEX_BUILD_TIMEOUT_S for Atlas without reporting progress
+        with _heartbeat_thread():
+            self.job["index_version"] = rebuild(db, write, embeddings, model)
+
+
+def run_job(job: dict) -> dict:
+    job.update({"status": "running", "started_at": time.time(), "worker_pid": os.getpid()})
+    runner = JobRunner(job)
+    runner.save(force=True)
+    try:
+        runner.run()
+        job["status"] = "succeeded"
+        job["eta_s"] = 0
+    except JobCancelled:
+        job["status"] = "cancelled"
+    except Exception as e:
+        job["status"], job["error"] = "failed", f"{type(e).__name__}: {e}"
+    job["finished_at"] = time.time()
+    runner.save(force=True)
+    return job
+
+
+# --- Worker ---
+
+# This process's worker record while it runs as the worker (refreshed by _beat())
+_worker_record: Optional[dict] = None
+_beat_lock = threading.Lock()
+
+
+def _heartbeat(started: float, current: Optional[str]) -> None:
+    global _worker_record
+    _worker_record = {"pid": os.getpid(), "started_at": started, "current_job": current}
+    _beat()
+
+
+def _beat() -> None:
+    """Refreshes the worker's heartbeat; a no-op outside the worker process."""
+    if _worker_record is None:
+        return
+    with _beat_lock:
+        _write_json(os.path.join(JOBS_DIR, WORKER_FILE), dict(_worker_record, heartbeat=time.time()))
+
+
+@contextmanager
+def _heartbeat_thread(interval: float = HEARTBEAT_INTERVAL_S):
+    """Keeps the heartbeat fresh from a background thread while the body blocks."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            _beat()
+
+    thread = threading.Thread(target=loop, name="ingest-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join(timeout=interval)
+
+
+@contextmanager
+def _worker_lock():
+    """Holds worker.lock for the body; yields False when another worker has it."""
+    if fcntl is None:
+        existing = worker_status()
+        yield not (existing and existing["pid"] != os.getpid())
+        return
+    with open(os.path.join(JOBS_DIR, LOCK_FILE), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _next_queued() -> Optional[dict]:
+    for job in reversed(list_jobs(limit=1000)):  # oldest first
+        if job["status"] == "queued":
+            if job.get("cancel_requested"):
+                job.update({"status": "cancelled", "finished_at": time.time()})
+                _write_json(_path(job["id"]), job)
+                continue
+            return job
+    return None
+
+
+def worker(exit_when_idle: Optional[float] = None, poll_s: float = 2.0) -> None:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with _worker_lock() as acquired:
+        if not acquired:
+            existing = _read_json(os.path.join(JOBS_DIR, WORKER_FILE)) or {}
+            print(f"Worker {existing.get('pid', '?')} is already running")
+            return
+        _run_worker(exit_when_idle, poll_s)
+
+
+def _run_worker(exit_when_idle: Optional[float], poll_s: float) -> None:
+    global _worker_record
+    try:
+        os.nice(INGEST_NICE)
+    except (AttributeError, OSError):
+        pass
+    started = time.time()
+    idle_since = time.monotonic()
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    print(f"Ingest worker {os.getpid()} watching {JOBS_DIR} (nice {INGEST_NICE})", flush=True)
+    try:
+        while not stop:
+            _heartbeat(started, None)
+            job = _next_queued()
+            if job is None:
+                if exit_when_idle is not None and time.monotonic() - idle_since > exit_when_idle:
+                    break
+                time.sleep(poll_s)
+                continue
+            print(f"Running job {job['id']}", flush=True)
+            _heartbeat(started, job["id"])
+            result = run_job(job)
+            print(f"Job {job['id']} {result['status']}{': ' + result['error'] if result['error'] else ''}", flush=True)
+            idle_since = time.monotonic()
+    finally:
+        _worker_record = None
+        try:
+            os.remove(os.path.join(JOBS_DIR, WORKER_FILE))
+        except FileNotFoundError:
+            pass
+
+
+def _summary(job: dict) -> str:
+    stages = "  ".join(f"{s} {job['stages'][s]['done']}/{job['stages'][s]['total'] if job['stages'][s]['total'] is not None else '?'}" for s in STAGES)
+    eta = f"  eta {job['eta_s']}s" if job.get("eta_s") and job["status"] == "running" else ""
+    return f"{job['id']}  {job['status']:<9}  {stages}{eta}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("worker", help="Run queued jobs")
+    work.add_argument("--exit-when-idle", type=float, help="Exit after this many idle seconds")
+    submit = sub.add_parser("submit", help="Queue an ingestion job")
+    submit.add_argument("sources", nargs="*", help="Files to ingest (default: all of ingest.py's)")
+    submit.add_argument("--target", choices=TARGETS, default="atlas")
+    submit.add_argument("--out", help="Snapshot directory for --target snapshot")
+    submit.add_argument("--replace", action="store_true")
+    submit.add_argument("--embeddings", choices=["gemini", "fake"], default="gemini")
+    sub.add_parser("list", help="Show recent jobs")
+    status = sub.add_parser("status", help="Show one job as JSON")
+    status.add_argument("job_id")
+    args = parser.parse_args(argv)
+
+    if args.command == "worker":
+        worker(args.exit_when_idle)
+    elif args.command == "submit":
+        try:
+            job = submit_job({"sources": args.sources, "target": args.target, "out": args.out,
+                              "replace": args.replace, "embeddings": args.embeddings})
+        except JobError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+        print(f"Queued {job['id']}" + ("" if worker_status() else " (no worker running: python -m agent.ingest_jobs worker)"))
+    elif args.command == "list":
+        for job in list_jobs():
+            print(_summary(job))
+    else:
+        job = get_job(args.job_id)
+        print(json.dumps(job, indent=2) if job else f"No job {args.job_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+try:
+    from agent.metrics import REGISTRY, LLM_LATENCY, log, record_usage
+    from agent.cassette import fingerprint, record_call, serialize_messages
+    from agent.profiling import profiled
+    from agent.cache import llm_cache
+except ImportError:
+    from metrics import REGISTRY, LLM_LATENCY, log, record_usage
+    from cassette import fingerprint, record_call, serialize_messages
+    from profiling import profiled
+    from cache import llm_cache
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+
+# Substrings (lowercased) of errors worth retrying: rate limits, 5xx, transport hiccups
+RETRYABLE_MARKERS = (
+    "429", "500", "502", "503", "504",
+    "resource exhausted", "resource_exhausted", "rate limit", "quota",
+    "unavailable", "internal error", "deadline", "timed out", "timeout",
+    "connection reset", "connection aborted", "temporarily",
+)
+
+
+class LLMGatewayError(Exception):
+    """Base class for errors raised by the gateway itself."""
+
+
+class LLMTimeoutError(LLMGatewayError, TimeoutError):
+    """The call (including retries) did not finish before its deadline."""
+
+
+class CircuitOpenError(LLMGatewayError):
+    """The model's circuit is open; callers should serve a degraded response."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    Opens after `failure_threshold` consecutive transient failures and lets a
+    single probe through once `reset_timeout` seconds have passed.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release(self) -> None:
+        """
+        Ends a call that says nothing about service health (bad request, schema
+        error): failures so far still count, and a half-open breaker stays half-open
+        until a probe actually succeeds or fails.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class ModelStats:
+    """Per-model latency and error counters."""
+
+    def __init__(self, window: int = 500):
+        self.calls = 0
+        self.successes = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.circuit_rejections = 0
+        self.cache_hits = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[idx]
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "circuit_rejections": self.circuit_rejections,
+            "cache_hits": self.cache_hits,
+            "latency_p50_s": self.percentile(0.50),
+            "latency_p95_s": self.percentile(0.95),
+            "latency_p99_s": self.percentile(0.99),
+        }
+
+
+class LLMGateway:
+    """
+    Shared entry point for every Gemini call made by the graph.
+
+    - Builds the chat client and structured-output runnables once.
+    - Enforces a per-call deadline covering all attempts.
+    - Retries transient errors with jittered exponential backoff.
+    - Optionally hedges: fires a duplicate request once the primary has
+      run longer than the observed p95 and takes whichever returns first.
+    - Trips a circuit breaker on repeated transient failures so callers
+      can fail fast into a degraded response.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        hedge: Optional[bool] = None,
+        llm: Any = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout if timeout is not None else float(os.getenv("LLM_TIMEOUT_S", "20"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "2"))
+        self.hedge = hedge if hedge is not None else os.getenv("LLM_HEDGE", "0") == "1"
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "1.0"))
+        self.backoff_base = float(os.getenv("LLM_BACKOFF_BASE_S", "0.25"))
+        self.backoff_max = float(os.getenv("LLM_BACKOFF_MAX_S", "2.0"))
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_S", "30")),
+        )
+        self.stats = ModelStats()
+        self._llm = llm
+        self._structured: Dict[Type[BaseModel], Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("LLM_MAX_WORKERS", "32")),
+            thread_name_prefix=f"llm-{model}",
+        )
+
+    # --- Runnables ---
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    from langchain_google_genai import ChatGoogleGenerativeAI
+                    # Retries and deadlines are owned by the gateway, not the SDK
+                    self._llm = ChatGoogleGenerativeAI(
+                        model=self.model,
+                        temperature=self.temperature,
+                        timeout=self.timeout,
+                        max_retries=0,
+                    )
+        return self._llm
+
+    def set_llm(self, llm: Any) -> None:
+        """Swap the underlying chat model (fakes, replay) and drop built runnables."""
+        with self._lock:
+            self._llm = llm
+            self._structured = {}
+
+    def structured(self, schema: Type[BaseModel]):
+        runnable = self._structured.get(schema)
+        if runnable is None:
+            llm = self.llm
+            with self._lock:
+                runnable = self._structured.get(schema)
+                if runnable is None:
+                    # include_raw keeps the AIMessage so token usage can be recorded
+                    runnable = llm.with_structured_output(schema, include_raw=True)
+                    self._structured[schema] = runnable
+        return runnable
+
+    # --- Calls ---
+
+    def invoke_structured(self, schema: Type[BaseModel], messages: Sequence[BaseMessage], timeout: Optional[float] = None):
+        started = time.perf_counter()
+        request = {"model": self.model, "messages_fp": fingerprint(serialize_messages(messages))}
+        # With LLM_CACHE_TTL_S set, an identical prompt gets the answer it got last time
+        # (and what the cache warm-up stored); hits never reach the model or the breaker
+        cache_key = (self.model, schema.__name__, request["messages_fp"])
+        cached = llm_cache.get(cache_key) if llm_cache.enabled else None
+        if cached is not None:
+            self.stats.incr("cache_hits")
+            record_call("llm", schema.__name__, request, {"parsed": cached, "usage": None, "cached": True},
+                        (time.perf_counter() - started) * 1000)
+            return schema.model_validate(cached)
+
+        result = self._call(self.structured(schema), list(messages), timeout, label=schema.__name__)
+        raw = None
+        if isinstance(result, dict) and "parsed" in result:
+            raw = result.get("raw")
+            record_usage(self.model, raw)
+            if result.get("parsing_error") is not None:
+                raise result["parsing_error"]
+            if result.get("parsed") is None:
+                raise ValueError(f"{self.model} returned no parsable {schema.__name__}")
+            result = result["parsed"]
+        parsed = result.model_dump(mode="json")
+        if llm_cache.enabled:
+            llm_cache.set(cache_key, parsed)
+        record_call(
+            "llm", schema.__name__, request,
+            {"parsed": parsed, "usage": getattr(raw, "usage_metadata", None)},
+            (time.perf_counter() - started) * 1000,
+        )
+        return result
+
+    def invoke(self, messages: Sequence[BaseMessage], timeout: Optional[float] = None):
+        started = time.perf_counter()
+        result = self._call(self.llm, list(messages), timeout, label="text")
+        record_usage(self.model, result)
+        record_call(
+            "llm", "text",
+            {"model": self.model, "messages_fp": fingerprint(serialize_messages(messages))},
+            {"content": result.content},
+            (time.perf_counter() - started) * 1000,
+        )
+        return result
+
+    def _call(self, runnable, messages: List[BaseMessage], timeout: Optional[float], label: str = "text"):
+        budget = self.timeout if timeout is None else min(timeout, self.timeout)
+        call_started = time.monotonic()
+        deadline = call_started + budget
+        self.stats.incr("calls")
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.stats.incr("circuit_rejections")
+                raise CircuitOpenError(f"Circuit open for {self.model}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats.incr("timeouts")
+                raise LLMTimeoutError(f"{self.model} call exceeded {budget:.1f}s deadline")
+
+            started = time.monotonic()
+            try:
+                result = self._call_hedged(runnable, messages, remaining)
+            except Exception as e:
+                transient = is_retryable(e)
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    # Bad request / schema errors say nothing about service health
+                    self.breaker.release()
+                if isinstance(e, LLMTimeoutError):
+                    self.stats.incr("timeouts")
+                    self.stats.incr("errors")
+                    raise
+                backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                if not transient or attempt == self.max_retries or time.monotonic() + backoff >= deadline:
+                    self.stats.incr("errors")
+                    raise
+                self.stats.incr("retries")
+                log(f"LLM Retry ({self.model}) attempt {attempt + 1}: {e}")
+                time.sleep(backoff)
+                continue
+
+            self.breaker.record_success()
+            self.stats.observe(time.monotonic() - started)
+            self.stats.incr("successes")
+            LLM_LATENCY.observe(time.monotonic() - call_started, model=self.model, schema=label)
+            return result
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.stats.latencies) < self.hedge_min_samples:
+            return None
+        p95 = self.stats.percentile(0.95)
+        return max(self.hedge_min_delay, p95) if p95 is not None else None
+
+    def _call_hedged(self, runnable, messages: List[BaseMessage], remaining: float):
+        call_deadline = time.monotonic() + remaining
+        # Copy the context so trace IDs (and recorders, profiles) follow the call into the worker thread
+        primary = self._executor.submit(contextvars.copy_context().run, profiled(runnable.invoke), messages)
+        pending = {primary}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < remaining:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self.stats.incr("hedges")
+                pending.add(self._executor.submit(contextvars.copy_context().run, profiled(runnable.invoke), messages))
+
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, call_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                # Abandoned futures finish in the background; their results are dropped
+                raise LLMTimeoutError(f"{self.model} call exceeded {remaining:.1f}s deadline")
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self.stats.incr("hedge_wins")
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def snapshot(self) -> dict:
+        return {
+            "model": self.model,
+            "circuit": self.breaker.state,
+            "timeout_s": self.timeout,
+            "hedging": self.hedge,
+            **self.stats.snapshot(),
+        }
+
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(model: str = DEFAULT_MODEL) -> LLMGateway:
+    """Process-wide gateway per model."""
+    with _gateways_lock:
+        gateway = _gateways.get(model)
+        if gateway is None:
+            gateway = LLMGateway(model=model)
+            _gateways[model] = gateway
+        return gateway
+
+
+def gateway_stats() -> List[dict]:
+    with _gateways_lock:
+        return [g.snapshot() for g in _gateways.values()]
+
+
+_COUNTER_FIELDS = ("calls", "successes", "errors", "timeouts", "retries", "hedges", "hedge_wins", "circuit_rejections")
+
+def _collect_gateway_metrics():
+    snapshots = gateway_stats()
+    yield "# HELP juris_llm_events_total LLM gateway events by model and kind."
+    yield "# TYPE juris_llm_events_total counter"
+    for snap in snapshots:
+        for field in _COUNTER_FIELDS:
+            yield f'juris_llm_events_total{{model="{snap["model"]}",event="{field}"}} {snap[field]}'
+    yield "# HELP juris_llm_circuit_open 1 if the model's circuit breaker is not closed."
+    yield "# TYPE juris_llm_circuit_open gauge"
+    for snap in snapshots:
+        yield f'juris_llm_circuit_open{{model="{snap["model"]}"}} {0 if snap["circuit"] == CircuitBreaker.CLOSED else 1}'
+
+REGISTRY.register_collector(_collect_gateway_metrics)
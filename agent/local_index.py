@@ -0,0 +1,163 @@
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Same names as the Atlas index "quantization" setting (agent/index_registry.py)
+QUANTIZATIONS = ("none", "scalar", "binary")
+# Bits set per byte value, for Hamming distance over packed sign bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def matches_filter(metadata: Dict[str, Any], pre_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluates the subset of Atlas/MQL pre_filter syntax the app uses:
+    equality, $in, $nin, $ne, $and and $or.
+    """
+    if not pre_filter:
+        return True
+    for key, cond in pre_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            for op, arg in cond.items():
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$nin" and value in arg:
+                    return False
+                if op == "$ne" and value == arg:
+                    return False
+                if op == "$eq" and value != arg:
+                    return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+class LocalVectorStore:
+    """
+    In-process, exact (brute-force cosine) vector index with the same
+    similarity_search() surface the graph uses on MongoDBAtlasVectorSearch.
+    Used for offline benchmarks, replay and local development.
+
+    With quantization="scalar" (int8 codes) or "binary" (packed sign bits,
+    Hamming distance) the first pass scores the compact codes, then the top
+    k * rescore_factor candidates are rescored against the full vectors, which
+    are kept as float16.
+    """
+
+    def __init__(self, embedding: Embeddings, dimensions: Optional[int] = None,
+                 quantization: str = "none", rescore_factor: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization {quantization!r} (expected one of {', '.join(QUANTIZATIONS)})")
+        self.embeddings = embedding
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.documents: List[Document] = []
+        self._full_dtype = np.float32 if quantization == "none" else np.float16
+        self._vectors = np.zeros((0, dimensions or 0), dtype=self._full_dtype)
+        self._codes = self._quantize(self._vectors)
+        # pre_filter -> matching row indices; partitions are reused across queries
+        self._partitions: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _quantize(self, vectors: np.ndarray) -> Optional[np.ndarray]:
+        """Codes for unit vectors: int8 scaled by 127, or one sign bit per dimension."""
+        if self.quantization == "scalar":
+            return np.round(np.asarray(vectors, dtype=np.float32) * 127).astype(np.int8)
+        if self.quantization == "binary":
+            return np.packbits(np.asarray(vectors) > 0, axis=-1)
+        return None
+
+    def _coarse_scores(self, codes: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+        if self.quantization == "scalar":
+            return codes.astype(np.float32) @ query_vec
+        # Fewer differing sign bits = closer
+        return -_POPCOUNT[np.bitwise_xor(codes, self._quantize(query_vec))].sum(axis=1, dtype=np.int32)
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Bytes held by the searched codes and by the full vectors kept for rescoring."""
+        full = int(self._vectors.nbytes)
+        return {"index": int(self._codes.nbytes) if self._codes is not None else full, "full_vectors": full}
+
+    def add_documents(self, documents: List[Document], vectors: Optional[Iterable[List[float]]] = None) -> None:
+        if not documents:
+            return
+        if vectors is None:
+            vectors = self.embeddings.embed_documents([d.page_content for d in documents])
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+        if self.dimensions is None:
+            self.dimensions = matrix.shape[1]
+            self._vectors = np.zeros((0, self.dimensions), dtype=self._full_dtype)
+            self._codes = self._quantize(self._vectors)
+        if matrix.shape[1] != self.dimensions:
+            raise ValueError(f"Vector dimension {matrix.shape[1]} does not match index dimension {self.dimensions}")
+        codes = self._quantize(matrix)
+        with self._lock:
+            self.documents.extend(documents)
+            self._vectors = np.vstack([self._vectors, matrix.astype(self._full_dtype)])
+            if codes is not None:
+                self._codes = np.vstack([self._codes, codes])
+            self._partitions = {}
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[dict]] = None) -> None:
+        metadatas = metadatas or [{} for _ in texts]
+        self.add_documents([Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)])
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, pre_filter: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        if not self.documents:
+            return []
+        query_vec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        if query_vec.shape[0] != self.dimensions:
+            raise ValueError(f"Query dimension {query_vec.shape[0]} does not match index dimension {self.dimensions}")
+        query_vec = query_vec / (np.linalg.norm(query_vec) or 1.0)
+
+        with self._lock:
+            docs = self.documents
+            vectors = self._vectors
+            codes = self._codes
+            partitions = self._partitions
+        if pre_filter:
+            key = json.dumps(pre_filter, sort_keys=True)
+            candidates = partitions.get(key)
+            if candidates is None:
+                candidates = np.array([i for i, d in enumerate(docs) if matches_filter(d.metadata, pre_filter)], dtype=np.int64)
+                partitions[key] = candidates
+            if candidates.size == 0:
+                return []
+        else:
+            candidates = np.arange(len(docs))
+
+        if codes is not None and candidates.size > k * self.rescore_factor:
+            coarse = self._coarse_scores(codes[candidates], query_vec)
+            shortlist = np.argpartition(-coarse, k * self.rescore_factor - 1)[:k * self.rescore_factor]
+            candidates = candidates[shortlist]
+
+        scores = vectors[candidates].astype(np.float32, copy=False) @ query_vec
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(docs[candidates[i]], float(scores[i])) for i in top]
+
+    def similarity_search(self, query: str, k: int = 4, pre_filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, pre_filter=pre_filter, **kwargs)]
@@ -0,0 +1,297 @@
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from agent.profiling import thread_scope
+except ImportError:
+    from profiling import thread_scope
+
+# Per-request trace ID, set by the server and copied into worker threads
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+
+LOG_TRACE_IDS = os.getenv("LOG_TRACE_IDS", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+
+def log(message: str) -> None:
+    """print() with an optional [trace=...] prefix (LOG_TRACE_IDS=1)."""
+    trace_id = trace_id_var.get()
+    if LOG_TRACE_IDS and trace_id:
+        print(f"[trace={trace_id}] {message}")
+    else:
+        print(message)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._listeners: List[Callable[[float, Dict[str, str]], None]] = []
+
+    def add_listener(self, listener: Callable[[float, Dict[str, str]], None]) -> None:
+        """Receive every raw observation (benchmarks want exact percentiles, not buckets)."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[float, Dict[str, str]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def observe(self, value: float, **labels) -> None:
+        for listener in self._listeners:
+            listener(value, labels)
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = entry
+            if idx < len(self.buckets):
+                entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Bucket-resolution quantile estimate (upper bound of the bucket holding q)."""
+        entry = self._values.get(self._key(labels))
+        if not entry or entry[2] == 0:
+            return None
+        target = q * entry[2]
+        running = 0
+        for bound, count in zip(self.buckets, entry[0]):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, c in zip(self.buckets, counts):
+                running += c
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', repr(bound)))} {running}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """Collectors yield ready-made exposition lines at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "juris_stage_latency_seconds",
+    "Latency of graph nodes and external calls.",
+    ["stage"],
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "juris_stage_errors_total",
+    "Errors by stage, intent, topic and jurisdiction.",
+    ["stage", "intent", "topic", "jurisdiction"],
+))
+REQUESTS = REGISTRY.register(Counter(
+    "juris_requests_total",
+    "Completed chat turns by intent, topic and jurisdiction.",
+    ["intent", "topic", "jurisdiction", "partial"],
+))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "juris_request_latency_seconds",
+    "End-to-end latency of HTTP requests.",
+    ["route"],
+))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "juris_llm_latency_seconds",
+    "Latency of successful LLM calls (including retries and hedges).",
+    ["model", "schema"],
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "juris_llm_tokens_total",
+    "LLM tokens by model and direction (in/out).",
+    ["model", "direction"],
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "juris_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss).",
+    ["cache", "result"],
+))
+RETRIEVAL_SCOPE = REGISTRY.register(Counter(
+    "juris_retrieval_scope_total",
+    "Vector searches by the partition that answered (topic, jurisdiction, none).",
+    ["scope"],
+))
+FUSED_TURNS = REGISTRY.register(Counter(
+    "juris_fused_turns_total",
+    "Follow-up turns sent down the fused router+answer path, by outcome (answered, degraded, or fallback:<reason>).",
+    ["outcome"],
+))
+
+ADMISSION_IN_FLIGHT = REGISTRY.register(Gauge(
+    "juris_admission_in_flight",
+    "Chat turns currently holding an admission slot.",
+))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "juris_admission_queue_depth",
+    "Chat turns waiting for an admission slot, by priority.",
+    ["priority"],
+))
+ADMISSION_SHED = REGISTRY.register(Counter(
+    "juris_admission_shed_total",
+    "Chat turns rejected with 429 by reason (client_limit, queue_full, queue_timeout, preempted) and priority.",
+    ["reason", "priority"],
+))
+ADMISSION_WAIT = REGISTRY.register(Histogram(
+    "juris_admission_wait_seconds",
+    "Time admitted chat turns spent queued, by priority.",
+    ["priority"],
+))
+
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "juris_startup_seconds",
+    "Duration of each import/warm-up phase of this process.",
+    ["phase"],
+))
+
+
+@contextmanager
+def timed(stage: str, state: Optional[dict] = None):
+    """
+    Observe latency for `stage`; count an error (with state labels) if the block
+    raises. The block also runs inside the turn's profile, when it is being profiled.
+    """
+    started = time.perf_counter()
+    try:
+        with thread_scope():
+            yield
+    except Exception:
+        record_error(stage, state)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=stage)
+
+
+def record_error(stage: str, state: Optional[dict] = None) -> None:
+    state = state or {}
+    STAGE_ERRORS.inc(
+        stage=stage,
+        intent=state.get("user_intent") or "",
+        topic=state.get("topic") or "",
+        jurisdiction=state.get("jurisdiction") or "",
+    )
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def instrument_node(name: str):
+    """Wraps a graph node so its latency and uncaught errors are recorded."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            with timed(f"node:{name}", state):
+                return fn(state, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_usage(model: str, message) -> None:
+    """Counts tokens from a LangChain AIMessage's usage_metadata, if present."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc(usage["input_tokens"], model=model, direction="in")
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(usage["output_tokens"], model=model, direction="out")
@@ -0,0 +1,388 @@
+"""
+On-demand profiling of live /chat turns.
+
+A turn is profiled when an admin sends `X-Profile: cprofile` (or `sample`)
+with the request, or when the admin toggle (/admin/profiling) samples a
+fraction of all turns. The graph runs its nodes, fan-out searches and LLM
+calls on worker threads, so the profile follows the request rather than a
+thread: every worker entry point (timed() blocks, the gateway's LLM calls)
+opens a thread_scope() that attaches the current thread to the turn's
+profile for its duration.
+
+- cprofile: deterministic; one cProfile.Profile per thread scope, merged into
+  one pstats file (open with pstats or snakeviz). Wall-clock timer, so time
+  spent waiting on sockets shows up under the blocking call.
+- sample: a sampler thread snapshots the attached threads' stacks every
+  PROFILE_SAMPLE_INTERVAL_MS; written as collapsed stacks (flamegraph.pl /
+  speedscope input). Lower overhead, shows where wall time went.
+
+Each profile is saved under PROFILE_DIR by trace ID: the raw file and a JSON
+summary with the hottest functions. aggregate() merges recent profiles into
+one hot-function table.
+"""
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Profiles kept on disk; older ones are pruned on save
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_TOP = 30
+MODES = ("cprofile", "sample")
+
+# Runtime toggle (admin API): profile this fraction of turns without the header
+settings = {
+    "sample_rate": float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    "mode": os.getenv("PROFILE_MODE", "sample"),
+}
+
+_active: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("profile", default=None)
+_SAFE_ID = re.compile(r"[^A-Za-z0-9_.-]")
+_SITE = re.compile(r".*[/\\](site|dist)-packages[/\\]")
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+
+
+def configure(sample_rate: Optional[float] = None, mode: Optional[str] = None) -> dict:
+    if sample_rate is not None:
+        settings["sample_rate"] = max(0.0, min(1.0, sample_rate))
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r} (expected one of {', '.join(MODES)})")
+        settings["mode"] = mode
+    return dict(settings)
+
+
+def choose_mode(requested: Optional[str] = None) -> Optional[str]:
+    """Profiling mode for this turn: the header's (`1`/`true` = the configured mode), else the toggle's sampling."""
+    if requested:
+        requested = requested.strip().lower()
+        if requested in MODES:
+            return requested
+        if requested in ("1", "true", "on", "yes"):
+            return settings["mode"]
+        return None
+    if settings["sample_rate"] and random.random() < settings["sample_rate"]:
+        return settings["mode"]
+    return None
+
+
+def safe_id(trace_id: str) -> str:
+    return _SAFE_ID.sub("_", trace_id)[:64]
+
+
+def _short_path(path: str) -> str:
+    path = _SITE.sub("", path)
+    if path.startswith(_STDLIB):
+        return path[len(_STDLIB):]
+    cwd = os.getcwd() + os.sep
+    return path[len(cwd):] if path.startswith(cwd) else path
+
+
+def _function_label(filename: str, line: int, name: str) -> str:
+    if filename == "~":  # built-ins
+        return name
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+# --- Per-turn profile ---
+
+class RequestProfile:
+    def __init__(self, trace_id: str, mode: str, meta: Optional[dict] = None):
+        self.trace_id = safe_id(trace_id)
+        self.mode = mode
+        self.meta = meta or {}
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.started = time.perf_counter()
+        self.elapsed_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: List[cProfile.Profile] = []
+        self._threads: Dict[int, int] = {}  # thread ident -> open scopes
+        self._seen_threads = set()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._token = None
+        if mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name=f"profile-{self.trace_id}", daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def thread_scope(self):
+        """Attaches the current thread to this profile; nested scopes are no-ops."""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth:
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        ident = threading.get_ident()
+        with self._lock:
+            self._seen_threads.add(ident)
+        profiler = None
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            with self._lock:
+                self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if profiler is not None:
+                profiler.disable()
+                with self._lock:
+                    self._profiles.append(profiler)
+            else:
+                with self._lock:
+                    self._threads[ident] -= 1
+                    if not self._threads[ident]:
+                        del self._threads[ident]
+
+    def _sample_loop(self) -> None:
+        interval = PROFILE_SAMPLE_INTERVAL_MS / 1000.0
+        while not self._stop.wait(interval):
+            with self._lock:
+                idents = list(self._threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and len(stack) < 128:
+                    code = frame.f_code
+                    stack.append(_function_label(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self.elapsed_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        merged = pstats.Stats(profiles[0])
+        for profiler in profiles[1:]:
+            merged.add(profiler)
+        return merged
+
+    def summary(self, filename: str) -> dict:
+        if self.mode == "cprofile":
+            stats = self.stats()
+            table = stats_table(stats) if stats else []
+            totals = {"total_calls": stats.total_calls if stats else 0, "total_tt_ms": round(stats.total_tt * 1000, 2) if stats else 0.0}
+        else:
+            table = samples_table(self.samples)
+            totals = {"samples": sum(self.samples.values()), "interval_ms": PROFILE_SAMPLE_INTERVAL_MS}
+        return {
+            "trace_id": self.trace_id,
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "elapsed_ms": self.elapsed_ms,
+            "threads": len(self._seen_threads),
+            **totals,
+            **self.meta,
+            "file": filename,
+            "top": table,
+        }
+
+    def save(self, directory: Optional[str] = None) -> dict:
+        """Writes the raw profile and its JSON summary; returns the summary."""
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        if self.mode == "cprofile":
+            filename = f"{self.trace_id}.prof"
+            stats = self.stats()
+            if stats is not None:
+                stats.dump_stats(os.path.join(directory, filename))
+        else:
+            filename = f"{self.trace_id}.folded"
+            with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        summary = self.summary(filename)
+        with open(os.path.join(directory, f"{self.trace_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        prune(directory)
+        return summary
+
+
+def start(trace_id: str, mode: Optional[str], **meta) -> Optional[RequestProfile]:
+    """Starts profiling the current turn (no-op without a mode); worker threads pick it up from the context."""
+    if mode is None:
+        return None
+    profile = RequestProfile(trace_id, mode, meta)
+    profile._token = _active.set(profile)
+    return profile
+
+
+def stop(profile: Optional[RequestProfile]) -> None:
+    if profile is None:
+        return
+    if profile._token is not None:
+        _active.reset(profile._token)
+        profile._token = None
+    profile.stop()
+
+
+@contextmanager
+def thread_scope():
+    """Attaches the current thread to the active turn's profile, if it is being profiled."""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    with profile.thread_scope():
+        yield
+
+
+def profiled(fn):
+    """`fn` wrapped in thread_scope(), for work submitted to executor threads (with the context copied)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with thread_scope():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# --- Tables ---
+
+def stats_table(stats: pstats.Stats, sort: str = "tottime", top: int = PROFILE_TOP) -> List[dict]:
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            "function": _function_label(filename, line, name),
+            "calls": nc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3),
+        })
+    key = "cumtime_ms" if sort == "cumtime" else "tottime_ms"
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:top]
+
+
+def samples_table(samples: Counter, sort: str = "self", top: int = PROFILE_TOP) -> List[dict]:
+    total = sum(samples.values())
+    own: Counter = Counter()
+    inclusive: Counter = Counter()
+    for stack, count in samples.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for function in set(frames):
+            inclusive[function] += count
+    rows = [{
+        "function": function,
+        "self_samples": own[function],
+        "total_samples": inclusive[function],
+        "self_pct": round(100 * own[function] / total, 1) if total else 0.0,
+        "total_pct": round(100 * inclusive[function] / total, 1) if total else 0.0,
+    } for function in inclusive]
+    key = "total_samples" if sort == "total" else "self_samples"
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:top]
+
+
+def read_folded(path: str) -> Counter:
+    samples: Counter = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                samples[stack] += int(count)
+    return samples
+
+
+# --- Stored profiles ---
+
+def list_profiles(limit: int = 50, directory: Optional[str] = None) -> List[dict]:
+    """Most recent first; summaries without their hot-function tables."""
+    directory = directory or PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    paths = sorted((os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".json")),
+                   key=os.path.getmtime, reverse=True)
+    profiles = []
+    for path in paths[:limit]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary.pop("top", None)
+        profiles.append(summary)
+    return profiles
+
+
+def get_profile(trace_id: str, directory: Optional[str] = None) -> Optional[dict]:
+    path = os.path.join(directory or PROFILE_DIR, f"{safe_id(trace_id)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def profile_file(trace_id: str, directory: Optional[str] = None) -> Optional[str]:
+    """Path of the raw .prof / .folded file for `trace_id`, if it exists."""
+    summary = get_profile(trace_id, directory)
+    if summary is None:
+        return None
+    path = os.path.join(directory or PROFILE_DIR, summary["file"])
+    return path if os.path.exists(path) else None
+
+
+def aggregate(limit: int = 50, mode: str = "sample", sort: Optional[str] = None, top: int = PROFILE_TOP,
+              directory: Optional[str] = None) -> dict:
+    """Hot-function table across the `limit` most recent profiles of one mode."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r} (expected one of {', '.join(MODES)})")
+    directory = directory or PROFILE_DIR
+    profiles = [p for p in list_profiles(limit=10 * limit, directory=directory) if p["mode"] == mode][:limit]
+    paths = [os.path.join(directory, p["file"]) for p in profiles]
+    paths = [p for p in paths if os.path.exists(p)]
+    result = {"mode": mode, "profiles": len(paths), "trace_ids": [p["trace_id"] for p in profiles]}
+    if mode == "cprofile":
+        if not paths:
+            return {**result, "top": []}
+        stats = pstats.Stats(*paths)
+        return {**result, "total_calls": stats.total_calls, "top": stats_table(stats, sort or "tottime", top)}
+    samples: Counter = Counter()
+    for path in paths:
+        samples.update(read_folded(path))
+    return {**result, "samples": sum(samples.values()), "top": samples_table(samples, sort or "self", top)}
+
+
+def prune(directory: Optional[str] = None, keep: int = PROFILE_KEEP) -> None:
+    directory = directory or PROFILE_DIR
+    summaries = sorted((n for n in os.listdir(directory) if n.endswith(".json")),
+                       key=lambda n: os.path.getmtime(os.path.join(directory, n)), reverse=True)
+    for name in summaries[keep:]:
+        stem = name[:-len(".json")]
+        for ext in (".json", ".prof", ".folded"):
+            try:
+                os.remove(os.path.join(directory, stem + ext))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,188 @@
+"""
+Offline replay of recorded /chat turns.
+
+Feeds each cassette (recorded with RECORD_TRAFFIC=1, see agent/cassette.py)
+back through the compiled graph with the LLM, vector search, section lookups and web search
+answered from the recording. Reports whether the response is unchanged,
+which calls diverged, and end-to-end and per-stage latency.
+
+    python -m agent.replay cassettes/*.json.gz
+    python -m agent.replay cassettes/*.json.gz --with-latency --compare bench_results/replay-....json
+    python -m agent.replay cassettes/20260101-120000-abc.json.gz --strict
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-replay")
+
+from langchain_core.messages import HumanMessage
+
+try:
+    from agent import agent_graph, tools
+    from agent.bench_utils import compare_latency, git_revision, save_results, summarize
+    from agent.cache import llm_cache
+    from agent.cassette import Cassette, CassettePlayer, ReplayChatModel, ReplayMismatch, ReplaySearch, ReplaySectionIndex, ReplayVectorStore, deserialize_state
+    from agent.deadline import new_deadline
+    from agent.envelope import turn_payload
+    from agent.metrics import STAGE_LATENCY
+except ImportError:
+    import agent_graph, tools
+    from bench_utils import compare_latency, git_revision, save_results, summarize
+    from cache import llm_cache
+    from cassette import Cassette, CassettePlayer, ReplayChatModel, ReplayMismatch, ReplaySearch, ReplaySectionIndex, ReplayVectorStore, deserialize_state
+    from deadline import new_deadline
+    from envelope import turn_payload
+    from metrics import STAGE_LATENCY
+
+
+# Envelope fields that must match for a turn to count as unchanged
+COMPARED_FIELDS = ("explanation", "citations", "options")
+
+
+def answer_fields(payload: dict) -> dict:
+    if "response" in payload:
+        # Cassettes recorded before the envelope carried the answer as a JSON string
+        try:
+            payload = json.loads(payload["response"])
+        except (TypeError, ValueError):
+            payload = {"explanation": payload["response"]}
+    return {key: payload.get(key) or ([] if key != "explanation" else "") for key in COMPARED_FIELDS}
+
+
+def replay_cassette(data: dict, with_latency: bool = False, strict: bool = False) -> dict:
+    player = CassettePlayer(data["calls"], with_latency=with_latency, strict=strict)
+    agent_graph.llm.set_llm(ReplayChatModel(player))
+    agent_graph.set_vector_store(ReplayVectorStore(player))
+    agent_graph.set_section_index(ReplaySectionIndex(player))
+    tools.set_search_provider(ReplaySearch(player))
+    # Each cassette's LLM calls come from its own recording, not an earlier cassette's cached answer
+    llm_cache.clear()
+
+    # Fresh thread seeded with the recorded pre-turn state
+    config = {"configurable": {"thread_id": f"replay-{uuid.uuid4()}"}}
+    if data.get("state_before"):
+        agent_graph.app.update_state(config, deserialize_state(data["state_before"]), as_node="generator")
+
+    request = data["request"]
+    inputs = {
+        "messages": [HumanMessage(content=request["message"])],
+        "deadline": new_deadline(),
+        "partial": False,
+    }
+    started = time.perf_counter()
+    error = None
+    final_state = {}
+    try:
+        final_state = agent_graph.app.invoke(inputs, config=config)
+    except ReplayMismatch as e:
+        error = str(e)
+    elapsed = time.perf_counter() - started
+
+    recorded = answer_fields(data.get("result") or {})
+    replayed = answer_fields(turn_payload(final_state)) if final_state.get("messages") else None
+    return {
+        "trace_id": data.get("trace_id"),
+        "message": request["message"][:80],
+        "match": error is None and replayed == recorded,
+        "error": error,
+        "key_mismatches": player.mismatches,
+        "prompt_changes": player.prompt_changes,
+        "unused_calls": player.remaining(),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "recorded_elapsed_ms": data.get("elapsed_ms"),
+    }
+
+
+def expand_paths(patterns: List[str]) -> List[str]:
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.json.gz")
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassettes", nargs="+", help="Cassette files, globs or directories")
+    parser.add_argument("--with-latency", action="store_true", help="Sleep for each call's recorded latency")
+    parser.add_argument("--strict", action="store_true", help="Fail a turn on the first call that diverges from the recording")
+    parser.add_argument("--out", help="Results JSON path (default bench_results/replay-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    stage_samples = defaultdict(list)
+    def on_stage(value, labels):
+        stage_samples[labels.get("stage", "")].append(value)
+    STAGE_LATENCY.add_listener(on_stage)
+
+    turns = []
+    for path in expand_paths(args.cassettes):
+        turn = replay_cassette(Cassette.load(path), args.with_latency, args.strict)
+        turn["cassette"] = path
+        turns.append(turn)
+
+    STAGE_LATENCY.remove_listener(on_stage)
+
+    if not turns:
+        print("No cassettes found.")
+        sys.exit(1)
+
+    matched = sum(t["match"] for t in turns)
+    results = {
+        "benchmark": "replay",
+        "git": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"with_latency": args.with_latency, "strict": args.strict},
+        "turns": len(turns),
+        "matched": matched,
+        "latency_ms": summarize([t["elapsed_ms"] / 1000 for t in turns]),
+        "recorded_latency_ms": summarize([t["recorded_elapsed_ms"] / 1000 for t in turns if t["recorded_elapsed_ms"]]),
+        "stages_ms": {name: summarize(samples) for name, samples in sorted(stage_samples.items())},
+        "cassettes": turns,
+    }
+
+    print(f"\n=== Replay ({len(turns)} turns) ===")
+    print(f"Responses unchanged: {matched}/{len(turns)}")
+    for turn in turns:
+        if turn["match"] and not turn["prompt_changes"] and not turn["unused_calls"]:
+            continue
+        print(f"  {'DIFF' if not turn['match'] else 'WARN'} {turn['cassette']}: {turn['message']!r}")
+        if turn["error"]:
+            print(f"       error: {turn['error']}")
+        for mismatch in turn["key_mismatches"]:
+            print(f"       {mismatch['kind']} key changed: {mismatch['recorded']!r} -> {mismatch['replayed']!r}")
+        if turn["prompt_changes"]:
+            print(f"       prompt changed for: {', '.join(turn['prompt_changes'])}")
+        if turn["unused_calls"]:
+            print(f"       recorded calls not made: {turn['unused_calls']}")
+    lat, rec = results["latency_ms"], results["recorded_latency_ms"]
+    print(f"Replay end-to-end: p50 {lat['p50']}ms  p95 {lat['p95']}ms   (recorded p50 {rec['p50']}ms  p95 {rec['p95']}ms)")
+    for name, s in results["stages_ms"].items():
+        print(f"  {name:<28} n={s['count']:<5} p50 {s['p50']}ms  p95 {s['p95']}ms  p99 {s['p99']}ms")
+
+    out = save_results(results, args.out, "replay")
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared to {args.compare} ({baseline.get('git')}):")
+        print(f"  unchanged: {baseline.get('matched')}/{baseline.get('turns')} -> {matched}/{len(turns)}")
+        for line in compare_latency({"end_to_end": results["latency_ms"], **results["stages_ms"]},
+                                    {"end_to_end": baseline.get("latency_ms", {}), **baseline.get("stages_ms", {})}):
+            print(line)
+
+    if matched < len(turns):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
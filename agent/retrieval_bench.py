@@ -0,0 +1,282 @@
+"""
+Retrieval quality and latency benchmark.
+
+Runs the golden set (agent/data/retrieval_golden.json) against a retriever
+backend. Reports recall@k, MRR and per-query search latency, and refuses to
+run when the query embedder and the index disagree on vector dimension.
+
+    python -m agent.retrieval_bench --backend atlas --k 3
+    python -m agent.retrieval_bench --backend local --embeddings fake --k 5
+    python -m agent.retrieval_bench --backend snapshot --snapshot corpus.snapshot
+    python -m agent.retrieval_bench --backend atlas --compare bench_results/retrieval-....json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+try:
+    from agent.bench_utils import compare_latency, git_revision, save_results, summarize
+except ImportError:
+    from bench_utils import compare_latency, git_revision, save_results, summarize
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "retrieval_golden.json")
+
+# retriever(query, jurisdiction, k, topic) -> ranked documents
+Retriever = Callable[[str, Optional[str], int, Optional[str]], List[Document]]
+
+
+class EmbeddingDimensionMismatch(RuntimeError):
+    """The query embedder produces vectors the index cannot be searched with."""
+
+
+def load_golden(path: str = GOLDEN_PATH) -> List[dict]:
+    with open(path) as f:
+        return json.load(f)["cases"]
+
+
+def section_pattern(section: str) -> "re.Pattern":
+    # Matches a section heading like "48 (1)", "47.1 (1)", "14(1)" or "16   The following..."
+    # but not cross-references such as "s. 48 (1)" or "section 480".
+    return re.compile(
+        rf"(?<![\d.(])(?<!s\.\s)(?<!s\.\xa0){re.escape(section)}(?=[\s\xa0]*\(\d+\)|[\s\xa0]+[A-Z“\"])"
+    )
+
+
+def is_relevant(doc: Document, expected: dict) -> bool:
+    if doc.metadata.get("source") not in expected["sources"]:
+        return False
+    section = expected.get("section")
+    if not section:
+        return True
+    tagged = doc.metadata.get("section")
+    if tagged is not None:
+        return str(tagged) == section
+    return bool(section_pattern(section).search(doc.page_content))
+
+
+def score_case(docs: List[Document], expected: List[dict]) -> dict:
+    """recall = share of expected items found in the results; rr = 1/rank of the first relevant hit."""
+    found = [any(is_relevant(d, e) for d in docs) for e in expected]
+    first_rank = next((rank for rank, d in enumerate(docs, start=1) if any(is_relevant(d, e) for e in expected)), None)
+    return {
+        "recall": sum(found) / len(expected) if expected else 1.0,
+        "rr": 1.0 / first_rank if first_rank else 0.0,
+        "first_relevant_rank": first_rank,
+    }
+
+
+def run_benchmark(retriever: Retriever, cases: List[dict], k: int, repeats: int = 1) -> dict:
+    per_case, latencies = [], []
+    for case in cases:
+        docs = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            docs = retriever(case["query"], case.get("jurisdiction"), k, case.get("topic"))
+            latencies.append(time.perf_counter() - started)
+        scored = score_case(docs, case["expected"])
+        per_case.append({
+            "id": case["id"],
+            "jurisdiction": case.get("jurisdiction"),
+            **scored,
+            "retrieved": [{"source": d.metadata.get("source"), "jurisdiction": d.metadata.get("jurisdiction"), "preview": d.page_content[:80]} for d in docs],
+        })
+
+    by_group: Dict[str, List[dict]] = {}
+    for case, result in zip(cases, per_case):
+        group = "FEDERAL" if case["id"].startswith("fed-") else case.get("jurisdiction") or "ANY"
+        by_group.setdefault(group, []).append(result)
+
+    def aggregate(results):
+        return {
+            "cases": len(results),
+            f"recall@{k}": round(sum(r["recall"] for r in results) / len(results), 4),
+            "mrr": round(sum(r["rr"] for r in results) / len(results), 4),
+        }
+
+    return {
+        "k": k,
+        "overall": aggregate(per_case),
+        "by_group": {g: aggregate(rs) for g, rs in sorted(by_group.items())},
+        "latency_ms": summarize(latencies),
+        "cases": per_case,
+    }
+
+
+# --- Backends ---
+
+def partitioned_search(store, categories: Optional[set], use_topic: bool = True) -> Retriever:
+    """Same per-jurisdiction fan-out and topic-then-widen order as research_node."""
+    try:
+        from agent import agent_graph
+    except ImportError:
+        import agent_graph
+
+    def retrieve(query, jurisdiction, k, topic=None):
+        docs, _, _ = agent_graph.search_jurisdictions(store, query, jurisdiction, topic if use_topic else None, categories, k=k)
+        return docs[:k]
+    return retrieve
+
+
+def check_dimensions(query_dims: int, index_dims: Optional[int], where: str) -> None:
+    if index_dims is None:
+        raise EmbeddingDimensionMismatch(f"Could not determine vector dimension of {where}; is it empty?")
+    if query_dims != index_dims:
+        raise EmbeddingDimensionMismatch(
+            f"Query embedder produces {query_dims}-dim vectors but {where} holds {index_dims}-dim vectors. "
+            "Re-ingest with the same embedding model or point the benchmark at the matching index."
+        )
+
+
+def atlas_index_dimensions(collection, index_name: str) -> Optional[int]:
+    """numDimensions from the search index definition, falling back to a stored vector."""
+    try:
+        for index in collection.list_search_indexes(index_name):
+            for field in index.get("latestDefinition", {}).get("fields", []):
+                if field.get("type") == "vector":
+                    return int(field["numDimensions"])
+    except Exception as e:
+        print(f"Could not read search index definition: {e}")
+    sample = collection.find_one({"embedding": {"$exists": True}}, {"embedding": 1})
+    return len(sample["embedding"]) if sample else None
+
+
+def atlas_retriever(use_topic: bool = True) -> Retriever:
+    try:
+        from agent import agent_graph
+    except ImportError:
+        import agent_graph
+
+    collection = agent_graph.get_corpus_collection()
+    if collection is None:
+        raise RuntimeError("Database connection failed (is MONGODB_URI set?)")
+    index_name = agent_graph.resolve_index(collection.database).index_name
+    counts = {j: collection.count_documents({"jurisdiction": j}) for j in ["ON", "BC", "AB", "FEDERAL"]}
+    print(f"Chunks per jurisdiction: {counts}")
+    for jurisdiction, count in counts.items():
+        if count == 0:
+            print(f"WARNING: no {jurisdiction} chunks in {collection.name}; those cases will score 0.")
+
+    query_dims = len(agent_graph.get_embeddings().embed_query("dimension probe"))
+    check_dimensions(query_dims, atlas_index_dimensions(collection, index_name),
+                     f"Atlas index {index_name} on {collection.name}")
+
+    store = agent_graph.get_vector_store()
+    return partitioned_search(store, agent_graph.get_corpus_categories(), use_topic)
+
+
+def local_retriever(embeddings_kind: str = "fake", files: Optional[List[str]] = None, use_topic: bool = True,
+                    quantization: str = "none") -> Retriever:
+    """Builds an in-memory index from docs/ (ingest.py's loader and splitter)."""
+    try:
+        from agent import agent_graph
+        from agent.ingest import TARGET_FILES, load_corpus
+        from agent.local_index import LocalVectorStore
+        from agent.fakes import FakeEmbeddings
+    except ImportError:
+        import agent_graph
+        from ingest import TARGET_FILES, load_corpus
+        from local_index import LocalVectorStore
+        from fakes import FakeEmbeddings
+
+    embeddings = FakeEmbeddings() if embeddings_kind == "fake" else agent_graph.get_embeddings()
+    store = LocalVectorStore(embeddings, quantization=quantization)
+    docs, _ = load_corpus(files or TARGET_FILES)
+    store.add_documents(docs)
+
+    query_dims = len(embeddings.embed_query("dimension probe"))
+    check_dimensions(query_dims, store.dimensions, "the local index")
+    return partitioned_search(store, {d.metadata.get("category") for d in store.documents}, use_topic)
+
+
+def snapshot_retriever(path: str, embeddings_kind: str = "gemini", use_topic: bool = True,
+                       quantization: str = "none") -> Retriever:
+    """Local index loaded from a corpus snapshot (agent/snapshot.py); no document embedding calls."""
+    try:
+        from agent import agent_graph
+        from agent.snapshot import load_snapshot
+        from agent.local_index import LocalVectorStore
+        from agent.fakes import FakeEmbeddings
+    except ImportError:
+        import agent_graph
+        from snapshot import load_snapshot
+        from local_index import LocalVectorStore
+        from fakes import FakeEmbeddings
+
+    snapshot = load_snapshot(path)
+    embeddings = FakeEmbeddings() if embeddings_kind == "fake" else agent_graph.get_embeddings()
+    query_dims = len(embeddings.embed_query("dimension probe"))
+    check_dimensions(query_dims, snapshot.dimensions, f"snapshot {path} ({snapshot.embedding_model})")
+    store = LocalVectorStore(embeddings, dimensions=snapshot.dimensions, quantization=quantization)
+    store.add_documents(snapshot.documents(), vectors=snapshot.vectors)
+    return partitioned_search(store, {d.metadata.get("category") for d in store.documents}, use_topic)
+
+
+BACKENDS = {
+    "atlas": lambda args: atlas_retriever(not args.no_topic),
+    "local": lambda args: local_retriever(args.embeddings, use_topic=not args.no_topic, quantization=args.quantization),
+    "snapshot": lambda args: snapshot_retriever(args.snapshot, args.embeddings, not args.no_topic, args.quantization),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="atlas")
+    parser.add_argument("--embeddings", choices=["fake", "gemini"], default="gemini", help="Embedder for --backend local/snapshot")
+    parser.add_argument("--snapshot", help="Corpus snapshot directory for --backend snapshot")
+    parser.add_argument("--quantization", choices=["none", "scalar", "binary"], default="none",
+                        help="Quantized first pass with float16 rescoring, for --backend local/snapshot")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--no-topic", action="store_true", help="Filter on jurisdiction only (skip the topic partition)")
+    parser.add_argument("--repeats", type=int, default=1, help="Searches per case (latency sampling)")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--out", help="Results JSON path (default bench_results/retrieval-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Print retrieved sources for misses")
+    args = parser.parse_args(argv)
+
+    cases = load_golden(args.golden)
+    try:
+        retriever = BACKENDS[args.backend](args)
+    except EmbeddingDimensionMismatch as e:
+        print(f"❌ EMBEDDING DIMENSION MISMATCH: {e}")
+        sys.exit(2)
+
+    results = run_benchmark(retriever, cases, args.k, args.repeats)
+    results.update({"benchmark": "retrieval", "backend": args.backend, "quantization": args.quantization, "git": git_revision(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    overall = results["overall"]
+    print(f"\n=== Retrieval benchmark ({args.backend}, k={args.k}, {overall['cases']} cases) ===")
+    print(f"recall@{args.k}: {overall[f'recall@{args.k}']}   MRR: {overall['mrr']}")
+    for group, agg in results["by_group"].items():
+        print(f"  {group:<8} recall@{args.k} {agg[f'recall@{args.k}']:<6}  MRR {agg['mrr']:<6}  ({agg['cases']} cases)")
+    lat = results["latency_ms"]
+    print(f"Search latency: p50 {lat['p50']}ms  p95 {lat['p95']}ms  p99 {lat['p99']}ms")
+    for case in results["cases"]:
+        if case["first_relevant_rank"] is None:
+            print(f"  MISS {case['id']}")
+            if args.verbose:
+                for hit in case["retrieved"]:
+                    print(f"       got {hit['source']} ({hit['jurisdiction']}): {hit['preview']!r}")
+
+    out = save_results(results, args.out, "retrieval")
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        key = f"recall@{args.k}"
+        print(f"\nCompared to {args.compare} ({baseline.get('git')}):")
+        print(f"  {key}: {baseline['overall'].get(key)} -> {overall[key]}   MRR: {baseline['overall'].get('mrr')} -> {overall['mrr']}")
+        for line in compare_latency({"search": lat}, {"search": baseline.get("latency_ms", {})}):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Response models shared by the graph and the HTTP envelope. Kept free of
+LangChain/Mongo imports so the server can declare its response types
+without loading the graph.
+"""
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class Option(BaseModel):
+    label: str = Field(description="Button label text")
+    action: str = Field(description="Action ID or value")
+    description: Optional[str] = Field(description="Tooltip or extra detail")
+
+
+class Citation(BaseModel):
+    # Built server-side from the citation index (agent/citations.py), never generated
+    id: Optional[str] = Field(description="Stable chunk ID of the cited provision.", default=None)
+    source_title: str = Field(description="The name of the Act or Document (include Jurisdiction).")
+    quote: str = Field(description="The exact verbatim text quoted from the source.")
+    url: Optional[str] = Field(description="Direct URL to the source document if available in context.", default=None)
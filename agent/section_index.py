@@ -0,0 +1,176 @@
+"""
+Direct section-reference lookup.
+
+Questions like "what does section 48 of the RTA say" or "s. 8(2) Divorce Act"
+name the provision outright, so research_node resolves them with a dict
+lookup on (act_code, section) instead of a semantic search. act_code is
+jurisdiction-qualified (ON-RTA, BC-RTA, ...), so the key covers
+(act, jurisdiction, section). Vector search remains the fallback when no
+reference is found or the index has no such section.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+try:
+    from agent.citations import ACTS, act_for, sections_starting
+except ImportError:
+    from citations import ACTS, act_for, sections_starting
+
+MAX_CHUNKS_PER_REF = 3
+MAX_REFS = 3
+
+# "section 48", "sec. 48", "s. 8(2)", "ss. 47.1", "§ 43"
+_SECTION_REF = re.compile(r"(?<![A-Za-z])(?:sections?|sec\.?|ss?\.|§)[ \xa0]*(\d{1,3}(?:\.\d{1,2})?)[ \xa0]*(\(\d+\))?", re.IGNORECASE)
+# Continuation of a list: "sections 42 and 43", "ss. 45, 46 or 47"
+_SECTION_LIST_ITEM = re.compile(r"[ \xa0]*(?:,|and|or|&)[ \xa0]*(\d{1,3}(?:\.\d{1,2})?)[ \xa0]*(\(\d+\))?", re.IGNORECASE)
+
+# Act mentions; "RTA" resolves to the user's provincial tenancy act
+_ACT_MENTIONS: List[Tuple["re.Pattern", str]] = [
+    (re.compile(r"\bRTA\b|residential tenanc(?:y|ies) act|tenancy act", re.IGNORECASE), "RTA"),
+    (re.compile(r"divorce act", re.IGNORECASE), "DIVORCE"),
+    (re.compile(r"criminal code", re.IGNORECASE), "CC"),
+    (re.compile(r"income tax act|\bITA\b", re.IGNORECASE), "ITA"),
+    (re.compile(r"excise tax act|\bETA\b", re.IGNORECASE), "ETA"),
+    (re.compile(r"immigration and refugee protection act|\bIRPA\b", re.IGNORECASE), "IRPA"),
+]
+# Acts and documents the index does not hold ("Employment Standards Act", "the
+# Charter", "my lease"): a reference nearest one of these is dropped rather than
+# guessed. "the Act" / "this Act" is a back-reference, not a new act.
+_OTHER_MENTIONS: List["re.Pattern"] = [
+    re.compile(r"(?<!\w)(?!(?:The|This|That)\b)[A-Z][\w'\u2019-]*(?:\s+(?:of|and|the|on|for|[A-Z][\w'\u2019-]*))*\s+(?:Act|Code)\b"),
+    re.compile(r"\bcharter\b|\b(?:lease|rental agreement|tenancy agreement|contract)\b", re.IGNORECASE),
+]
+
+# Between a reference and the act it names: "s. 48 RTA", "section 8 of the Charter"
+_ACT_FOLLOWS = re.compile(r"[ \xa0,]*(?:(?:of|under|in)[ \xa0]+)?(?:(?:the|this|my)[ \xa0]+)?", re.IGNORECASE)
+
+_ACT_CODES = {act.code for act in ACTS.values()}
+
+
+@dataclass(frozen=True)
+class SectionRef:
+    act_code: str
+    section: str
+    subsection: Optional[str] = None  # e.g. "(2)"
+
+    def __str__(self) -> str:
+        return f"{self.act_code}:{self.section}{self.subsection or ''}"
+
+
+def _provincial_act(jurisdiction: Optional[str]) -> Optional[str]:
+    code = f"{jurisdiction}-RTA"
+    return code if code in _ACT_CODES else None
+
+
+def _act_mentions(text: str) -> List[Tuple[int, Optional[str]]]:
+    """(position, act code) per act mentioned; None for acts and documents not in the index."""
+    known = [(m.start(), m.end(), code) for pattern, code in _ACT_MENTIONS for m in pattern.finditer(text)]
+    mentions = [(start, code) for start, _, code in known]
+    for pattern in _OTHER_MENTIONS:
+        for m in pattern.finditer(text):
+            # "Residential Tenancies Act" is a known act, not also an unknown one
+            if not any(start < m.end() and m.start() < end for start, end, _ in known):
+                mentions.append((m.start(), None))
+    return mentions
+
+
+def parse_section_refs(text: str, jurisdiction: Optional[str], topic: Optional[str] = None) -> List[SectionRef]:
+    """
+    Explicit section references in `text`. Each is attributed to the nearest
+    act mentioned. With no act named at all, a tenancy question's references
+    default to the jurisdiction's tenancy act. References to acts not in the
+    index (or to the user's lease) are dropped, so the turn falls back to
+    vector search.
+    """
+    mentions = _act_mentions(text)
+    default = "RTA" if topic == "TENANCY" else None
+    refs = []
+    for match in _SECTION_REF.finditer(text):
+        items = [match]
+        while (item := _SECTION_LIST_ITEM.match(text, items[-1].end())) is not None:
+            items.append(item)
+        # "section 8 of the Charter": the act named right after the list, else the nearest one
+        named = [code for start, code in mentions if _ACT_FOLLOWS.fullmatch(text, items[-1].end(), start)]
+        if named:
+            code = named[0]
+        else:
+            code = min(mentions, key=lambda m: abs(m[0] - match.start()))[1] if mentions else default
+        if code == "RTA":
+            code = _provincial_act(jurisdiction)
+        if code is None or code not in _ACT_CODES:
+            continue
+        for item in items:
+            ref = SectionRef(code, item.group(1), item.group(2))
+            if ref not in refs:
+                refs.append(ref)
+    return refs[:MAX_REFS]
+
+
+def _doc_keys(doc: Document) -> List[Tuple[str, str]]:
+    meta = doc.metadata
+    code = meta.get("act_code") or getattr(act_for(meta.get("source")), "code", None)
+    if not code:
+        return []
+    sections = meta.get("sections")
+    if sections is None:
+        # Chunks ingested before section tagging: sections that start in the text
+        sections = sections_starting(doc.page_content)
+        if not sections and meta.get("section"):
+            sections = [meta["section"]]
+    keys = [(code, str(s)) for s in sections if s]
+    # Near-duplicate copies collapsed into this chunk at ingest (agent/dedupe.py)
+    for copy in meta.get("duplicates") or []:
+        if copy.get("act_code"):
+            keys.extend((copy["act_code"], str(s)) for s in copy.get("sections") or [] if s)
+    return list(dict.fromkeys(keys))
+
+
+class SectionIndex:
+    """(act_code, section) -> chunks holding that section's text, in document order."""
+
+    def __init__(self):
+        self._chunks: Dict[Tuple[str, str], List[Document]] = {}
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add(self, doc: Document) -> None:
+        for key in _doc_keys(doc):
+            self._chunks.setdefault(key, []).append(doc)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Document]) -> "SectionIndex":
+        index = cls()
+        for doc in docs:
+            index.add(doc)
+        return index
+
+    @classmethod
+    def from_collection(cls, collection, text_key: str = "text") -> "SectionIndex":
+        """Loads chunk text and metadata from Atlas (embeddings excluded)."""
+        index = cls()
+        for record in collection.find({}, {"_id": 0, "embedding": 0}):
+            text = record.pop(text_key, "")
+            index.add(Document(page_content=text, metadata=record))
+        return index
+
+    def lookup(self, ref: SectionRef, limit: int = MAX_CHUNKS_PER_REF) -> List[Document]:
+        chunks = self._chunks.get((ref.act_code, ref.section), [])
+        if ref.subsection:
+            # The chunk holding the subsection first, then the section's opening
+            chunks = sorted(chunks, key=lambda d: ref.subsection not in d.page_content)
+        else:
+            chunks = sorted(chunks, key=lambda d: ref.section not in sections_starting(d.page_content))
+        return chunks[:limit]
+
+    def lookup_all(self, refs: Iterable[SectionRef]) -> List[Document]:
+        docs, seen = [], set()
+        for ref in refs:
+            for doc in self.lookup(ref):
+                if id(doc) not in seen:
+                    seen.add(id(doc))
+                    docs.append(doc)
+        return docs
@@ -1,22 +1,65 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+import time
+_import_started = time.perf_counter()
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Optional, Union
+import asyncio
+import json
 import os
 import uuid
+# The graph (LangGraph, LangChain, Gemini, Mongo) is loaded lazily by agent.startup
 try:
-    from agent.agent_graph import app as agent_app
-    from agent.pdf_service import generate_legal_pdf
+    from agent import startup
+    from agent.llm_gateway import gateway_stats
+    from agent.deadline import new_deadline
+    from agent.metrics import REGISTRY, REQUESTS, REQUEST_LATENCY, log, timed, trace_id_var
+    from agent.cassette import Cassette, serialize_state, should_record, start_recording, stop_recording
+    from agent.admission import BATCH, CONTINUING, NEW, AdmissionRejected, get_admission
+    from agent.envelope import ChatResponse, dumps, encode_response, turn_payload
+    from agent import cache_warmup, ingest_jobs, profiling
 except ImportError:
     # Fallback if running directly or path issues
     import sys
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from agent.agent_graph import app as agent_app
-    from agent.pdf_service import generate_legal_pdf
+    from agent import startup
+    from agent.llm_gateway import gateway_stats
+    from agent.deadline import new_deadline
+    from agent.metrics import REGISTRY, REQUESTS, REQUEST_LATENCY, log, timed, trace_id_var
+    from agent.cassette import Cassette, serialize_state, should_record, start_recording, stop_recording
+    from agent.admission import BATCH, CONTINUING, NEW, AdmissionRejected, get_admission
+    from agent.envelope import ChatResponse, dumps, encode_response, turn_payload
+    from agent import cache_warmup, ingest_jobs, profiling
 from langchain_core.messages import HumanMessage
 
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.record("import_server", _import_ready - _import_started)
+    warm_task = None
+    if startup.WARMUP_MODE == "blocking":
+        await startup.warm_up(retry=False)
+        if not startup.is_ready():
+            # Serve /health meanwhile; /ready stays 503 until a retry succeeds
+            warm_task = asyncio.create_task(startup.warm_up())
+    elif startup.WARMUP_MODE == "off":
+        startup.mark_ready()
+    else:
+        # Bind now; /ready reports when the instance is warm
+        warm_task = asyncio.create_task(startup.warm_up())
+    cache_task = None
+    if cache_warmup.CACHE_WARMUP_ON_START:
+        # Fills the serving caches once ready; live traffic goes first
+        cache_task = asyncio.create_task(cache_warmup.warm_when_ready(get_admission()))
+    yield
+    for task in (warm_task, cache_task):
+        if task is not None and not task.done():
+            task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,53 +67,430 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "Retry-After"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Honour an upstream request ID if present so logs can be joined across services
+    trace_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = trace_id_var.set(trace_id)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        trace_id_var.reset(token)
+        # The route template ("/admin/profiles/{trace_id}"), never the raw path: one series per endpoint
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(time.perf_counter() - started, route=getattr(route, "path", "unmatched"))
+    response.headers["X-Trace-Id"] = trace_id
+    return response
+
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
 class ChatRequest(BaseModel):
     message: str
     jurisdiction: str = "ON"
     thread_id: str
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest]
+    concurrency: Optional[int] = Field(default=None, ge=1)
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (Railway's edge = 1).
+# 0 trusts no proxy: the peer address is the client. Entries left of the trusted
+# hops are set by the caller and never used.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+def client_id(http_request: Request) -> str:
+    """Caller identity for per-client limits: the address our own proxy saw, else the peer address."""
+    peer = http_request.client.host if http_request.client else "unknown"
+    if not TRUSTED_PROXY_HOPS:
+        return peer
+    hops = [hop.strip() for hop in http_request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    # The last trusted proxy appended the address it was connected from
+    return hops[-TRUSTED_PROXY_HOPS] if len(hops) >= TRUSTED_PROXY_HOPS else peer
+
+async def turn_priority(thread_id: str) -> int:
+    """Follow-ups on a thread with saved state jump ahead of brand-new threads."""
+    graph = await startup.load_graph()
+    snapshot = await graph.app.aget_state({"configurable": {"thread_id": thread_id}})
+    return CONTINUING if snapshot.values.get("messages") else NEW
+
+async def run_chat_turn(request: ChatRequest, queued_s: float = 0.0, debug: bool = False) -> dict:
+    """
+    Runs one turn through the compiled graph. Shared by /chat and /chat/batch
+    so both paths hit the same checkpointer, DB pool and caches.
+    """
+    agent_app = (await startup.load_graph()).app
+    
+    # Each turn gets a fresh latency budget that every node and tool consults;
+    # time spent waiting for admission already counts against it
+    inputs = {
+        "messages": [HumanMessage(content=request.message)],
+        "deadline": new_deadline() - queued_s,
+        "partial": False,
+    }
+    config = {"configurable": {"thread_id": request.thread_id}}
+    
+    # Debugging: Print current state to verify memory
+    log(f"--- Chat Request: {request.thread_id} ---")
+    
+    # Opt-in traffic recording (RECORD_TRAFFIC=1) for offline replay
+    cassette = None
+    if should_record():
+        snapshot = await agent_app.aget_state(config)
+        cassette = Cassette(request=request.model_dump(), state_before=serialize_state(snapshot.values), trace_id=trace_id_var.get())
+        token = start_recording(cassette)
+    
+    # Run the agent with state persistence (sync nodes run in the executor)
     try:
-        inputs = {"messages": [HumanMessage(content=request.message)]}
-        config = {"configurable": {"thread_id": request.thread_id}}
-        
-        # Debugging: Print current state to verify memory
-        print(f"--- Chat Request: {request.thread_id} ---")
-        
-        # Run the agent with state persistence
-        final_state = agent_app.invoke(inputs, config=config)
-        
-        # Check for clarification
-        if final_state.get("needs_clarification"):
-            # Use the actual message content (JSON) instead of the plain text summary
-            last_msg_content = final_state["messages"][-1].content
-            return {
-                "response": last_msg_content,
-                "legal_issue": "Additional Info Required",
-                "draft": None,
-                "debug_info": final_state.get("debug_logs", [])
-            }
-        
-        # Extract the last message content
-        return {
-            "response": final_state["messages"][-1].content,
-            "legal_issue": final_state.get("legal_issue"),
-            "draft": final_state.get("draft"),
-            "debug_info": final_state.get("debug_logs", [])
-        }
-        
+        final_state = await agent_app.ainvoke(inputs, config=config)
+    finally:
+        if cassette is not None:
+            stop_recording(token)
+    
+    payload = turn_payload(final_state, debug)
+    if cassette is not None:
+        cassette.finish(payload)
+        path = await run_in_threadpool(cassette.save)
+        log(f"Recorded cassette {path}")
+    
+    REQUESTS.inc(
+        intent=final_state.get("user_intent") or "",
+        topic=final_state.get("topic") or "",
+        jurisdiction=final_state.get("jurisdiction") or "",
+        partial=str(bool(final_state.get("partial"))).lower(),
+    )
+    return payload
+
+@app.post("/chat", response_model=ChatResponse, response_model_exclude_none=True)
+async def chat(request: ChatRequest, http_request: Request, debug: bool = False):
+    client = client_id(http_request)
+    # Admins can profile one turn (X-Profile: cprofile | sample); the admin toggle samples the rest
+    requested = http_request.headers.get("x-profile") if is_admin(http_request) else None
+    profile = profiling.start(trace_id_var.get() or uuid.uuid4().hex[:16], profiling.choose_mode(requested),
+                              route="/chat", thread_id=request.thread_id)
+    try:
+        async with get_admission().slot(client, await turn_priority(request.thread_id)) as queued_s:
+            payload = await run_chat_turn(request, queued_s, debug)
+        # Serialized once, here; the model above only documents the shape
+        with profiling.thread_scope():
+            response = encode_response(payload, http_request.headers.get("accept-encoding", ""))
+        if profile is not None:
+            response.headers["X-Profile"] = profile.trace_id
+        return response
+    except AdmissionRejected as e:
+        log(f"Shed /chat from {client}: {e.reason}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if profile is not None:
+            profiling.stop(profile)
+            summary = await run_in_threadpool(profile.save)
+            log(f"Profiled {profile.trace_id} ({profile.mode}, {summary['elapsed_ms']}ms)")
+
+def parse_batch_jsonl(body: bytes) -> List[ChatRequest]:
+    """
+    Parses a JSONL upload: one ChatRequest object per line.
+    Lines without a thread_id get a fresh one so items don't share memory.
+    """
+    items = []
+    for line_no, line in enumerate(body.decode("utf-8").splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            data.setdefault("thread_id", f"batch-{uuid.uuid4()}")
+            items.append(ChatRequest(**data))
+        except (json.JSONDecodeError, ValidationError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSONL at line {line_no}: {e}")
+    return items
+
+@app.post("/chat/batch")
+async def chat_batch(http_request: Request, concurrency: Optional[int] = None):
+    """
+    Runs many chat turns through the graph with bounded concurrency.
+    Accepts a JSON body ({"requests": [...], "concurrency": N}) or a JSONL
+    upload (Content-Type: application/x-ndjson). Streams NDJSON results in
+    completion order, followed by a final summary line.
+    """
+    content_type = http_request.headers.get("content-type", "")
+    body = await http_request.body()
+    
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = parse_batch_jsonl(body)
+    else:
+        try:
+            batch = BatchChatRequest(**json.loads(body or b"{}"))
+        except (json.JSONDecodeError, ValidationError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid batch request: {e}")
+        items = batch.requests
+        concurrency = concurrency or batch.concurrency
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty.")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items.")
+    
+    limit = max(1, min(concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+    
+    parent_trace = trace_id_var.get() or uuid.uuid4().hex[:16]
+    admission = get_admission()
+    
+    async def run_item(index: int, item: ChatRequest) -> dict:
+        # Runs in its own task, so this only tags logs for this item
+        trace_id = f"{parent_trace}-{index}"
+        trace_id_var.set(trace_id)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                # Batch items share the global cap but queue behind interactive turns
+                async with admission.slot(f"batch:{parent_trace}", BATCH):
+                    result = await run_chat_turn(item)
+                ok, error = True, None
+            except Exception as e:
+                result, ok, error = None, False, str(e)
+            return {
+                "index": index,
+                "thread_id": item.thread_id,
+                "trace_id": trace_id,
+                "ok": ok,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                "result": result,
+                "error": error,
+            }
+    
+    async def stream():
+        batch_started = time.perf_counter()
+        tasks = [asyncio.create_task(run_item(i, item)) for i, item in enumerate(items)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                record = await next_done
+                succeeded += record["ok"]
+                yield dumps(record) + b"\n"
+        finally:
+            # Client went away: stop scheduling the rest of the batch
+            for task in tasks:
+                task.cancel()
+        yield dumps({
+            "summary": {
+                "total": len(items),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded,
+                "concurrency": limit,
+                "elapsed_ms": round((time.perf_counter() - batch_started) * 1000, 1),
+            }
+        }) + b"\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 @app.get("/health")
 def health():
+    # Liveness: the process is up (it may still be warming)
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    # Readiness: graph loaded, pools open, indexes built; route traffic only once this is 200
+    return JSONResponse(startup.status(), status_code=200 if startup.is_ready() else 503)
+
+@app.get("/stats/startup")
+def startup_stats():
+    return startup.status()
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/llm")
+def llm_stats():
+    # Per-model latency percentiles, error/retry/hedge counters and circuit state
+    return {"models": gateway_stats()}
+
+@app.get("/stats/admission")
+def admission_stats():
+    # Slots in use, queue depth by priority and the configured limits
+    return get_admission().stats()
+
+# --- Admin ---
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def is_admin(request: Request) -> bool:
+    return bool(ADMIN_TOKEN) and request.headers.get("x-admin-token") == ADMIN_TOKEN
+
+def require_admin(request: Request):
+    # Admin endpoints are off unless ADMIN_TOKEN is configured
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin API is disabled (set ADMIN_TOKEN).")
+    if request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+class IngestJobRequest(BaseModel):
+    sources: Optional[List[Union[str, dict]]] = None
+    target: str = "atlas"
+    out: Optional[str] = None
+    replace: bool = False
+    embeddings: str = "gemini"
+    dedupe: Optional[bool] = None
+    cpu_fraction: Optional[float] = Field(default=None, gt=0, le=1)
+    embed_rate: Optional[float] = Field(default=None, gt=0)
+
+@app.post("/admin/ingest/jobs", status_code=202, dependencies=[Depends(require_admin)])
+def submit_ingest_job(request: IngestJobRequest):
+    """Queues an ingestion run for the background worker (started if none is running)."""
+    try:
+        job = ingest_jobs.submit_job(request.model_dump())
+    except ingest_jobs.JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job": job, "worker_pid": ingest_jobs.ensure_worker()}
+
+@app.get("/admin/ingest/jobs", dependencies=[Depends(require_admin)])
+def list_ingest_jobs(limit: int = 50):
+    return {"worker": ingest_jobs.worker_status(), "jobs": ingest_jobs.list_jobs(limit)}
+
+@app.get("/admin/ingest/jobs/{job_id}", dependencies=[Depends(require_admin)])
+def get_ingest_job(job_id: str):
+    job = ingest_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+@app.post("/admin/ingest/jobs/{job_id}/cancel", dependencies=[Depends(require_admin)])
+def cancel_ingest_job(job_id: str):
+    job = ingest_jobs.cancel_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+def _corpus_db():
+    collection = startup.import_graph().get_db_connection()
+    if collection is None:
+        raise HTTPException(status_code=503, detail="Database connection failed.")
+    return collection.database
+
+def _alias_view(doc: dict) -> dict:
+    return {"alias": doc["_id"], "current": doc["current"], "generation": doc["generation"],
+            "history": [h["collection"] for h in doc.get("history", [])]}
+
+@app.get("/admin/index/versions", dependencies=[Depends(require_admin)])
+def list_index_versions():
+    from agent import index_versions
+    db = _corpus_db()
+    alias = index_versions.get_alias(db)
+    return {"alias": _alias_view(alias) if alias else None, "versions": index_versions.list_versions(db)}
+
+def _moved_alias(doc: dict) -> dict:
+    # This instance switches now; the others within ALIAS_REFRESH_S
+    startup.import_graph().refresh_alias()
+    return _alias_view(doc)
+
+@app.post("/admin/index/versions/{collection}/promote", dependencies=[Depends(require_admin)])
+def promote_index_version(collection: str, skip_validation: bool = False):
+    """Points the corpus alias at a built version, after the validation gate unless skipped."""
+    from agent import index_versions
+    graph, db = startup.import_graph(), _corpus_db()
+    record = db[index_versions.VERSIONS_COLLECTION].find_one({"_id": collection})
+    if not record or "spec" not in record:
+        raise HTTPException(status_code=404, detail=f"No built version {collection}")
+    spec = index_versions.IndexSpec(**record["spec"])
+    report = None if skip_validation else index_versions.validate(db, spec, graph.get_embeddings())
+    if report is not None and not report["passed"]:
+        raise HTTPException(status_code=409, detail={"error": "Validation failed", "validation": report})
+    try:
+        return _moved_alias(index_versions.promote(db, spec, report=report))
+    except index_versions.VersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/index/rollback", dependencies=[Depends(require_admin)])
+def rollback_index():
+    """Points the corpus alias back at the previous version."""
+    from agent import index_versions
+    try:
+        return _moved_alias(index_versions.rollback(_corpus_db()))
+    except index_versions.VersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+class CacheWarmupRequest(BaseModel):
+    queries: List[str] = Field(default_factory=lambda: list(cache_warmup.CACHE_WARMUP_QUERIES))
+    faqs: bool = True
+    jurisdictions: Optional[List[str]] = None
+    limit: int = Field(default=cache_warmup.CACHE_WARMUP_LIMIT, ge=1)
+    concurrency: int = Field(default=cache_warmup.CACHE_WARMUP_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+    verify: bool = True
+
+@app.post("/admin/cache/warmup", status_code=202, dependencies=[Depends(require_admin)])
+async def start_cache_warmup(request: CacheWarmupRequest):
+    """Warms the serving caches from query logs and the curated FAQs in the background."""
+    if cache_warmup.status()["running"]:
+        raise HTTPException(status_code=409, detail="A cache warm-up is already running.")
+    task = asyncio.create_task(cache_warmup.run_job(
+        request.queries, request.faqs, request.jurisdictions, request.limit, request.concurrency,
+        request.verify, admission=get_admission(),
+    ))
+    # Errors are kept in the job status; don't let the task's exception go unretrieved
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    await asyncio.sleep(0)
+    return cache_warmup.status()
+
+@app.get("/admin/cache/warmup", dependencies=[Depends(require_admin)])
+def cache_warmup_status():
+    """The running or last warm-up, with its coverage report."""
+    return cache_warmup.status()
+
+class ProfilingSettings(BaseModel):
+    sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    mode: Optional[str] = None
+
+@app.get("/admin/profiling", dependencies=[Depends(require_admin)])
+def get_profiling_settings():
+    return {**profiling.settings, "modes": list(profiling.MODES)}
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+def set_profiling_settings(request: ProfilingSettings):
+    """Turns sampled profiling of /chat turns on or off (sample_rate 0 = header only)."""
+    try:
+        return profiling.configure(request.sample_rate, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def list_profiles(limit: int = 50):
+    return {"profiles": profiling.list_profiles(limit)}
+
+@app.get("/admin/profiles/aggregate", dependencies=[Depends(require_admin)])
+def aggregate_profiles(mode: str = "sample", limit: int = 50, sort: Optional[str] = None, top: int = profiling.PROFILE_TOP):
+    """Hot functions across the most recent profiles of one mode (sort: tottime/cumtime or self/total)."""
+    try:
+        return profiling.aggregate(limit=limit, mode=mode, sort=sort, top=top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/profiles/{trace_id}", dependencies=[Depends(require_admin)])
+def get_profile(trace_id: str):
+    summary = profiling.get_profile(trace_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No profile for {trace_id}")
+    return summary
+
+@app.get("/admin/profiles/{trace_id}/download", dependencies=[Depends(require_admin)])
+def download_profile(trace_id: str):
+    """The raw profile: pstats dump (.prof) or collapsed stacks (.folded)."""
+    path = profiling.profile_file(trace_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No profile for {trace_id}")
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
+
 class PDFRequest(BaseModel):
     text: str
 
@@ -80,12 +500,16 @@ async def generate_pdf(request: PDFRequest):
         filename = f"draft_{uuid.uuid4()}.pdf"
         filepath = os.path.join(os.getcwd(), filename)
         
-        generate_legal_pdf(request.text, filepath)
+        from agent.pdf_service import generate_legal_pdf
+        with timed("pdf_render"):
+            generate_legal_pdf(request.text, filepath)
         
         return FileResponse(filepath, media_type='application/pdf', filename="Legal_Notice_Draft.pdf")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+_import_ready = time.perf_counter()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,283 @@
+"""
+Portable snapshot of the processed corpus (chunks + metadata + embeddings).
+
+Lets an environment load the index without re-parsing the acts or paying for
+embeddings again. A snapshot is a directory:
+
+    manifest.json       version, embedding model, dimensions, dtype, chunk count, sources
+    vectors.npy         float16 (count x dimensions) array, opened memory-mapped
+    chunks.jsonl.gz     one {"text": ..., "metadata": {...}} row per vector, same order
+
+    python -m agent.snapshot export --from docs --out corpus.snapshot
+    python -m agent.snapshot export --from atlas --out corpus.snapshot
+    python -m agent.snapshot import corpus.snapshot --to atlas --replace
+    python -m agent.snapshot info corpus.snapshot
+
+Set CORPUS_SNAPSHOT=<path> to serve retrieval from a snapshot loaded into the
+local index instead of Atlas (VECTOR_QUANTIZATION=scalar|binary searches
+quantized codes with float16 rescoring).
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    from agent.local_index import LocalVectorStore
+    from agent.index_versions import VersionError
+except ImportError:
+    from local_index import LocalVectorStore
+    from index_versions import VersionError
+
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+VECTORS = "vectors.npy"
+CHUNKS = "chunks.jsonl.gz"
+EMBED_BATCH = int(os.getenv("SNAPSHOT_EMBED_BATCH", "100"))
+INSERT_BATCH = int(os.getenv("SNAPSHOT_INSERT_BATCH", "500"))
+
+# Field names MongoDBAtlasVectorSearch uses by default
+TEXT_KEY = "text"
+EMBEDDING_KEY = "embedding"
+
+
+class SnapshotError(RuntimeError):
+    """The snapshot is unreadable or incompatible with the target embedder/index."""
+
+
+class Snapshot:
+    def __init__(self, path: str, manifest: dict, vectors: np.ndarray, chunks: List[dict]):
+        self.path = path
+        self.manifest = manifest
+        self.vectors = vectors
+        self.chunks = chunks
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def embedding_model(self) -> str:
+        return self.manifest["embedding_model"]
+
+    @property
+    def dimensions(self) -> int:
+        return self.manifest["dimensions"]
+
+    def documents(self) -> List[Document]:
+        return [Document(page_content=c["text"], metadata=c["metadata"]) for c in self.chunks]
+
+    def check_compatible(self, embedding_model: str, dimensions: Optional[int] = None) -> None:
+        if embedding_model != self.embedding_model:
+            raise SnapshotError(
+                f"Snapshot was embedded with {self.embedding_model} but the target uses {embedding_model}; "
+                "queries would not be comparable with the stored vectors."
+            )
+        if dimensions is not None and dimensions != self.dimensions:
+            raise SnapshotError(f"Snapshot holds {self.dimensions}-dim vectors but the target expects {dimensions}")
+
+
+# --- Writing ---
+
+def write_snapshot(path: str, rows: Iterable[Tuple[Document, List[float]]], embedding_model: str,
+                   extra: Optional[dict] = None) -> dict:
+    """Writes (document, vector) rows to a snapshot directory and returns its manifest (plus `extra` fields)."""
+    os.makedirs(path, exist_ok=True)
+    vectors, sources = [], {}
+    with gzip.open(os.path.join(path, CHUNKS), "wt", encoding="utf-8") as f:
+        for doc, vector in rows:
+            f.write(json.dumps({"text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False, default=str) + "\n")
+            vectors.append(np.asarray(vector, dtype=np.float16))
+            source = doc.metadata.get("source", "unknown")
+            sources[source] = sources.get(source, 0) + 1
+    if not vectors:
+        raise SnapshotError("Nothing to export")
+
+    matrix = np.vstack(vectors)
+    np.save(os.path.join(path, VECTORS), matrix)
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "embedding_model": embedding_model,
+        "dimensions": int(matrix.shape[1]),
+        "dtype": "float16",
+        "count": int(matrix.shape[0]),
+        "sources": sources,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **(extra or {}),
+    }
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def rows_from_documents(docs: List[Document], embeddings) -> Iterator[Tuple[Document, List[float]]]:
+    for start in range(0, len(docs), EMBED_BATCH):
+        batch = docs[start:start + EMBED_BATCH]
+        yield from zip(batch, embeddings.embed_documents([d.page_content for d in batch]))
+
+
+def rows_from_atlas(collection) -> Iterator[Tuple[Document, List[float]]]:
+    for record in collection.find({EMBEDDING_KEY: {"$exists": True}}, {"_id": 0}):
+        text = record.pop(TEXT_KEY, "")
+        vector = record.pop(EMBEDDING_KEY)
+        yield Document(page_content=text, metadata=record), vector
+
+
+# --- Reading ---
+
+def load_snapshot(path: str) -> Snapshot:
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f"{path} is not a corpus snapshot (no {MANIFEST})")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')} (expected {SNAPSHOT_VERSION})")
+
+    vectors = np.load(os.path.join(path, VECTORS), mmap_mode="r")
+    with gzip.open(os.path.join(path, CHUNKS), "rt", encoding="utf-8") as f:
+        chunks = [json.loads(line) for line in f]
+    if vectors.shape != (manifest["count"], manifest["dimensions"]) or len(chunks) != manifest["count"]:
+        raise SnapshotError(
+            f"Snapshot is inconsistent: manifest says {manifest['count']}x{manifest['dimensions']}, "
+            f"found {len(chunks)} chunks and vectors of shape {vectors.shape}"
+        )
+    return Snapshot(path, manifest, vectors, chunks)
+
+
+def load_local_store(snapshot: Snapshot, embeddings, embedding_model: str,
+                     quantization: str = os.getenv("VECTOR_QUANTIZATION", "none")) -> LocalVectorStore:
+    """Local index over the snapshot's stored vectors; `embeddings` is only used for queries."""
+    snapshot.check_compatible(embedding_model)
+    store = LocalVectorStore(embeddings, dimensions=snapshot.dimensions, quantization=quantization)
+    store.add_documents(snapshot.documents(), vectors=snapshot.vectors)
+    return store
+
+
+def import_to_atlas(snapshot: Snapshot, collection, replace: bool = False) -> int:
+    """Bulk-inserts the snapshot in the layout MongoDBAtlasVectorSearch reads."""
+    if replace:
+        collection.delete_many({})
+    inserted = 0
+    for start in range(0, len(snapshot), INSERT_BATCH):
+        chunk_rows = snapshot.chunks[start:start + INSERT_BATCH]
+        vectors = np.asarray(snapshot.vectors[start:start + INSERT_BATCH], dtype=np.float32)
+        collection.insert_many([
+            {TEXT_KEY: row["text"], EMBEDDING_KEY: vector.tolist(), **row["metadata"]}
+            for row, vector in zip(chunk_rows, vectors)
+        ])
+        inserted += len(chunk_rows)
+    return inserted
+
+
+# --- CLI ---
+
+def _graph():
+    try:
+        from agent import agent_graph
+    except ImportError:
+        import agent_graph
+    return agent_graph
+
+
+def cmd_export(args) -> None:
+    graph = _graph()
+    if args.source == "atlas":
+        collection = graph.get_corpus_collection()
+        if collection is None:
+            raise SnapshotError("Database connection failed (is MONGODB_URI set?)")
+        manifest = write_snapshot(args.out, rows_from_atlas(collection), graph.EMBEDDING_MODEL)
+    else:
+        try:
+            from agent.ingest import load_corpus
+            from agent.fakes import FakeEmbeddings
+        except ImportError:
+            from ingest import load_corpus
+            from fakes import FakeEmbeddings
+        if args.embeddings == "fake":
+            embeddings, model = FakeEmbeddings(), "fake-embeddings"
+        else:
+            embeddings, model = graph.get_embeddings(), graph.EMBEDDING_MODEL
+        docs, report = load_corpus()
+        manifest = write_snapshot(args.out, rows_from_documents(docs, embeddings), model,
+                                  {"dedupe": report.as_dict()} if report else None)
+    print(f"Exported {manifest['count']} chunks ({manifest['dimensions']}-dim, {manifest['embedding_model']}) to {args.out}")
+
+
+def cmd_import(args) -> None:
+    graph = _graph()
+    started = time.perf_counter()
+    snapshot = load_snapshot(args.path)
+    if not args.force:
+        snapshot.check_compatible(graph.EMBEDDING_MODEL)
+
+    if args.target == "atlas":
+        collection = graph.get_db_connection()
+        if collection is None:
+            raise SnapshotError("Database connection failed (is MONGODB_URI set?)")
+        try:
+            from agent.index_versions import copy_live, rebuild
+        except ImportError:
+            from index_versions import copy_live, rebuild
+        db = collection.database
+
+        # A new corpus version: the live one plus the snapshot's sources, or only the snapshot with --replace
+        def write(version):
+            if not args.replace:
+                copy_live(db, version, exclude_sources=snapshot.manifest["sources"])
+            count = import_to_atlas(snapshot, version)
+            print(f"Inserted {count} chunks into {version.name} in {time.perf_counter() - started:.1f}s")
+            return snapshot.dimensions
+
+        result = rebuild(db, write, graph.get_embeddings(), snapshot.embedding_model)
+        print(f"{result['version']} passed validation and is now live")
+    else:
+        store = LocalVectorStore(None, dimensions=snapshot.dimensions, quantization=args.quantization)
+        store.add_documents(snapshot.documents(), vectors=snapshot.vectors)
+        memory = store.memory_bytes()
+        print(f"Loaded {len(store)} chunks into a local index in {time.perf_counter() - started:.2f}s "
+              f"(index {memory['index'] / 1e6:.1f} MB, full vectors {memory['full_vectors'] / 1e6:.1f} MB)")
+
+
+def cmd_info(args) -> None:
+    snapshot = load_snapshot(args.path)
+    print(json.dumps(snapshot.manifest, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Write a snapshot from docs/ or from Atlas")
+    export.add_argument("--from", dest="source", choices=["docs", "atlas"], default="docs")
+    export.add_argument("--embeddings", choices=["fake", "gemini"], default="gemini", help="Embedder for --from docs")
+    export.add_argument("--out", required=True)
+    export.set_defaults(func=cmd_export)
+
+    imp = sub.add_parser("import", help="Bulk-load a snapshot (no embedding calls)")
+    imp.add_argument("path")
+    imp.add_argument("--to", dest="target", choices=["atlas", "local"], default="atlas")
+    imp.add_argument("--replace", action="store_true", help="New version holds only the snapshot (default: live corpus plus it)")
+    imp.add_argument("--force", action="store_true", help="Skip the embedding model check")
+    imp.add_argument("--quantization", choices=["none", "scalar", "binary"], default="none", help="For --to local")
+    imp.set_defaults(func=cmd_import)
+
+    info = sub.add_parser("info", help="Print a snapshot's manifest")
+    info.add_argument("path")
+    info.set_defaults(func=cmd_info)
+
+    args = parser.parse_args(argv)
+    try:
+        args.func(args)
+    except (SnapshotError, VersionError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Lazy graph loading and the warm-up phase behind /ready.
+
+agent.server imports nothing heavy: the graph module (LangGraph, LangChain,
+the Gemini and Mongo clients) is loaded on first use by load_graph(). At
+startup the FastAPI lifespan runs warm_up() in the background, so uvicorn binds
+immediately while the instance loads the graph, opens the Atlas pool, builds
+the section index and makes one tiny embedding call. /ready flips once the
+required steps (graph, Mongo, vector store, embeddings) have succeeded; until
+then warm-up is retried every WARMUP_RETRY_S. /health only says the process
+is up.
+
+Every phase's duration is kept in `timings` (and exported as
+juris_startup_seconds) so slow cold starts show which step to blame.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from agent.metrics import STARTUP_SECONDS, log
+except ImportError:
+    from metrics import STARTUP_SECONDS, log
+
+# background | blocking (finish before accepting traffic) | off
+WARMUP_MODE = os.getenv("WARMUP", "background")
+# Also send one real LLM request so the first user turn skips the TLS/connection setup
+WARMUP_LLM_PING = os.getenv("WARMUP_LLM_PING", "0") == "1"
+# Seconds between warm-up attempts while a required step keeps failing
+WARMUP_RETRY_S = float(os.getenv("WARMUP_RETRY_S", "10"))
+
+PROCESS_STARTED = time.perf_counter()
+
+timings: Dict[str, float] = {}
+# Phases that failed in the last attempt; the errors explain why
+failures: Dict[str, str] = {}
+attempts = 0
+_ready = False
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def record(phase: str, seconds: float) -> None:
+    timings[phase] = round(seconds, 3)
+    STARTUP_SECONDS.set(seconds, phase=phase)
+
+
+def is_ready() -> bool:
+    return _ready
+
+
+def status() -> dict:
+    return {
+        "ready": _ready,
+        "mode": WARMUP_MODE,
+        "timings_s": dict(timings),
+        "failures": dict(failures),
+        "attempts": attempts,
+    }
+
+
+# --- Lazy graph ---
+
+def import_graph():
+    """The agent_graph module, imported on first call (thread-safe)."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                started = time.perf_counter()
+                try:
+                    from agent import agent_graph
+                except ImportError:
+                    import agent_graph
+                record("import_graph", time.perf_counter() - started)
+                _graph = agent_graph
+    return _graph
+
+
+async def load_graph():
+    """import_graph() off the event loop, so /health and /ready stay responsive meanwhile."""
+    if _graph is not None:
+        return _graph
+    return await run_in_threadpool(import_graph)
+
+
+# --- Warm-up ---
+
+def _ping_mongo(graph) -> None:
+    if graph.has_vector_store_override() or os.getenv("CORPUS_SNAPSHOT") or not os.getenv("MONGODB_URI"):
+        return
+    graph.get_mongo_client().admin.command("ping")
+
+
+def _open_vector_store(graph) -> None:
+    if graph.get_vector_store() is None:
+        raise RuntimeError("Vector store unavailable")
+
+
+def _build_indexes(graph) -> None:
+    graph.get_section_index()
+    graph.get_corpus_categories()
+
+
+def _embed_probe(graph) -> None:
+    store = graph.get_vector_store()
+    embeddings = getattr(store, "embeddings", None)
+    if embeddings is not None:
+        embeddings.embed_query("warm-up")
+
+
+def _prepare_llm(graph) -> None:
+    # Builds the client and the structured-output runnables; no request unless asked
+    graph.llm.structured(graph.RouterOutput)
+    graph.llm.structured(graph.GeneratorOutput)
+    if graph.FUSED_ROUTING:
+        graph.llm.structured(graph.FusedOutput)
+    if WARMUP_LLM_PING:
+        graph.llm.invoke([graph.HumanMessage(content="ping")], timeout=10)
+
+
+# (phase, step, phases it needs); a step is skipped when one of those failed
+WARMUP_STEPS: List[Tuple[str, Callable, Tuple[str, ...]]] = [
+    ("mongo_ping", _ping_mongo, ()),
+    ("vector_store", _open_vector_store, ("mongo_ping",)),
+    ("indexes", _build_indexes, ("vector_store",)),
+    ("embedding_probe", _embed_probe, ("vector_store",)),
+    ("llm_client", _prepare_llm, ()),
+]
+# Without these the instance cannot answer; it stays not-ready and retries.
+# The others only make the first turns slower when they fail.
+REQUIRED_STEPS = ("import_graph", "mongo_ping", "vector_store", "embedding_probe")
+
+
+async def warm_up(retry: bool = True) -> dict:
+    """
+    Runs the warm-up steps, recording timings, and marks the instance ready
+    once every required step succeeded. Failed attempts are retried every
+    WARMUP_RETRY_S (unless `retry` is False).
+    """
+    while True:
+        await _warm_up_once()
+        missing = [name for name in REQUIRED_STEPS if name in failures]
+        if not missing:
+            return status()
+        log(f"Not ready: {', '.join(missing)} failed (attempt {attempts})"
+            f"{f'; retrying in {WARMUP_RETRY_S:.0f}s' if retry else ''}")
+        if not retry:
+            return status()
+        await asyncio.sleep(WARMUP_RETRY_S)
+
+
+async def _warm_up_once() -> None:
+    global _ready, attempts
+    attempts += 1
+    failures.clear()
+    started = time.perf_counter()
+    try:
+        graph = await load_graph()
+    except Exception as e:
+        failures["import_graph"] = str(e)[:300]
+        log(f"Warm-up failed to load the graph: {e}")
+        return
+
+    for name, step, requires in WARMUP_STEPS:
+        if any(dep in failures for dep in requires):
+            failures[name] = "skipped"
+            continue
+        step_started = time.perf_counter()
+        try:
+            await run_in_threadpool(step, graph)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failures[name] = str(e)[:300]
+            log(f"Warm-up step {name} failed: {e}")
+        record(name, time.perf_counter() - step_started)
+
+    record("warm_up", time.perf_counter() - started)
+    if any(name in failures for name in REQUIRED_STEPS):
+        return
+    record("process_to_ready", time.perf_counter() - PROCESS_STARTED)
+    _ready = True
+    summary = ", ".join(f"{k} {v}s" for k, v in timings.items())
+    log(f"Ready ({summary}){' with failures: ' + ', '.join(failures) if failures else ''}")
+
+
+def mark_ready() -> None:
+    """Skip warm-up (WARMUP=off): ready as soon as the app starts."""
+    global _ready
+    _ready = True
@@ -0,0 +1,37 @@
+import os
+
+from dedupe import dedupe_chunks
+from ingest import load_corpus
+
+DOCS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docs")
+EXCERPTS = ["alberta_rta.html", "bc_rta.html"]
+FULL_ACTS = ["alberta_rta_full.html", "bc_rta_full.html"]
+
+
+def corpus():
+    chunks, _ = load_corpus([os.path.join(DOCS, name) for name in EXCERPTS + FULL_ACTS], dedupe=False)
+    return chunks
+
+
+def test_excerpt_pages_collapse_into_full_acts():
+    chunks = corpus()
+    kept, report = dedupe_chunks(chunks)
+    assert report.removed_chunks > 0
+    assert set(report.removed_by_source) <= set(EXCERPTS)
+    # Every full-act chunk survives, and carries the excerpts filed under it
+    assert sum(doc.metadata["source"] in FULL_ACTS for doc in kept) == sum(doc.metadata["source"] in FULL_ACTS for doc in chunks)
+    provenance = [d["source"] for doc in kept for d in doc.metadata.get("duplicates", [])]
+    assert len(provenance) == report.removed_chunks
+
+
+def test_excerpts_only_match_their_own_province():
+    chunks = [doc for doc in corpus() if doc.metadata["source"] != "bc_rta_full.html"]
+    _, report = dedupe_chunks(chunks)
+    assert "bc_rta.html" not in report.removed_by_source
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")
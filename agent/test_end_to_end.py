@@ -1,6 +1,6 @@
 from agent_graph import app as graph
+from envelope import turn_payload
 from langchain_core.messages import HumanMessage
-import json
 import uuid
 
 def test_scenario(province, query, expected_keywords):
@@ -16,39 +16,42 @@ def test_scenario(province, query, expected_keywords):
     
     final_state = graph.invoke(initial_state, config=config)
     
-    # 2. Extract Response
-    last_message = final_state["messages"][-1].content
-    
-    # 3. Parse JSON (Simulate Frontend)
-    try:
-        data = json.loads(last_message)
-        explanation = data.get("explanation", "")
-        citations = data.get("citations", [])
-        
-        print("\n✅ STATUS: SUCCESS (Valid JSON)")
-        print(f"📄 Explanation Preview: {explanation[:150]}...")
-        print(f"📚 Citations found: {len(citations)}")
-        for c in citations:
-            print(f"   - {c}")
-            
-        # 4. Keyword Verification
-        print("\n🔎 Verifying Legitimate Legal Content:")
-        missing = []
-        for kw in expected_keywords:
-            if kw.lower() in str(data).lower():
-                print(f"   ✅ Found keyword: '{kw}'")
-            else:
-                print(f"   ❌ MISSING keyword: '{kw}'")
-                missing.append(kw)
-        
-        if not missing:
-            print(f"\n🎉 PASSED: {province} is using REAL DATA.")
+    # 2. Extract Response (the /chat envelope: prose explanation + structured citations/options)
+    data = turn_payload(final_state)
+    explanation = data["explanation"]
+    citations = data["citations"]
+    options = data["options"]
+
+    # 3. Check the Shape (Simulate Frontend)
+    assert isinstance(explanation, str) and explanation.strip(), "Empty explanation"
+    assert not explanation.lstrip().startswith("{"), "Explanation is a JSON-encoded response, not prose"
+    assert isinstance(citations, list) and isinstance(options, list)
+    for c in citations:
+        assert c.get("id") and c.get("source_title"), f"Citation without id/source_title: {c}"
+
+    print("\n✅ STATUS: SUCCESS (Structured response)")
+    print(f"📄 Explanation Preview: {explanation[:150]}...")
+    print(f"📚 Citations found: {len(citations)}")
+    for c in citations:
+        print(f"   - {c['id']}: {c['source_title']}")
+    if not citations:
+        print("   ⚠️ No citations: the answer is not grounded in the corpus.")
+
+    # 4. Keyword Verification
+    print("\n🔎 Verifying Legitimate Legal Content:")
+    content = f"{explanation} {citations} {options}".lower()
+    missing = []
+    for kw in expected_keywords:
+        if kw.lower() in content:
+            print(f"   ✅ Found keyword: '{kw}'")
         else:
-            print(f"\n⚠️ WARNING: {province} might be hallucinating or missing context.")
-            
-    except json.JSONDecodeError:
-        print("\n❌ FAILED: Response was not valid JSON.")
-        print(f"Raw Output: {last_message}")
+            print(f"   ❌ MISSING keyword: '{kw}'")
+            missing.append(kw)
+
+    if not missing:
+        print(f"\n🎉 PASSED: {province} is using REAL DATA.")
+    else:
+        print(f"\n⚠️ WARNING: {province} might be hallucinating or missing context.")
 
 if __name__ == "__main__":
     print("🚀 STARTING COMPLETENESS VERIFICATION 🚀")
@@ -0,0 +1,35 @@
+from section_index import parse_section_refs
+
+
+def refs(text, jurisdiction="ON", topic="TENANCY"):
+    return [str(r) for r in parse_section_refs(text, jurisdiction, topic)]
+
+
+def test_known_acts():
+    assert refs("What does section 48 of the RTA say?") == ["ON-RTA:48"]
+    assert refs("Read s. 48 of the Residential Tenancies Act") == ["ON-RTA:48"]
+    assert refs("sections 42 and 43 of the Residential Tenancy Act", "BC") == ["BC-RTA:42", "BC-RTA:43"]
+    assert refs("Does section 48 of the Act apply?") == ["ON-RTA:48"]
+    assert refs("s. 8(2) Divorce Act", topic="FAMILY") == ["DIVORCE:8(2)"]
+
+
+def test_bare_reference_defaults_to_tenancy_act_only_for_tenancy():
+    assert refs("My landlord cited section 48") == ["ON-RTA:48"]
+    assert refs("I paid rent 3 times, see section 5", topic=None) == []
+    assert refs("What does section 5 say?", topic="EMPLOYMENT") == []
+
+
+def test_acts_not_in_the_index_are_dropped():
+    assert refs("section 8 of the Charter") == []
+    assert refs("section 2 of the Employment Standards Act") == []
+    assert refs("s. 5 of the Human Rights Code") == []
+    assert refs("Section 5 of my lease says no pets") == []
+    # A known act next to an unknown one keeps its own references
+    assert refs("section 8 of the Charter and section 48 of the RTA") == ["ON-RTA:48"]
+
+
+if __name__ == "__main__":
+    for name, check in list(globals().items()):
+        if name.startswith("test_"):
+            check()
+            print(f"✅ {name}")
@@ -1,20 +1,71 @@
-from duckduckgo_search import DDGS
-from typing import List, Dict, Optional
+import os
+import time
+from typing import Callable, List, Dict, Optional, Tuple
+try:
+    from agent.deadline import budget_low, search_timeout, time_left
+    from agent.metrics import log, timed
+    from agent.cassette import record_call
+    from agent.gazetteer import get_gazetteer
+except ImportError:
+    from deadline import budget_low, search_timeout, time_left
+    from metrics import log, timed
+    from cassette import record_call
+    from gazetteer import get_gazetteer
 
-def safe_search(query: str, max_results=3) -> List[Dict]:
+# Appended to tool output when optional lookups were skipped to stay within the request deadline
+PARTIAL_NOTE = "(Partial results: some sources were skipped to respond quickly.)"
+# A web search is not worth starting with less time than this left
+MIN_SEARCH_BUDGET_S = 2.0
+# Lawyer referrals come from the bundled gazetteer; web results are optional extras
+REFERRAL_WEB_SEARCH = os.getenv("REFERRAL_WEB_SEARCH", "0") == "1"
+
+def ddg_search(query: str, max_results: int = 3, timeout: Optional[float] = None) -> List[Dict]:
+    from duckduckgo_search import DDGS
+    ddgs = DDGS(timeout=timeout) if timeout is not None else DDGS()
+    return ddgs.text(query, region="ca-en", safesearch="moderate", max_results=max_results)
+
+# Web search backend; swapped by set_search_provider() for benchmarks and replay
+_search_provider: Callable[..., List[Dict]] = ddg_search
+
+def set_search_provider(provider: Optional[Callable[..., List[Dict]]]) -> None:
+    """Use `provider(query, max_results, timeout=None)` for web searches; None restores DuckDuckGo."""
+    global _search_provider
+    _search_provider = provider or ddg_search
+
+def _is_timeout(error: Exception) -> bool:
+    # duckduckgo_search raises its own TimeoutException
+    return isinstance(error, TimeoutError) or type(error).__name__ == "TimeoutException"
+
+def timed_search(query: str, max_results: int = 3, deadline: Optional[float] = None) -> Tuple[List[Dict], bool]:
     """
-    Executes a safe, region-locked search using DuckDuckGo.
+    Web search bounded by the request deadline: the search gets the remaining
+    budget (less the generator's reserve) as its timeout, and is skipped when
+    none is left. Returns the results and whether it timed out or was skipped.
     """
+    timeout = search_timeout(deadline)
+    if timeout == 0:
+        log(f"Search skipped (no budget left): {query}")
+        return [], True
     try:
-        results = DDGS().text(query, region="ca-en", safesearch="moderate", max_results=max_results)
-        return results if results else []
+        started = time.perf_counter()
+        with timed("web_search"):
+            results = _search_provider(query, max_results, timeout=timeout)
+        record_call("web_search", query, {"max_results": max_results}, results or [], (time.perf_counter() - started) * 1000)
+        return (results if results else []), False
     except Exception as e:
-        print(f"Search Error: {e}")
-        return []
+        log(f"Search Error: {e}")
+        return [], _is_timeout(e)
+
+def safe_search(query: str, max_results=3, deadline: Optional[float] = None) -> List[Dict]:
+    """
+    Executes a safe, region-locked search using DuckDuckGo.
+    """
+    return timed_search(query, max_results, deadline)[0]
 
-def find_official_form(form_name: str, jurisdiction: str = "Ontario") -> str:
+def find_official_form(form_name: str, jurisdiction: str = "Ontario", deadline: Optional[float] = None) -> str:
     """
     Finds a direct PDF link to an official legal form.
+    The landing-page fallback search is skipped when the request deadline is close.
     """
     # 1. Hardcoded Common Forms (The "Happy Path")
     COMMON_FORMS = {
@@ -39,56 +90,65 @@ def find_official_form(form_name: str, jurisdiction: str = "Ontario") -> str:
     domains = "site:ontario.ca OR site:tribunalsontario.ca OR site:court.ca OR site:canada.ca"
     search_query_pdf = f"{form_name} form filetype:pdf {domains}"
     
-    print(f"SEARCHING FORM (PDF): {search_query_pdf}")
-    results = safe_search(search_query_pdf, max_results=3)
+    if time_left(deadline) < MIN_SEARCH_BUDGET_S:
+        return f"Could not look up form '{form_name}' in time. Please check ontario.ca or canada.ca directly. {PARTIAL_NOTE}"
+
+    log(f"SEARCHING FORM (PDF): {search_query_pdf}")
+    results, timed_out = timed_search(search_query_pdf, max_results=3, deadline=deadline)
     if results:
         top_hit = results[0]
         return f"Found official form (PDF): [{top_hit['title']}]({top_hit['href']})"
     
-    # 3. Fallback: Landing Page
+    # 3. Fallback: Landing Page (optional work)
+    if timed_out or budget_low(deadline):
+        return f"Could not find a direct PDF for form '{form_name}'. Please check ontario.ca or canada.ca directly. {PARTIAL_NOTE}"
     search_query_general = f"{form_name} form official {domains}"
-    results_general = safe_search(search_query_general, max_results=3)
+    results_general, timed_out = timed_search(search_query_general, max_results=3, deadline=deadline)
     if results_general:
         top_hit = results_general[0]
         return f"Found official form page: [{top_hit['title']}]({top_hit['href']})"
+    if timed_out:
+        return f"Could not find an official online version of form '{form_name}' in time. Please check ontario.ca or canada.ca directly. {PARTIAL_NOTE}"
 
     return f"Could not find an official online version of form '{form_name}'. Please visit specific government service centers."
 
-def find_lawyer_referral(location: str, issue_type: str) -> str:
+def find_lawyer_referral(request: str, jurisdiction: Optional[str], issue_type: str, deadline: Optional[float] = None) -> str:
     """
-    Finds lawyers or referral services. 
-    Now includes broader searches for 'top rated' context to give user options.
-    Also generates LSO Deep Links for Ontario cities.
+    Finds lawyers or referral services for the place named in `request`.
+    The city and its province come from the bundled gazetteer, the law society
+    directory (city-filtered for Ontario) and referral service from its
+    per-province patterns, so the answer is local, instant and deterministic.
+    Web searches only add extra results (REFERRAL_WEB_SEARCH=1), and are
+    skipped (the result marked partial) when the request deadline is close.
     """
-    links = []
-    
-    # 1. LSO Deep Link (Ontario Specific)
-    # URL Pattern: https://lso.ca/public-resources/finding-a-lawyer-or-paralegal/directory-search/results?fc=membercitynormalized%7CHamilton
-    city = location.split(",")[0].strip().title()
-    # Basic check if it likely is an Ontario city (or passed as such)
-    # We'll just generate the link if it looks like a city name
-    if len(city) > 2 and "Ontario" in location:
-        lso_url = f"https://lso.ca/public-resources/finding-a-lawyer-or-paralegal/directory-search/results?fc=membercitynormalized%7C{city}"
-        links.append(f"- [LSO Directory for {city}]({lso_url}) (Official)")
-
-    # 2. Official Referral Services (Search Backup)
-    referral_query = f"law society referral service {location}"
-    referral_results = safe_search(referral_query, max_results=2)
-    
-    if referral_results:
-        for res in referral_results:
-            # Avoid duplicating the main LSO link if possible, but safe search results vary
-            links.append(f"- [{res['title']}]({res['href']})")
-            
-    # 3. Broader Directory/Firm Search (User Requested)
-    commercial_query = f"top rated {issue_type} lawyers in {location} directory"
-    comm_results = safe_search(commercial_query, max_results=2)
-    
-    if comm_results:
-        for res in comm_results:
-            links.append(f"- [Search Result: {res['title']}]({res['href']})")
-            
+    gazetteer = get_gazetteer()
+    place = gazetteer.find_place(request, jurisdiction)
+    # A city in another province ("lawyer in Calgary" from an Ontario user) gets that province's directory
+    province = place.province if place else (jurisdiction or "ON")
+    links = [f"- [{label}]({url}) (Official)" for label, url in gazetteer.referral_links(province, place.municipality if place else None)]
+    skipped = False
+
+    if REFERRAL_WEB_SEARCH:
+        info = gazetteer.province(province) or {}
+        location = ", ".join(filter(None, [place.municipality if place else None, info.get("name", province)]))
+
+        # Official referral services beyond the bundled ones
+        if time_left(deadline) >= MIN_SEARCH_BUDGET_S:
+            results, timed_out = timed_search(f"law society referral service {location}", max_results=2, deadline=deadline)
+            links.extend(f"- [{res['title']}]({res['href']})" for res in results)
+            skipped = skipped or timed_out
+        else:
+            skipped = True
+
+        # Broader directory/firm search (optional)
+        if not budget_low(deadline):
+            results, timed_out = timed_search(f"top rated {issue_type} lawyers in {location} directory", max_results=2, deadline=deadline)
+            links.extend(f"- [Search Result: {res['title']}]({res['href']})" for res in results)
+            skipped = skipped or timed_out
+        else:
+            skipped = True
+
     if links:
-        return "Here are the best resources to find representation:\n" + "\n".join(links)
-            
-    return "I couldn't find specific lawyer results. Please try a broader Google search."
+        result = "Here are the best resources to find representation:\n" + "\n".join(links)
+        return f"{result}\n{PARTIAL_NOTE}" if skipped else result
+    return "I couldn't find specific lawyer results. Please try the provincial law society directory."
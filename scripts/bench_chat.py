@@ -0,0 +1,183 @@
+"""
+Offline load test for the /chat pipeline.
+
+Swaps Gemini, the embedding API, Atlas and DuckDuckGo for local stand-ins
+(agent/fakes.py), drives /chat in-process at a fixed concurrency and reports
+throughput, end-to-end and per-stage latency percentiles and peak RSS.
+
+    python scripts/bench_chat.py --requests 500 --concurrency 16 --llm-ms 400
+    python scripts/bench_chat.py --compare bench_results/chat-20260101-120000.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+import httpx
+
+from agent.admission import AdmissionController, set_admission
+from agent.cache import embedding_cache, llm_cache, retrieval_cache
+from agent.bench_utils import compare_latency, git_revision, peak_rss_mb, save_results, summarize
+from agent.fakes import Latency, install_fakes
+from agent.metrics import LLM_LATENCY, STAGE_LATENCY
+
+DEFAULT_QUERIES = [
+    "I live in Ontario. My landlord raised my rent above the guideline.",
+    "I'm in Toronto and my landlord served an N12 for his son to move in.",
+    "I am in BC. How much can my rent go up this year?",
+    "I live in Vancouver and my landlord kept my security deposit.",
+    "I live in Alberta. There is black mold in my basement suite.",
+    "Calgary landlord keeps entering my unit without notice.",
+    "I live in Ontario. How long do we need to be separated before a divorce?",
+    "I live in Ontario and was arrested for shoplifting. What is the penalty?",
+    "Get me the N12 form. I live in Ontario.",
+    "I live in Ontario. I need to hire a criminal lawyer in Toronto.",
+    "My landlord is raising my rent.",
+    "What's the weather like today?",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests (after warm-up)")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured warm-up requests")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="Mean fake LLM latency per call")
+    parser.add_argument("--llm-tail-prob", type=float, default=0.02, help="Probability of a slow LLM call")
+    parser.add_argument("--llm-tail-ms", type=float, default=3000.0)
+    parser.add_argument("--embed-ms", type=float, default=60.0)
+    parser.add_argument("--search-ms", type=float, default=250.0)
+    parser.add_argument("--queries", help="File with one query per line (defaults to a built-in mix)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-cache", action="store_true", help="Disable embedding/retrieval caches (measure cold paths)")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="Turn the LLM response cache on, as LLM_CACHE_TTL_S does (off by default: the query mix repeats, so it would hide --llm-ms)")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Admission cap on turns in flight (0 = unlimited); excess requests are shed with 429")
+    parser.add_argument("--per-client", type=int, default=0,
+                        help="Admission cap per client (0 = unlimited); every worker is the same client")
+    parser.add_argument("--out", help="Results JSON path (default bench_results/chat-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    return parser.parse_args()
+
+
+async def drive(app, queries, total, concurrency):
+    """Fires `total` requests at /chat with `concurrency` workers; returns (latencies_s, errors, shed, wall_s)."""
+    latencies, errors, shed = [], 0, 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(queries[i % len(queries)])
+
+    async def worker(client):
+        nonlocal errors, shed
+        while True:
+            try:
+                message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            resp = await client.post("/chat", json={"message": message, "thread_id": f"bench-{uuid.uuid4()}"})
+            if resp.status_code == 429:
+                shed += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if resp.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return latencies, errors, shed, wall
+
+
+def main():
+    args = parse_args()
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    from agent.server import app
+
+    if args.no_cache:
+        for cache in (embedding_cache, retrieval_cache):
+            cache.maxsize = 0
+            cache.clear()
+    if args.llm_cache and not llm_cache.enabled:
+        llm_cache.ttl = 3600.0
+    elif not args.llm_cache:
+        llm_cache.maxsize = 0
+
+    # Unlimited unless measuring shedding: all workers share one peer address, so any
+    # per-client cap applies to the whole load generator
+    set_admission(AdmissionController(max_concurrent=args.max_concurrent, per_client=args.per_client))
+
+    fakes = install_fakes(
+        llm_latency=Latency(args.llm_ms, tail_prob=args.llm_tail_prob, tail_ms=args.llm_tail_ms, seed=args.seed),
+        embedding_latency=Latency(args.embed_ms, seed=args.seed + 1),
+        search_latency=Latency(args.search_ms, seed=args.seed + 2),
+    )
+
+    asyncio.run(drive(app, queries, args.warmup, args.concurrency))
+
+    stage_samples = defaultdict(list)
+    def on_stage(value, labels):
+        stage_samples[labels.get("stage", "")].append(value)
+    def on_llm(value, labels):
+        stage_samples[f"llm:{labels.get('schema', '')}"].append(value)
+    STAGE_LATENCY.add_listener(on_stage)
+    LLM_LATENCY.add_listener(on_llm)
+
+    latencies, errors, shed, wall = asyncio.run(drive(app, queries, args.requests, args.concurrency))
+
+    STAGE_LATENCY.remove_listener(on_stage)
+    LLM_LATENCY.remove_listener(on_llm)
+
+    results = {
+        "benchmark": "chat",
+        "git": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "corpus_chunks": len(fakes["store"]),
+        "requests": len(latencies),
+        "errors": errors,
+        "shed": shed,
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": summarize(latencies),
+        "stages_ms": {name: summarize(samples) for name, samples in sorted(stage_samples.items())},
+        "web_searches": fakes["search"].calls,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(f"\n=== /chat benchmark ({results['requests']} requests, concurrency {args.concurrency}) ===")
+    print(f"Throughput: {results['requests_per_s']} req/s   Errors: {errors}   Shed: {shed}   Peak RSS: {results['peak_rss_mb']} MB")
+    lat = results["latency_ms"]
+    print(f"End-to-end: p50 {lat['p50']}ms  p95 {lat['p95']}ms  p99 {lat['p99']}ms")
+    for name, s in results["stages_ms"].items():
+        print(f"  {name:<28} n={s['count']:<5} p50 {s['p50']}ms  p95 {s['p95']}ms  p99 {s['p99']}ms")
+
+    out = save_results(results, args.out, "chat")
+    print(f"\nSaved results to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared to {args.compare} ({baseline.get('git')}):")
+        print(f"  requests/s: {baseline.get('requests_per_s')} -> {results['requests_per_s']}")
+        for line in compare_latency({"end_to_end": results["latency_ms"], **results["stages_ms"]},
+                                    {"end_to_end": baseline.get("latency_ms", {}), **baseline.get("stages_ms", {})}):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
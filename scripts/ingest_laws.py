@@ -1,4 +1,5 @@
 import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 from pymongo import MongoClient
@@ -8,8 +9,17 @@ from langchain_mongodb import MongoDBAtlasVectorSearch
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.index_registry import ensure_and_register
+
 load_dotenv()
 
+# voyage-law-2 vectors (1024-dim) live in their own collection and index; the
+# registry keeps the Gemini-backed app from querying them with 768-dim vectors
+EMBEDDING_MODEL = "voyage-law-2"
+COLLECTION_NAME = "legal_docs_voyage_law_2"
+INDEX_NAME = "vector_index_voyage_law_2"
+
 # --- Configuration ---
 # Official Sources
 # --- Configuration ---
@@ -56,7 +66,7 @@ LAW_SOURCES = [
 def get_db_connection():
     try:
         client = MongoClient(os.getenv("MONGODB_URI"), tlsCAFile=certifi.where())
-        return client["juris_db"]["legal_docs"]
+        return client["juris_db"][COLLECTION_NAME]
     except Exception as e:
         print(f"DB Connection Error: {e}")
         return None
@@ -92,11 +102,11 @@ def main():
     if collection is None:
         return
 
-    embeddings = VoyageAIEmbeddings(model="voyage-law-2")
+    embeddings = VoyageAIEmbeddings(model=EMBEDDING_MODEL)
     vector_store = MongoDBAtlasVectorSearch(
         collection=collection,
         embedding=embeddings,
-        index_name="vector_index"
+        index_name=INDEX_NAME
     )
     
     splitter = RecursiveCharacterTextSplitter(
@@ -128,7 +138,8 @@ def main():
             batch = chunks[i:i+batch_size]
             vector_store.add_documents(batch)
             print(f"Upserted batch {i} - {i+len(batch)}")
-            
+    
+    ensure_and_register(collection, INDEX_NAME, EMBEDDING_MODEL, len(embeddings.embed_query("dimension probe")))
     print("\n✅ Ingestion Complete!")
 
 if __name__ == "__main__":
@@ -6,12 +6,31 @@ import { cn } from '@/lib/utils';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 
+  interface Citation {
+    id?: string;
+    source_title: string;
+    quote: string;
+    url?: string | null;
+  }
+
+  /* Envelope returned by /chat (agent/envelope.py ChatResponse) */
+  interface StructuredResponse {
+    explanation: string;
+    citations?: Citation[];
+    options?: { label: string; action: string; description: string }[];
+    draft?: string;
+  }
+
   interface Message {
     role: 'user' | 'assistant';
     content: string;
+    response?: StructuredResponse;
     debug_info?: any[];
   }
 
+  // Node traces are only sent when asked for; they grow with the conversation
+  const DEBUG_TRACE = process.env.NEXT_PUBLIC_DEBUG_TRACE === '1';
+
   export default function Home() {
     const [messages, setMessages] = useState<Message[]>([
       { role: 'assistant', content: 'Mike Ross here. I’ve memorized every law book in the database. What aspect of the law can I help you exploit... I mean, understand, today?' }
@@ -53,7 +72,7 @@ import remarkGfm from 'remark-gfm';
         try {
           // Connect to backend with persistent thread_id
           const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-          const response = await fetch(`${apiUrl}/chat`, {
+          const response = await fetch(`${apiUrl}/chat${DEBUG_TRACE ? '?debug=true' : ''}`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ 
@@ -61,11 +80,21 @@ import remarkGfm from 'remark-gfm';
               thread_id: threadId 
             })
           });
+          if (response.status === 429) {
+            const wait = response.headers.get('Retry-After');
+            setMessages(prev => [...prev, { role: 'assistant', content: `I'm handling a lot of cases right now. Please try again${wait ? ` in ${wait} seconds` : ' shortly'}.` }]);
+            return;
+          }
           const data = await response.json();
           
           setMessages(prev => [...prev, { 
               role: 'assistant', 
-              content: data.response,
+              content: data.explanation,
+              response: {
+                explanation: data.explanation,
+                citations: data.citations,
+                options: data.options,
+              },
               debug_info: data.debug_info 
           }]);
         } catch (error) {
@@ -76,22 +105,11 @@ import remarkGfm from 'remark-gfm';
         }
       };
 
-    /* ... Structured Response Interfaces ... */
-    interface StructuredResponse {
-        explanation: string;
-        citations?: (string | { text: string; url?: string })[];
-        options?: { label: string; action: string; description: string }[];
-        draft?: string;
-    }
-
     /* ... renderMessageContent ... */
-    const renderMessageContent = (content: string) => {
-        let parsed: StructuredResponse | null = null;
-        try {
-          parsed = JSON.parse(content);
-        } catch (e) {
-          // Not JSON
-        }
+    const renderMessageContent = (msg: Message) => {
+        // Already structured by the envelope; no second parse
+        const parsed = msg.response ?? null;
+        const content = msg.content;
     
         if (!parsed) {
           return (
@@ -148,7 +166,7 @@ import remarkGfm from 'remark-gfm';
               Sources Cited
             </h4>
             <ul className="space-y-3">
-              {parsed.citations.map((cit: any, i: number) => (
+              {parsed.citations.map((cit, i) => (
                   <li key={i} className="text-sm border-l-2 border-indigo-400 pl-3">
                     <div className="font-semibold text-slate-900">
                       {cit.source_title}
@@ -308,7 +326,7 @@ import remarkGfm from 'remark-gfm';
               {msg.role === 'user' ? (
                 <p className="leading-relaxed whitespace-pre-wrap">{msg.content}</p>
               ) : (
-                renderMessageContent(msg.content)
+                renderMessageContent(msg)
               )}
             </div>
           </div>